@@ -16,9 +16,15 @@ Goal: 100% coverage on Tier 1 metadata (17 fields)
 
 import csv
 import re
+import sys
 from pathlib import Path
 from datetime import datetime
 
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.corpus.reader import CorpusReader
+
 BASE_DIR = Path("/Users/justin/Repos/AI Project")
 CORPUS_DIR = BASE_DIR / "data/processed/poetry_platform_renamed"
 CSV_PATH = BASE_DIR / "data/metadata/corpus_final_metadata.csv"
@@ -64,17 +70,16 @@ def fix_missing_titles(row, corpus_dir):
 
     return row['title']
 
-def recompute_counts(filepath):
-    """Recompute line and word counts from actual file."""
+def recompute_counts(record):
+    """Recompute line and word counts from a file read by CorpusReader."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-            lines = [line for line in content.split('\n') if line.strip()]
-            words = content.split()
-
-            return len(lines), len(words)
-    except:
+        content = record.text(errors='strict')
+    except UnicodeDecodeError:
         return 0, 0
+    lines = [line for line in content.split('\n') if line.strip()]
+    words = content.split()
+
+    return len(lines), len(words)
 
 def parse_author_name(author):
     """Parse author into last name and first name."""
@@ -182,7 +187,11 @@ def add_tier1_metadata(dry_run=True):
     fixed_titles = 0
     recomputed = 0
 
-    for i, row in enumerate(rows):
+    # File contents are streamed in row order with parallel reads
+    reader = CorpusReader(CORPUS_DIR)
+    records = reader.iter_poems(reader.resolve(row['filepath'] for row in rows))
+
+    for i, (row, record) in enumerate(zip(rows, records)):
         if (i + 1) % 10000 == 0:
             print(f"  Processed {i + 1} poems...")
 
@@ -196,9 +205,8 @@ def add_tier1_metadata(dry_run=True):
                 print(f"  Fixed title for poem {row['poem_id']}: '{new_title}'")
 
         # 2. Recompute counts
-        filepath = CORPUS_DIR / row['filepath']
-        if filepath.exists():
-            lines, words = recompute_counts(filepath)
+        if record.data is not None:
+            lines, words = recompute_counts(record)
             row['length_lines'] = lines
             row['length_words'] = words
             recomputed += 1
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark Approximate Nearest-Neighbour Search over Embeddings
+
+Builds an IVFIndex over the line (or poem) embeddings of an embedding store
+and compares it with exact brute-force search:
+- recall@k: share of the exact top-k neighbours the index also returns
+- latency: milliseconds per query, for a range of nprobe values
+
+Queries are embeddings sampled from the indexed vectors themselves.
+Without --store, a synthetic clustered dataset is used instead.
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.ann_index import EmbeddingSearch, IVFIndex, exact_search, normalize
+from poetry_bert.embedding_store import EmbeddingStore
+
+
+def synthetic_vectors(num_vectors: int, dim: int, seed: int) -> np.ndarray:
+    """Clustered random vectors, a rough stand-in for sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, num_vectors // 500), dim))
+    labels = rng.integers(0, len(centers), num_vectors)
+    return (centers[labels] + 0.5 * rng.normal(size=(num_vectors, dim))).astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """Mean share of expected ids present in found, per query."""
+    hits = [len(set(f) & set(e[e >= 0])) / max(1, int((e >= 0).sum())) for f, e in zip(found, expected)]
+    return float(np.mean(hits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ANN search recall and latency')
+    parser.add_argument('--store', type=str, default=None,
+                       help='Embedding store directory (default: synthetic data)')
+    parser.add_argument('--level', type=str, default='line', choices=EmbeddingSearch.LEVELS,
+                       help='Index lines or poem means')
+    parser.add_argument('--num-vectors', type=int, default=200_000,
+                       help='Synthetic vectors (without --store)')
+    parser.add_argument('--dim', type=int, default=384,
+                       help='Synthetic vector dimension (without --store)')
+    parser.add_argument('--nlist', type=int, default=None,
+                       help='IVF clusters (default: ~4 * sqrt(N))')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32, 64],
+                       help='nprobe values to benchmark')
+    parser.add_argument('--queries', type=int, default=500,
+                       help='Number of queries')
+    parser.add_argument('-k', type=int, default=10,
+                       help='Neighbours per query')
+    parser.add_argument('--dtype', type=str, default='float32', choices=['float32', 'float16'],
+                       help='Storage dtype of indexed vectors')
+    parser.add_argument('--seed', type=int, default=42,
+                       help='Random seed')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("ANN SEARCH BENCHMARK")
+    print("="*70)
+
+    start = time.perf_counter()
+    if args.store:
+        search = EmbeddingSearch.from_store(
+            EmbeddingStore(args.store), level=args.level,
+            nlist=args.nlist, dtype=args.dtype, seed=args.seed
+        )
+        index = search.index
+        source = f"{args.store} ({args.level}s)"
+    else:
+        vectors = synthetic_vectors(args.num_vectors, args.dim, args.seed)
+        index = IVFIndex.build(vectors, nlist=args.nlist, dtype=args.dtype, seed=args.seed)
+        source = "synthetic"
+    build_seconds = time.perf_counter() - start
+
+    print(f"\n{source}: {len(index)} vectors, dim {index.vectors.shape[1]}, "
+          f"nlist {index.nlist}, built in {build_seconds:.1f}s")
+
+    # Queries: indexed vectors (in stored order) with their exact neighbours as reference
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(index), min(args.queries, len(index)), replace=False)
+    queries = normalize(index.vectors[np.sort(rows)])
+
+    start = time.perf_counter()
+    _, exact_rows = exact_search(index.vectors, queries, args.k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    expected = np.where(exact_rows >= 0, index.ids[np.maximum(exact_rows, 0)], -1)
+
+    print(f"{len(queries)} queries, k={args.k}\n")
+    print(f"{'method':<14} {'recall@k':>10} {'ms/query':>10} {'speedup':>9}")
+    print("-"*70)
+    print(f"{'exact':<14} {1.0:>10.4f} {exact_ms:>10.3f} {1.0:>8.1f}x")
+
+    for nprobe in args.nprobe:
+        if nprobe > index.nlist:
+            continue
+        start = time.perf_counter()
+        _, found = index.search(queries, k=args.k, nprobe=nprobe)
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{'nprobe=' + str(nprobe):<14} {recall_at_k(found, expected):>10.4f} "
+              f"{ms:>10.3f} {exact_ms / ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
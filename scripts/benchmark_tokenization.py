@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark Tokenization Throughput for Hierarchical Training Data
+
+Compares, on a hierarchical sonnet JSONL:
+- per-string: one tokenizer call for the sonnet plus one per line
+  (the original HierarchicalPoetryDataset behaviour)
+- batched: one batched call over a sonnet's lines, with the sonnet sequence
+  assembled from the line ids (current HierarchicalPoetryDataset behaviour)
+
+each with the pure-Python BertTokenizer and the Rust-backed BertTokenizerFast.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from transformers import BertTokenizer, BertTokenizerFast
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.training.dataset import HierarchicalPoetryDataset, LINE_MAX_LENGTH
+
+
+def tokenize_per_string(dataset: HierarchicalPoetryDataset, sonnet: dict) -> None:
+    """Tokenize the sonnet, then each line, one string at a time."""
+    tokenizer = dataset.tokenizer
+    tokenizer(
+        " [SEP] ".join(sonnet['lines']),
+        max_length=dataset.max_length,
+        padding='max_length',
+        truncation=True,
+        return_tensors='pt'
+    )
+    for line in sonnet['lines']:
+        tokenizer(
+            line,
+            max_length=LINE_MAX_LENGTH,
+            padding='max_length',
+            truncation=True,
+            return_tensors='pt'
+        )
+
+
+def tokenize_batched(dataset: HierarchicalPoetryDataset, sonnet: dict) -> None:
+    """Tokenize all lines in one call and assemble the sonnet from them."""
+    dataset._tokenize(sonnet)
+
+
+def run_benchmark(dataset: HierarchicalPoetryDataset, tokenize_fn, repeat: int) -> float:
+    """
+    Time tokenization of every sonnet in the dataset.
+
+    Returns:
+        Best wall-clock time (seconds) over `repeat` passes
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for sonnet in dataset.sonnets:
+            tokenize_fn(dataset, sonnet)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tokenization throughput')
+    parser.add_argument('--data', type=str,
+                       default='Data/eebo_sonnets_hierarchical_train.jsonl',
+                       help='Hierarchical JSONL file to tokenize')
+    parser.add_argument('--tokenizer', type=str, default='bert-base-uncased',
+                       help='BERT tokenizer path or model name')
+    parser.add_argument('--max-length', type=int, default=128,
+                       help='Maximum sonnet sequence length')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Number of timed passes (best is reported)')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("TOKENIZATION BENCHMARK")
+    print("="*70)
+
+    tokenizers = {
+        'slow': BertTokenizer.from_pretrained(args.tokenizer),
+        'fast': BertTokenizerFast.from_pretrained(args.tokenizer),
+    }
+    datasets = {
+        name: HierarchicalPoetryDataset(args.data, tokenizer, max_length=args.max_length)
+        for name, tokenizer in tokenizers.items()
+    }
+
+    num_sonnets = len(datasets['slow'])
+    num_lines = sum(len(s['lines']) for s in datasets['slow'].sonnets)
+    print(f"\n{num_sonnets} sonnets, {num_lines} lines, best of {args.repeat} passes\n")
+
+    results = {}
+    for tokenizer_name, dataset in datasets.items():
+        for mode, tokenize_fn in (('per-string', tokenize_per_string), ('batched', tokenize_batched)):
+            results[(tokenizer_name, mode)] = run_benchmark(dataset, tokenize_fn, args.repeat)
+
+    baseline = results[('slow', 'per-string')]
+    print(f"{'tokenizer':<10} {'mode':<12} {'seconds':>10} {'sonnets/s':>12} {'lines/s':>12} {'speedup':>9}")
+    print("-"*70)
+    for (tokenizer_name, mode), seconds in results.items():
+        print(f"{tokenizer_name:<10} {mode:<12} {seconds:>10.3f} {num_sonnets / seconds:>12.1f} "
+              f"{num_lines / seconds:>12.1f} {baseline / seconds:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,20 @@
 Generate final summary statistics for the cleaned poetry corpus.
 """
 
+import sys
 from pathlib import Path
-from collections import Counter
-import csv
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.corpus.reader import CorpusReader
 
 # Paths
 BASE_DIR = Path("/Users/justin/Repos/AI Project")
 POETRY_PLATFORM_DIR = BASE_DIR / "Data/poetry_platform_renamed"
 GUTENBERG_DIR = BASE_DIR / "Data/Corpora/Gutenberg/By_Author"
 OUTPUT_FILE = BASE_DIR / "scripts/corpus_final_summary.md"
+LISTING_CACHE_DIR = BASE_DIR / "Data/cache/corpus_listing"
 
 def count_files_and_lines(directory):
     """Count files, lines, words, and collect statistics."""
@@ -25,36 +30,26 @@ def count_files_and_lines(directory):
             'avg_words_per_poem': 0
         }
 
+    reader = CorpusReader(directory, listing_cache=LISTING_CACHE_DIR / f"{directory.name}.json")
+
     file_count = 0
     total_lines = 0
     total_words = 0
-    author_set = set()
-
-    for author_dir in directory.iterdir():
-        if not author_dir.is_dir():
-            continue
-
-        author_set.add(author_dir.name)
 
-        for filepath in author_dir.glob('*.txt'):
-            file_count += 1
+    for record in reader.iter_poems():
+        file_count += 1
 
-            try:
-                with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    lines = content.count('\n') + 1
-                    words = len(content.split())
-
-                    total_lines += lines
-                    total_words += words
-            except:
-                pass
+        content = record.text()
+        if content is None:
+            continue
+        total_lines += content.count('\n') + 1
+        total_words += len(content.split())
 
     return {
         'files': file_count,
         'total_lines': total_lines,
         'total_words': total_words,
-        'authors': len(author_set),
+        'authors': len(reader.authors),
         'avg_lines_per_poem': round(total_lines / file_count, 1) if file_count > 0 else 0,
         'avg_words_per_poem': round(total_words / file_count, 1) if file_count > 0 else 0
     }
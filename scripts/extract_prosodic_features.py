@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Extract Prosodic Features for a Poetry Corpus
+
+Runs ProsodicFeatureExtractor over every poem in parallel worker processes
+and writes columnar part files (see poetry_bert.features.corpus_extraction).
+Re-running with the same output directory resumes after the last finished
+part.
+
+Input is either:
+- a JSONL file of poems with 'lines' (and optionally 'poem_id', 'is_sonnet')
+- a corpus directory of plain-text poems (*.txt, searched recursively)
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.features.corpus_extraction import extract_corpus_features
+
+
+def iter_jsonl_poems(path: Path) -> Iterator[Dict]:
+    """Yield poems from a JSONL file, numbering those without a poem_id."""
+    with open(path, 'r') as f:
+        for idx, line in enumerate(f):
+            poem = json.loads(line)
+            poem.setdefault('poem_id', poem.get('sonnet_id', idx))
+            yield poem
+
+
+def iter_text_poems(corpus_dir: Path) -> Iterator[Dict]:
+    """Yield poems from a directory of .txt files, one poem per file."""
+    for filepath in sorted(corpus_dir.rglob('*.txt')):
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = [line.strip() for line in f if line.strip()]
+        yield {
+            'poem_id': str(filepath.relative_to(corpus_dir)),
+            'lines': lines,
+            'is_sonnet': len(lines) == 14,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract prosodic features for a poetry corpus')
+    parser.add_argument('--input', type=str, required=True,
+                       help='JSONL file of poems or directory of .txt poems')
+    parser.add_argument('--output-dir', type=str, required=True,
+                       help='Directory for columnar feature parts')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: all CPUs; 1: no pool)')
+    parser.add_argument('--chunksize', type=int, default=8,
+                       help='Poems sent to a worker per task')
+    parser.add_argument('--part-size', type=int, default=1000,
+                       help='Poems per part file (unit of resumption)')
+    parser.add_argument('--parse-cache', type=str, default=None,
+                       help='SQLite meter parse cache shared across workers and runs')
+    parser.add_argument('--no-phonetic-rhyme', action='store_true',
+                       help='Use character-based rhyme detection only')
+    parser.add_argument('--restart', action='store_true',
+                       help='Discard existing parts instead of resuming')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("PROSODIC FEATURE EXTRACTION")
+    print("="*70)
+
+    input_path = Path(args.input)
+    poems = iter_text_poems(input_path) if input_path.is_dir() else iter_jsonl_poems(input_path)
+
+    meta = extract_corpus_features(
+        poems,
+        args.output_dir,
+        num_workers=args.workers,
+        chunksize=args.chunksize,
+        part_size=args.part_size,
+        use_phonetic_rhyme=not args.no_phonetic_rhyme,
+        parse_cache_path=args.parse_cache,
+        resume=not args.restart
+    )
+
+    print("\n" + "="*70)
+    print(f"✓ {meta['num_poems']} poems in {meta['num_parts']} parts written to {args.output_dir}")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
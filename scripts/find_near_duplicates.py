@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Find and Merge Near-Duplicate Poems
+
+Exact duplicates are caught by content_hash; this finds reprints that differ
+in whitespace, punctuation, capitalization, lineation or small edits, using
+MinHash signatures and LSH (see poetry_bert.corpus.dedup).
+
+Two steps:
+    report  Compute signatures for every poem in the metadata CSV, find
+            duplicate groups and write them to a JSON report
+    merge   Keep one poem per group (the longest; ties go to the lowest
+            poem_id) and write a deduplicated metadata CSV, recording the
+            merged poem_ids on the kept row. Corpus files are not touched.
+"""
+
+import sys
+import csv
+import json
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.corpus.dedup import MinHasher, compute_signatures, find_duplicate_groups, lsh_threshold
+from poetry_bert.corpus.reader import CorpusReader
+
+BASE_DIR = Path("/Users/justin/Repos/AI Project")
+CORPUS_DIR = BASE_DIR / "data/processed/poetry_platform_renamed"
+CSV_PATH = BASE_DIR / "data/metadata/corpus_final_metadata.csv"
+REPORT_PATH = BASE_DIR / "data/metadata/near_duplicates.json"
+DEDUP_CSV_PATH = BASE_DIR / "data/metadata/corpus_deduplicated_metadata.csv"
+
+
+def load_rows(csv_path):
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def iter_texts(reader, rows):
+    """Poem texts in row order ('' for unreadable files)."""
+    for i, record in enumerate(reader.iter_poems(reader.resolve(row['filepath'] for row in rows)), 1):
+        if i % 10000 == 0:
+            print(f"  Read {i} poems...")
+        yield record.text() or ''
+
+
+def rows_digest(rows):
+    """Digest of the poems a CSV lists, in order: poem_id, filepath and content_hash of each row."""
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(f"{row['poem_id']}\t{row['filepath']}\t{row.get('content_hash', '')}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def signature_settings(hasher, rows):
+    """What a signature cache was computed from: hasher parameters and poem contents, in order."""
+    return {
+        'num_perm': hasher.num_perm,
+        'shingle_size': hasher.shingle_size,
+        'seed': hasher.seed,
+        'num_poems': len(rows),
+        'rows_digest': rows_digest(rows),
+    }
+
+
+def load_signatures(signatures_path, settings):
+    """
+    Cached signatures, if they were computed with these settings.
+
+    The settings are stored next to the .npy file (<name>.json); a cache
+    from another hasher configuration, CSV or poem text is ignored.
+    """
+    settings_path = signatures_path.with_suffix('.json')
+    if not (signatures_path.exists() and settings_path.exists()):
+        return None
+    with open(settings_path, 'r', encoding='utf-8') as f:
+        cached = json.load(f)
+    if cached != settings:
+        print(f"Ignoring {signatures_path}: computed with other settings or another CSV")
+        return None
+    signatures = np.load(signatures_path)
+    if signatures.shape != (settings['num_poems'], settings['num_perm']):
+        print(f"Ignoring {signatures_path}: unexpected shape {signatures.shape}")
+        return None
+    return signatures
+
+
+def save_signatures(signatures_path, signatures, settings):
+    signatures_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(signatures_path, signatures)
+    with open(signatures_path.with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump(settings, f)
+
+
+def run_report(args):
+    rows = load_rows(args.csv)
+    print(f"Loaded {len(rows)} poems from {args.csv}")
+
+    hasher = MinHasher(num_perm=args.num_perm, shingle_size=args.shingle_size)
+    settings = signature_settings(hasher, rows)
+    signatures_path = Path(args.signatures) if args.signatures else None
+    signatures = load_signatures(signatures_path, settings) if signatures_path else None
+    if signatures is not None:
+        print(f"Loaded signatures from {signatures_path}")
+    else:
+        print(f"Computing MinHash signatures ({args.num_perm} permutations, {args.workers} workers)...")
+        reader = CorpusReader(args.corpus_dir)
+        signatures = compute_signatures(iter_texts(reader, rows), hasher, num_workers=args.workers)
+        if signatures_path:
+            save_signatures(signatures_path, signatures, settings)
+
+    rows_per_band = args.num_perm // args.bands
+    print(f"LSH: {args.bands} bands x {rows_per_band} rows "
+          f"(candidate threshold ~{lsh_threshold(args.bands, rows_per_band):.2f}), "
+          f"similarity threshold {args.threshold}")
+    groups, similarities = find_duplicate_groups(signatures, threshold=args.threshold, bands=args.bands)
+
+    report_fields = ('poem_id', 'title', 'author', 'source', 'filepath', 'words')
+    report = {
+        'settings': {
+            'csv': str(Path(args.csv).resolve()),
+            'rows_digest': settings['rows_digest'],
+            'threshold': args.threshold,
+            'num_perm': args.num_perm,
+            'bands': args.bands,
+            'shingle_size': args.shingle_size,
+        },
+        'num_poems': len(rows),
+        'groups': [
+            {
+                'poems': [{k: rows[i].get(k) for k in report_fields} for i in group],
+                'pairs': [
+                    [rows[i]['poem_id'], rows[j]['poem_id'], round(similarities[(i, j)], 3)]
+                    for i in group for j in group if (i, j) in similarities
+                ],
+            }
+            for group in groups
+        ],
+    }
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    num_duplicates = sum(len(group) - 1 for group in groups)
+    print(f"\nDuplicate groups: {len(groups)}")
+    print(f"Poems that would be merged away: {num_duplicates}")
+    for group in report['groups'][:5]:
+        print("  - " + " | ".join(f"{p['poem_id']}: {p['title']} ({p['author']})" for p in group['poems']))
+    print(f"\n✓ Report: {output_path}")
+
+
+def choose_canonical(poems):
+    """Poem kept from a group: most words, then lowest poem_id."""
+    def words(poem):
+        try:
+            return int(poem.get('words') or 0)
+        except ValueError:
+            return 0
+
+    def poem_id(poem):
+        return int(poem['poem_id']) if str(poem['poem_id']).isdigit() else float('inf')
+
+    return min(poems, key=lambda poem: (-words(poem), poem_id(poem)))
+
+
+def run_merge(args):
+    with open(args.report, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    report_csv = Path(report['settings']['csv']).resolve()
+    if report_csv != Path(args.csv).resolve():
+        raise ValueError(
+            f"{args.report} was computed from {report_csv}, not {args.csv}; "
+            f"rerun the report step or pass --csv {report_csv}"
+        )
+    rows = load_rows(args.csv)
+    if report['settings'].get('rows_digest') != rows_digest(rows):
+        raise ValueError(
+            f"The rows of {args.csv} changed since {args.report} was made "
+            f"(poems added, removed, reordered or rewritten); rerun the report step"
+        )
+    fieldnames = list(rows[0].keys()) if rows else []
+
+    merged_into = {}
+    for group in report['groups']:
+        canonical = choose_canonical(group['poems'])
+        for poem in group['poems']:
+            if poem['poem_id'] != canonical['poem_id']:
+                merged_into[poem['poem_id']] = canonical['poem_id']
+
+    merged_ids = {}
+    for duplicate, canonical in merged_into.items():
+        merged_ids.setdefault(canonical, []).append(duplicate)
+
+    kept = []
+    for row in rows:
+        if row['poem_id'] in merged_into:
+            continue
+        duplicates = merged_ids.get(row['poem_id'], [])
+        numeric = all(poem_id.isdigit() for poem_id in duplicates)
+        row['duplicate_poem_ids'] = ';'.join(sorted(duplicates, key=int if numeric else None))
+        kept.append(row)
+
+    output_path = Path(args.output_csv)
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames + ['duplicate_poem_ids'])
+        writer.writeheader()
+        writer.writerows(kept)
+
+    print(f"Merged {len(merged_into)} near-duplicates into {len(merged_ids)} kept poems")
+    print(f"✓ Wrote {len(kept)} of {len(rows)} rows to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find and merge near-duplicate poems')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help='Find duplicate groups and write a report')
+    report_parser.add_argument('--csv', type=str, default=str(CSV_PATH),
+                               help='Corpus metadata CSV')
+    report_parser.add_argument('--corpus-dir', type=str, default=str(CORPUS_DIR),
+                               help='Directory the CSV filepaths are relative to')
+    report_parser.add_argument('--output', type=str, default=str(REPORT_PATH),
+                               help='JSON report of duplicate groups')
+    report_parser.add_argument('--threshold', type=float, default=0.8,
+                               help='Minimum estimated Jaccard similarity of duplicates')
+    report_parser.add_argument('--num-perm', type=int, default=128,
+                               help='MinHash signature length')
+    report_parser.add_argument('--bands', type=int, default=16,
+                               help='LSH bands (must divide --num-perm)')
+    report_parser.add_argument('--shingle-size', type=int, default=3,
+                               help='Words per shingle')
+    report_parser.add_argument('--workers', type=int, default=4,
+                               help='Worker processes for signatures')
+    report_parser.add_argument('--signatures', type=str, default=None,
+                               help='.npy file to cache signatures in (reused if computed with '
+                                    'the same settings and CSV rows; settings are kept in <name>.json)')
+
+    merge_parser = subparsers.add_parser('merge', help='Write a deduplicated metadata CSV from a report')
+    merge_parser.add_argument('--report', type=str, default=str(REPORT_PATH),
+                              help='JSON report written by the report step')
+    merge_parser.add_argument('--csv', type=str, default=str(CSV_PATH),
+                              help='Corpus metadata CSV')
+    merge_parser.add_argument('--output-csv', type=str, default=str(DEDUP_CSV_PATH),
+                              help='Deduplicated metadata CSV')
+
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"NEAR-DUPLICATE DETECTION: {args.command.upper()}")
+    print("=" * 70)
+
+    if args.command == 'report':
+        run_report(args)
+    else:
+        run_merge(args)
+
+
+if __name__ == '__main__':
+    main()
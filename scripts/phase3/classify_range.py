@@ -9,6 +9,11 @@ import json
 import sys
 from pathlib import Path
 
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from poetry_bert.corpus.reader import CorpusReader
+
 def main():
     if len(sys.argv) != 4:
         print("Usage: python3 classify_range.py <start_idx> <end_idx> <session_id>")
@@ -22,8 +27,12 @@ def main():
     output_dir = Path.home() / "poetry-bert-formalism" / "data" / "classifications"
     output_dir.mkdir(exist_ok=True)
 
-    # Get all poem files
-    all_files = sorted(list(texts_dir.rglob("*.txt")))
+    # Get all poem files (listing cached across sessions)
+    reader = CorpusReader(
+        texts_dir, recursive=True,
+        listing_cache=output_dir / "corpus_listing.json"
+    )
+    all_files = reader.list_files()
 
     # Get assigned range
     range_files = all_files[start_idx:end_idx]
@@ -58,23 +67,24 @@ def main():
     print(f"{'='*80}\n")
 
     batch = []
-    for poem_file in batch_files:
+    for offset, record in enumerate(reader.iter_poems(batch_files)):
         try:
-            with open(poem_file, 'r', encoding='utf-8') as f:
-                text = f.read().strip()
+            if record.data is None:
+                raise OSError(record.error)
+            text = record.text(errors='strict').strip()
 
-            filename = poem_file.name
+            filename = record.file.name
             parts = filename.replace('.txt', '').split('_', 1)
             poem_id = parts[0] if parts else "unknown"
 
             batch.append({
                 'poem_id': poem_id,
-                'filename': str(poem_file.relative_to(texts_dir)),
+                'filename': record.file.relpath,
                 'text': text,
-                'global_index': start_idx + batch_start + len(batch) - 1
+                'global_index': start_idx + batch_start + offset
             })
         except Exception as e:
-            print(f"Error reading {poem_file}: {e}")
+            print(f"Error reading {record.file.path}: {e}")
 
     # Save batch info
     batch_file = output_dir / f"{session_id}_batch_{batch_start:06d}.json"
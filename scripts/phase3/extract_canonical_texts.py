@@ -4,10 +4,15 @@ Extract full poem texts for 457 training poems from M4 Max corpus.
 The canonical poems ARE in the poetry_platform_renamed directory!
 """
 
+import sys
 import pandas as pd
 from pathlib import Path
 import subprocess
-import re
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from poetry_bert.corpus.matching import FuzzyMatcher, parse_corpus_filename
 
 BASE_DIR = Path("/Users/justin/Repos/AI Project")
 M4_MAX_USER = "justin@100.65.21.63"
@@ -17,54 +22,18 @@ TRAINING_FILE = BASE_DIR / "Data/phase3/training_set_456_poems.csv"
 OUTPUT_FILE = BASE_DIR / "Data/phase3/training_poems_with_texts.jsonl"
 MISSING_LOG = BASE_DIR / "Data/phase3/missing_texts.log"
 
-def normalize_for_filename(text):
-    """Normalize text for fuzzy filename matching."""
-    if pd.isna(text):
-        return ""
-    # Remove common punctuation and extra whitespace
-    text = re.sub(r'[,:\.\!\?]', '', text)
-    text = ' '.join(text.split())
-    return text.lower().strip()
-
-def search_author_directory(author, title_keywords):
-    """Search for poem in author's directory on M4 Max."""
-    # Try different author name formats
-    author_variants = []
-
-    # If already in "Last, First" format, use it
-    if ',' in author:
-        author_variants.append(author)
-    # Convert "First Last" to "Last, First"
-    elif ' ' in author:
-        parts = author.split()
-        # Handle "Lord Byron" style names
-        if parts[0] in ['Lord', 'Sir', 'Dame', 'Earl']:
-            author_variants.append(f"{parts[-1]}, {' '.join(parts[:-1])}")
-            author_variants.append(f"{parts[0]}, {' '.join(parts[1:])}")  # "Lord, Byron"
-        else:
-            author_variants.append(f"{parts[-1]}, {' '.join(parts[:-1])}")
-    else:
-        author_variants.append(author)
-
-    for author_name in author_variants:
-        # Escape special characters for shell
-        author_escaped = author_name.replace("'", "'\\''")
-
-        # List files in author directory
-        cmd = f"ssh {M4_MAX_USER} 'ls \"{M4_MAX_CORPUS_DIR}/{author_escaped}/\" 2>/dev/null'"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+# Minimum title similarity between a training poem and a corpus filename
+MIN_TITLE_SCORE = 0.6
 
-        if result.returncode == 0 and result.stdout:
-            files = result.stdout.strip().split('\n')
-
-            # Search for matching filename
-            for filename in files:
-                filename_lower = filename.lower()
-                # Check if title keywords are in filename
-                if all(kw in filename_lower for kw in title_keywords):
-                    return f"{author_name}/{filename}"
+def list_corpus_files():
+    """List every poem file on M4 Max in one remote call (paths relative to the corpus dir)."""
+    cmd = f"ssh {M4_MAX_USER} 'cd {M4_MAX_CORPUS_DIR} && find . -type f -name \"*.txt\"'"
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
 
-    return None
+    if result.returncode != 0:
+        return []
+    return sorted(line[2:] if line.startswith('./') else line
+                  for line in result.stdout.splitlines() if line.strip())
 
 def fetch_poem_text(filepath):
     """Fetch poem text from M4 Max."""
@@ -85,8 +54,18 @@ def main():
     df = pd.read_csv(TRAINING_FILE)
     print(f"   ✓ Loaded {len(df)} training poems")
 
+    # List the corpus once and index titles/authors parsed from the filenames
+    print("\n2. Listing corpus files on M4 Max...")
+    corpus_files = list_corpus_files()
+    if not corpus_files:
+        print("   ✗ Failed to list corpus files")
+        return
+    parsed = [parse_corpus_filename(relpath) for relpath in corpus_files]
+    matcher = FuzzyMatcher([p['title'] for p in parsed], [p['author'] for p in parsed])
+    print(f"   ✓ Indexed {len(corpus_files)} corpus files")
+
     # Extract texts
-    print("\n2. Matching and extracting texts from M4 Max...")
+    print("\n3. Matching and extracting texts from M4 Max...")
 
     texts_collected = []
     missing = []
@@ -95,18 +74,14 @@ def main():
         title = row['title']
         author = row['author']
 
-        # Extract key words from title for matching
-        title_norm = normalize_for_filename(title)
-        # Take first few significant words
-        title_keywords = [w for w in title_norm.split()[:5] if len(w) > 3]
-
         # Handle NaN values
         title_display = str(title)[:40] if pd.notna(title) else "Unknown"
         author_display = str(author)[:20] if pd.notna(author) else "Unknown"
         print(f"   [{idx+1}/{len(df)}] {title_display:40s} by {author_display:20s}", end=' ... ')
 
-        # Search for poem
-        filepath = search_author_directory(author, title_keywords)
+        # Search for poem among the author's files
+        best = matcher.match(title, author, k=1, min_score=MIN_TITLE_SCORE)
+        filepath = corpus_files[best[0][0]] if best else None
 
         if filepath:
             # Fetch text
@@ -132,7 +107,7 @@ def main():
             print("✗ not found")
 
     # Save collected texts
-    print(f"\n3. Saving {len(texts_collected)} collected texts...")
+    print(f"\n4. Saving {len(texts_collected)} collected texts...")
 
     import json
     with open(OUTPUT_FILE, 'w') as f:
@@ -143,7 +118,7 @@ def main():
 
     # Save missing log
     if missing:
-        print(f"\n4. Logging {len(missing)} missing poems...")
+        print(f"\n5. Logging {len(missing)} missing poems...")
         with open(MISSING_LOG, 'w') as f:
             for idx, title, author, reason in missing:
                 f.write(f"{idx}\t{title}\t{author}\t{reason}\n")
@@ -4,12 +4,18 @@ Extract full poem texts for the 457 training poems from the M4 Max corpus.
 Match by title and author, then read the text files.
 """
 
+import sys
 import pandas as pd
 import csv
 from pathlib import Path
 import re
 import subprocess
 
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from poetry_bert.corpus.matching import FuzzyMatcher
+
 # Paths
 BASE_DIR = Path("/Users/justin/Repos/AI Project")
 M4_MAX_USER = "justin@100.65.21.63"
@@ -20,23 +26,8 @@ TRAINING_FILE = BASE_DIR / "Data/phase3/training_set_456_poems.csv"
 OUTPUT_FILE = BASE_DIR / "Data/phase3/training_texts_collected.csv"
 MISSING_LOG = BASE_DIR / "Data/phase3/missing_texts.csv"
 
-def normalize_name(name):
-    """Normalize names for matching (remove extra spaces, standardize)."""
-    if pd.isna(name):
-        return ""
-    # Remove extra whitespace
-    name = " ".join(name.split())
-    return name.strip()
-
-def normalize_title(title):
-    """Normalize titles for matching."""
-    if pd.isna(title):
-        return ""
-    # Remove extra whitespace
-    title = " ".join(title.split())
-    # Remove common variations
-    title = title.strip()
-    return title
+# Minimum title similarity for a fuzzy match when there is no exact match
+MIN_FUZZY_SCORE = 0.85
 
 def main():
     print("="*80)
@@ -66,26 +57,14 @@ def main():
     corpus_df = pd.read_csv(local_metadata)
     print(f"   ✓ Loaded {len(corpus_df)} corpus poems")
 
-    # Create lookup dictionaries
+    # Create lookup indexes
     print("\n4. Creating lookup tables...")
 
-    # Normalize corpus metadata for matching
-    corpus_df['title_norm'] = corpus_df['title'].apply(normalize_title)
-    corpus_df['author_norm'] = corpus_df['author'].apply(normalize_name)
-
-    # Create lookup by (title, author)
-    corpus_lookup = {}
-    for _, row in corpus_df.iterrows():
-        key = (row['title_norm'].lower(), row['author_norm'].lower())
-        if key not in corpus_lookup:
-            corpus_lookup[key] = []
-        corpus_lookup[key].append({
-            'poem_id': row['poem_id'],
-            'filepath': row['filepath'],
-            'filename': row['filename']
-        })
+    # Normalized (title, author) keys for exact lookup, and author-blocked
+    # trigram indexes over titles for fuzzy lookup
+    matcher = FuzzyMatcher(corpus_df['title'], corpus_df['author'])
 
-    print(f"   ✓ Created lookup table with {len(corpus_lookup)} unique (title, author) pairs")
+    print(f"   ✓ Created lookup table with {len(matcher.exact_index)} unique (title, author) pairs")
 
     # Match training poems to corpus
     print("\n5. Matching training poems to corpus...")
@@ -94,41 +73,33 @@ def main():
     missing = []
 
     for idx, row in training_df.iterrows():
-        title_norm = normalize_title(row['title'])
-        author_norm = normalize_name(row['author'])
-
-        key = (title_norm.lower(), author_norm.lower())
-
-        if key in corpus_lookup:
-            corpus_entries = corpus_lookup[key]
-            if len(corpus_entries) == 1:
-                match = corpus_entries[0]
-                matches.append({
-                    'training_idx': idx,
-                    'title': row['title'],
-                    'author': row['author'],
-                    'year_approx': row['year_approx'],
-                    'period': row['period'],
-                    'corpus_poem_id': match['poem_id'],
-                    'filepath': match['filepath'],
-                    'filename': match['filename'],
-                    'match_type': 'exact'
-                })
-            else:
-                # Multiple matches - take first one, log warning
-                match = corpus_entries[0]
-                matches.append({
-                    'training_idx': idx,
-                    'title': row['title'],
-                    'author': row['author'],
-                    'year_approx': row['year_approx'],
-                    'period': row['period'],
-                    'corpus_poem_id': match['poem_id'],
-                    'filepath': match['filepath'],
-                    'filename': match['filename'],
-                    'match_type': f'multiple ({len(corpus_entries)})'
-                })
-                print(f"   ⚠ Multiple matches for '{title_norm}' by {author_norm}: {len(corpus_entries)}")
+        corpus_entries = matcher.lookup_exact(row['title'], row['author'])
+
+        if len(corpus_entries) == 1:
+            match_type = 'exact'
+        elif corpus_entries:
+            # Multiple matches - take first one, log warning
+            match_type = f'multiple ({len(corpus_entries)})'
+            print(f"   ⚠ Multiple matches for '{row['title']}' by {row['author']}: {len(corpus_entries)}")
+        else:
+            # Fall back to the closest title among the author's poems
+            fuzzy = matcher.match(row['title'], row['author'], k=1, min_score=MIN_FUZZY_SCORE)
+            corpus_entries = [record for record, _ in fuzzy]
+            match_type = f'fuzzy ({fuzzy[0][1]:.2f})' if fuzzy else None
+
+        if corpus_entries:
+            match = corpus_df.iloc[corpus_entries[0]]
+            matches.append({
+                'training_idx': idx,
+                'title': row['title'],
+                'author': row['author'],
+                'year_approx': row['year_approx'],
+                'period': row['period'],
+                'corpus_poem_id': match['poem_id'],
+                'filepath': match['filepath'],
+                'filename': match['filename'],
+                'match_type': match_type
+            })
         else:
             missing.append({
                 'training_idx': idx,
@@ -4,11 +4,16 @@ Match training poems to corpus metadata and extract texts from M4 Max.
 Uses the corpus_final_metadata.csv which has filepaths for all 116K poems.
 """
 
+import sys
 import pandas as pd
 from pathlib import Path
 import subprocess
 import json
-from difflib import SequenceMatcher
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from poetry_bert.corpus.matching import FuzzyMatcher
 
 BASE_DIR = Path("/Users/justin/Repos/AI Project")
 M4_MAX_USER = "justin@100.65.21.63"
@@ -18,10 +23,6 @@ TRAINING_FILE = BASE_DIR / "Data/phase3/training_set_456_poems.csv"
 CORPUS_METADATA = BASE_DIR / "Data/phase3/corpus_metadata.csv"
 OUTPUT_FILE = BASE_DIR / "Data/phase3/training_poems_with_texts.jsonl"
 
-def similarity(a, b):
-    """Calculate string similarity ratio."""
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
-
 def main():
     print("="*80)
     print("PHASE 3B: MATCH & EXTRACT TRAINING POEM TEXTS")
@@ -37,31 +38,23 @@ def main():
     # Match training poems to corpus
     print("\n2. Matching poems...")
 
+    # Author-blocked, trigram-indexed title matcher over the corpus (built once)
+    matcher = FuzzyMatcher(corpus_df['title'], corpus_df['author'])
+
     matched = []
     unmatched = []
 
-    for idx, row in training_df.iterrows():
-        title = row['title']
-        author = row['author']
-
-        # Search for matches in corpus
-        candidates = corpus_df[
-            (corpus_df['author'].str.contains(author.split()[-1] if pd.notna(author) else '', case=False, na=False))
-        ]
+    queries = list(zip(training_df['title'], training_df['author']))
+    results = matcher.match_batch(queries, k=1)
 
-        if len(candidates) == 0:
+    for idx, (title, author), result in zip(training_df.index, queries, results):
+        if not result:
             unmatched.append((idx, title, author, 'no_author_match'))
             continue
 
-        # Find best title match
-        best_match = None
-        best_score = 0
-
-        for _, candidate in candidates.iterrows():
-            score = similarity(str(title), str(candidate['title']))
-            if score > best_score:
-                best_score = score
-                best_match = candidate
+        # Best title match among the author's poems
+        best_idx, best_score = result[0]
+        best_match = corpus_df.iloc[best_idx]
 
         if best_score > 0.6:  # Threshold for match
             matched.append({
@@ -13,15 +13,20 @@ Hierarchical structure for contrastive learning:
 - Quatrain pairs: Same quatrain (positive), different quatrain (negative)
 - Sonnet level: All lines from same sonnet (positive), different sonnet (negative)
 
-Output format: JSONL with hierarchical annotations
+Output format: JSONL with hierarchical annotations, optionally plus
+pre-tokenized memory-mapped shards (--tokenizer) for ShardedHierarchicalDataset
 """
 
+import sys
 import json
 import random
 from pathlib import Path
 from typing import List, Dict, Tuple
 import argparse
 
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
 
 def load_shakespeare_sonnets(sonnets_path: str) -> List[Dict]:
     """
@@ -221,6 +226,9 @@ def main():
                        help='Validation set ratio (default: 0.1)')
     parser.add_argument('--seed', type=int, default=42,
                        help='Random seed for train/val split')
+    parser.add_argument('--tokenizer', type=str, default=None,
+                       help='Also write pre-tokenized shards with this BERT tokenizer '
+                            '(path or model name) to <output-dir>/shards/{train,val}')
 
     args = parser.parse_args()
 
@@ -275,6 +283,16 @@ def main():
     with open(stats_path, 'w') as f:
         json.dump(stats, f, indent=2)
 
+    # Pre-tokenize into memory-mapped shards
+    if args.tokenizer:
+        from transformers import BertTokenizerFast
+        from poetry_bert.training.shards import write_hierarchical_shards
+
+        print(f"\nBuilding pre-tokenized shards with {args.tokenizer}...")
+        tokenizer = BertTokenizerFast.from_pretrained(args.tokenizer)
+        write_hierarchical_shards(train_sonnets, tokenizer, f"{args.output_dir}/shards/train")
+        write_hierarchical_shards(val_sonnets, tokenizer, f"{args.output_dir}/shards/val")
+
     print("\n" + "="*70)
     print("DATASET STATISTICS")
     print("="*70)
@@ -293,6 +311,8 @@ def main():
     print(f"  Train: {train_path}")
     print(f"  Val: {val_path}")
     print(f"  Stats: {stats_path}")
+    if args.tokenizer:
+        print(f"  Shards: {args.output_dir}/shards/train, {args.output_dir}/shards/val")
 
 
 if __name__ == "__main__":
@@ -16,15 +16,16 @@ import sys
 import argparse
 import torch
 from pathlib import Path
-from transformers import BertTokenizer, TrainingArguments
+from transformers import BertTokenizer, BertTokenizerFast, TrainingArguments
 from torch.utils.data import DataLoader
 
-# Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent.parent))
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
-from training.hierarchical_dataset import HierarchicalPoetryDataset, collate_hierarchical
-from training.hierarchical_losses import HierarchicalLoss
-from training.hierarchical_trainer import HierarchicalBertModel, HierarchicalTrainer
+from poetry_bert.training.dataset import HierarchicalPoetryDataset, collate_hierarchical
+from poetry_bert.training.shards import ShardedHierarchicalDataset
+from poetry_bert.models.losses import HierarchicalLoss
+from poetry_bert.training.trainer import HierarchicalBertModel, HierarchicalTrainer
 
 
 def parse_args():
@@ -45,6 +46,11 @@ def parse_args():
     parser.add_argument('--val-data', type=str,
                        default='Data/eebo_sonnets_hierarchical_val.jsonl',
                        help='Path to validation data')
+    parser.add_argument('--train-shards', type=str, default=None,
+                       help='Pre-tokenized training shard directory '
+                            '(from prepare_training.py --tokenizer); overrides --train-data')
+    parser.add_argument('--val-shards', type=str, default=None,
+                       help='Pre-tokenized validation shard directory; overrides --val-data')
 
     # Training hyperparameters
     parser.add_argument('--batch-size', type=int, default=4,
@@ -57,6 +63,17 @@ def parse_args():
                        help='Number of warmup steps')
     parser.add_argument('--max-length', type=int, default=128,
                        help='Maximum sequence length')
+    parser.add_argument('--group-by-length', action='store_true',
+                       help='Batch sonnets of similar token length together '
+                            '(less padding; batches are padded per batch either way)')
+    parser.add_argument('--num-workers', type=int, default=min(4, os.cpu_count() or 1),
+                       help='DataLoader worker processes (0: load in the main process)')
+    parser.add_argument('--prefetch-factor', type=int, default=2,
+                       help='Batches prefetched per worker (ignored with --num-workers 0)')
+    parser.add_argument('--no-pin-memory', action='store_true',
+                       help='Do not pin batch memory for host-to-GPU transfer')
+    parser.add_argument('--no-persistent-workers', action='store_true',
+                       help='Restart DataLoader workers every epoch')
 
     # Loss weights
     parser.add_argument('--mlm-weight', type=float, default=0.5,
@@ -69,12 +86,20 @@ def parse_args():
                        help='Weight for sonnet contrastive loss')
     parser.add_argument('--temperature', type=float, default=0.07,
                        help='Temperature for contrastive losses')
+    parser.add_argument('--negatives', type=str, default='sampled',
+                       choices=['sampled', 'in_batch'],
+                       help='Line/quatrain negatives: sampled pairs from the dataset, '
+                            'or every other line in the batch')
+    parser.add_argument('--max-negatives', type=int, default=None,
+                       help='Cap on in-batch negatives per anchor (default: no cap)')
 
     # Other settings
     parser.add_argument('--seed', type=int, default=42,
                        help='Random seed')
     parser.add_argument('--device', type=str, default='auto',
                        help='Device (auto, cpu, cuda, mps)')
+    parser.add_argument('--slow-tokenizer', action='store_true',
+                       help='Use the pure-Python BertTokenizer instead of BertTokenizerFast')
 
     return parser.parse_args()
 
@@ -116,26 +141,43 @@ def main():
     # Setup device
     device = setup_device(args.device)
 
+    # Fast tokenizers parallelise internally; with worker processes doing the
+    # tokenizing, that thread pool would be forked (and deadlock-prone)
+    if args.num_workers > 0:
+        os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
     # Load tokenizer
     print(f"\nLoading tokenizer from {args.base_model}...")
-    tokenizer = BertTokenizer.from_pretrained(args.base_model)
-    print("✓ Tokenizer loaded")
+    tokenizer_cls = BertTokenizer if args.slow_tokenizer else BertTokenizerFast
+    tokenizer = tokenizer_cls.from_pretrained(args.base_model)
+    print(f"✓ Tokenizer loaded ({tokenizer_cls.__name__})")
+
+    # In-batch negatives replace the dataset's sampled negative pairs
+    negative_samples = {}
+    if args.negatives == 'in_batch':
+        negative_samples = {'line_negative_samples': 0, 'quatrain_negative_samples': 0}
 
     # Load datasets
-    print(f"\nLoading training data from {args.train_data}...")
-    train_dataset = HierarchicalPoetryDataset(
-        data_path=args.train_data,
+    train_source = args.train_shards or args.train_data
+    train_dataset_cls = ShardedHierarchicalDataset if args.train_shards else HierarchicalPoetryDataset
+    print(f"\nLoading training data from {train_source}...")
+    train_dataset = train_dataset_cls(
+        data_path=train_source,
         tokenizer=tokenizer,
         max_length=args.max_length,
-        mlm_probability=0.15
+        mlm_probability=0.15,
+        **negative_samples
     )
 
-    print(f"Loading validation data from {args.val_data}...")
-    val_dataset = HierarchicalPoetryDataset(
-        data_path=args.val_data,
+    val_source = args.val_shards or args.val_data
+    val_dataset_cls = ShardedHierarchicalDataset if args.val_shards else HierarchicalPoetryDataset
+    print(f"Loading validation data from {val_source}...")
+    val_dataset = val_dataset_cls(
+        data_path=val_source,
         tokenizer=tokenizer,
         max_length=args.max_length,
-        mlm_probability=0.15
+        mlm_probability=0.15,
+        **negative_samples
     )
     print("✓ Datasets loaded")
 
@@ -150,7 +192,9 @@ def main():
         mlm_weight=args.mlm_weight,
         line_weight=args.line_weight,
         quatrain_weight=args.quatrain_weight,
-        sonnet_weight=args.sonnet_weight
+        sonnet_weight=args.sonnet_weight,
+        negative_mode=args.negatives,
+        max_negatives_per_anchor=args.max_negatives
     )
 
     print("\nLoss configuration:")
@@ -159,6 +203,8 @@ def main():
     print(f"  Quatrain weight: {args.quatrain_weight}")
     print(f"  Sonnet weight: {args.sonnet_weight}")
     print(f"  Temperature: {args.temperature}")
+    print(f"  Negatives: {args.negatives}"
+          + (f" (max {args.max_negatives} per anchor)" if args.max_negatives else ""))
 
     # Training arguments
     training_args = TrainingArguments(
@@ -177,8 +223,12 @@ def main():
         load_best_model_at_end=True,
         metric_for_best_model="eval_loss",
         greater_is_better=False,
+        group_by_length=args.group_by_length,
         fp16=(device == 'cuda'),  # Use mixed precision on CUDA
-        dataloader_num_workers=0,  # Simplified for hierarchical data
+        dataloader_num_workers=args.num_workers,
+        dataloader_prefetch_factor=args.prefetch_factor if args.num_workers > 0 else None,
+        dataloader_pin_memory=(device == 'cuda' and not args.no_pin_memory),
+        dataloader_persistent_workers=(args.num_workers > 0 and not args.no_persistent_workers),
         remove_unused_columns=False,  # Keep all columns for hierarchical processing
         report_to=["tensorboard"],
         seed=args.seed
@@ -200,6 +250,7 @@ def main():
     print(f"Training samples: {len(train_dataset)}")
     print(f"Validation samples: {len(val_dataset)}")
     print(f"Batch size: {args.batch_size}")
+    print(f"DataLoader workers: {args.num_workers}")
     print(f"Epochs: {args.num_epochs}")
     print(f"Learning rate: {args.learning_rate}")
     print(f"Output: {args.output_dir}")
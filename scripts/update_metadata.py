@@ -2,17 +2,31 @@
 """
 Create final metadata CSV reflecting the cleaned corpus.
 Scans the actual cleaned corpus directories and generates fresh metadata.
+
+Scans are incremental: a manifest records each file's size, mtime, hash and
+line/word counts, and only new or changed files are read. Files that have
+disappeared drop out of the metadata. Use --full to re-read everything.
 """
 
 import csv
+import sys
+import argparse
 from pathlib import Path
 from collections import Counter
 import hashlib
 
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.corpus.manifest import FileManifest
+from poetry_bert.corpus.reader import CorpusReader
+
 BASE_DIR = Path("/Users/justin/Repos/AI Project")
 POETRY_PLATFORM_DIR = BASE_DIR / "data/processed/poetry_platform_renamed"
 GUTENBERG_DIR = BASE_DIR / "data/processed/gutenberg"
 OUTPUT_CSV = BASE_DIR / "data/metadata/corpus_final_metadata.csv"
+LISTING_CACHE_DIR = BASE_DIR / "data/cache/corpus_listing"
+MANIFEST_PATH = BASE_DIR / "data/cache/metadata_manifest.json"
 
 def extract_metadata_from_filename(filename):
     """Extract metadata from filename format: ID_Title_Author_Date.txt"""
@@ -27,30 +41,59 @@ def extract_metadata_from_filename(filename):
             return poem_id, title, author, date
     return None, filename.replace('.txt', ''), 'Unknown', 'unknown'
 
-def calculate_file_hash(filepath):
+def calculate_file_hash(record):
     """Calculate MD5 hash of file content for uniqueness verification."""
-    try:
-        with open(filepath, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
-    except:
+    if record.data is None:
         return None
+    return hashlib.md5(record.data).hexdigest()
 
-def count_lines_and_words(filepath):
+def count_lines_and_words(record):
     """Count lines and words in a file."""
-    try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            lines = len([line for line in content.split('\n') if line.strip()])
-            words = len(content.split())
-            return lines, words
-    except:
+    content = record.text()
+    if content is None:
         return 0, 0
-
-def scan_corpus():
-    """Scan corpus directories and extract metadata."""
+    lines = len([line for line in content.split('\n') if line.strip()])
+    words = len(content.split())
+    return lines, words
+
+def iter_file_metadata(reader, files, manifest, source):
+    """
+    Yield (file, entry, was_read) in listing order, reading only new or changed files.
+
+    entry holds md5, lines and words; unchanged files (same size and mtime
+    as in the manifest) take theirs from the manifest, all others are read
+    (in parallel) and recorded in it.
+    """
+    def manifest_key(corpus_file):
+        return f"{source}/{corpus_file.relpath}"
+
+    current = [manifest.lookup(manifest_key(f), f.size, f.mtime) for f in files]
+    changed = [f for f, entry in zip(files, current) if entry is None]
+    records = reader.iter_poems(changed)
+
+    for corpus_file, entry in zip(files, current):
+        was_read = entry is None
+        if was_read:
+            record = next(records)
+            lines, words = count_lines_and_words(record)
+            entry = {'md5': calculate_file_hash(record), 'lines': lines, 'words': words}
+            if entry['md5'] is not None:
+                manifest.update(manifest_key(corpus_file), corpus_file.size, corpus_file.mtime, **entry)
+        yield corpus_file, entry, was_read
+
+def scan_corpus(manifest=None):
+    """
+    Scan corpus directories and extract metadata.
+
+    Args:
+        manifest: FileManifest of previously scanned files (None: read every file)
+    """
+    manifest = manifest if manifest is not None else FileManifest()
     all_poems = []
     hashes_seen = set()
     duplicates_found = 0
+    seen_keys = set()
+    num_read = 0
 
     directories = [
         ('poetry_platform', POETRY_PLATFORM_DIR),
@@ -67,46 +110,52 @@ def scan_corpus():
         print(f"Scanning {source}...")
         file_count = 0
 
-        for author_dir in sorted(directory.iterdir()):
-            if not author_dir.is_dir():
-                continue
+        reader = CorpusReader(directory, listing_cache=LISTING_CACHE_DIR / f"{directory.name}.json")
+
+        # Re-stat every file: sizes and mtimes decide what must be re-read
+        files = reader.list_files(refresh_stats=True)
 
-            for filepath in author_dir.glob('*.txt'):
-                file_count += 1
-                if file_count % 10000 == 0:
-                    print(f"  Processed {file_count} files...")
-
-                poem_id, title, author, date = extract_metadata_from_filename(filepath.name)
-                lines, words = count_lines_and_words(filepath)
-                file_hash = calculate_file_hash(filepath)
-
-                # Check for duplicates
-                if file_hash in hashes_seen:
-                    duplicates_found += 1
-                    continue
-                hashes_seen.add(file_hash)
-
-                # Get file stats
-                stat = filepath.stat()
-
-                all_poems.append({
-                    'poem_id': poem_id,
-                    'title': title,
-                    'author': author,
-                    'date': date,
-                    'source': source,
-                    'filepath': f"{author_dir.name}/{filepath.name}",
-                    'lines': lines,
-                    'words': words,
-                    'file_size': stat.st_size,
-                    'content_hash': file_hash,
-                    'last_modified': stat.st_mtime
-                })
+        for corpus_file, entry, was_read in iter_file_metadata(reader, files, manifest, source):
+            file_count += 1
+            num_read += was_read
+            if file_count % 10000 == 0:
+                print(f"  Processed {file_count} files...")
+            seen_keys.add(f"{source}/{corpus_file.relpath}")
+
+            poem_id, title, author, date = extract_metadata_from_filename(corpus_file.name)
+            file_hash = entry['md5']
+
+            # Check for duplicates
+            if file_hash in hashes_seen:
+                duplicates_found += 1
+                continue
+            hashes_seen.add(file_hash)
+
+            all_poems.append({
+                'poem_id': poem_id,
+                'title': title,
+                'author': author,
+                'date': date,
+                'source': source,
+                'filepath': corpus_file.relpath,
+                'lines': entry['lines'],
+                'words': entry['words'],
+                'file_size': corpus_file.size,
+                'content_hash': file_hash,
+                'last_modified': corpus_file.mtime
+            })
 
         print(f"  Found {file_count} poems in {source}")
 
+    # Forget files that no longer exist
+    removed = [key for key in manifest if key not in seen_keys]
+    for key in removed:
+        manifest.remove(key)
+
     print(f"\nTotal poems: {len(all_poems)}")
     print(f"Duplicates skipped: {duplicates_found}")
+    print(f"New or changed files read: {num_read}")
+    print(f"Files removed since last scan: {len(removed)}")
 
     return all_poems
 
@@ -141,13 +190,24 @@ def write_csv(poems, output_path):
             writer.writerow(row)
 
 def main():
+    parser = argparse.ArgumentParser(description='Generate corpus metadata CSV')
+    parser.add_argument('--full', action='store_true',
+                       help='Re-read every file instead of only new or changed ones')
+    parser.add_argument('--manifest', type=str, default=str(MANIFEST_PATH),
+                       help='Manifest of scanned files (size, mtime, hash, counts)')
+    args = parser.parse_args()
+
     print("=" * 80)
     print("GENERATING FINAL CORPUS METADATA")
     print("=" * 80)
     print()
 
-    # Scan corpus
-    poems = scan_corpus()
+    # Scan corpus (incrementally, unless --full)
+    manifest = FileManifest(args.manifest)
+    if args.full:
+        manifest.clear()
+    poems = scan_corpus(manifest)
+    manifest.save()
 
     # Generate statistics
     print("\nGenerating statistics...")
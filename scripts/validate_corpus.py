@@ -10,101 +10,124 @@ This script validates:
 5. All files are readable and non-empty
 6. Filename format is correct
 7. CSV metadata is complete
+8. Content hashes match the files
+
+All checks are fed from a single parallel pass over the CSV rows: each file
+is stat'ed and read once (see poetry_bert.corpus.validation). Files whose
+size and mtime are unchanged since the last run are not read again; their
+hash and readability come from a manifest.
 
 Result: Validation report with pass/fail for each check
 """
 
 import csv
-import hashlib
+import sys
+import time
+import argparse
 from pathlib import Path
 from collections import Counter
-import json
-from datetime import datetime
+
+# Add src directory to path for package imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from poetry_bert.corpus.hashing import HashReport
+from poetry_bert.corpus.manifest import FileManifest
+from poetry_bert.corpus.reader import DEFAULT_IO_WORKERS, CorpusReader
+from poetry_bert.corpus.validation import Check, run_checks, visit_files
 
 # Configuration
 BASE_DIR = Path("/Users/justin/Repos/AI Project")
 CORPUS_DIR = BASE_DIR / "data/processed/poetry_platform_renamed"
 CSV_PATH = BASE_DIR / "data/metadata/corpus_final_metadata.csv"
+LISTING_CACHE = BASE_DIR / "data/cache/corpus_listing" / f"{CORPUS_DIR.name}.json"
+HASH_MANIFEST = BASE_DIR / "data/cache/hash_manifest" / f"{CORPUS_DIR.name}.json"
 
 
-class CorpusValidator:
-    def __init__(self, csv_path, corpus_dir):
-        self.csv_path = csv_path
-        self.corpus_dir = corpus_dir
-        self.csv_data = []
-        self.results = {}
+class FileCountCheck(Check):
+    """Test 1: file count on disk matches CSV row count."""
 
-    def load_csv(self):
-        """Load CSV data."""
-        print("Loading CSV...")
-        with open(self.csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            self.csv_data = list(reader)
-        print(f"✓ Loaded {len(self.csv_data)} entries from CSV\n")
+    name = 'File count match'
 
-    def validate_file_count(self):
-        """Validate that file count matches CSV count."""
+    def __init__(self, reader):
+        self.reader = reader
+        self.csv_count = 0
+
+    def visit(self, file_visit):
+        self.csv_count += 1
+
+    def finish(self):
         print("Test 1: File count = CSV count")
         print("-" * 60)
 
-        # Count files
-        file_count = 0
-        for author_dir in self.corpus_dir.iterdir():
-            if author_dir.is_dir():
-                file_count += len(list(author_dir.glob('*.txt')))
-
-        csv_count = len(self.csv_data)
+        file_count = len(self.reader.list_files())
 
         print(f"  Files on disk: {file_count}")
-        print(f"  Entries in CSV: {csv_count}")
+        print(f"  Entries in CSV: {self.csv_count}")
 
-        if file_count == csv_count:
+        if file_count == self.csv_count:
             print("  ✓ PASS: Counts match\n")
             return True
         else:
-            print(f"  ✗ FAIL: Mismatch of {abs(file_count - csv_count)} files\n")
+            print(f"  ✗ FAIL: Mismatch of {abs(file_count - self.csv_count)} files\n")
             return False
 
-    def validate_sequential_ids(self):
-        """Validate that poem_ids are sequential with no gaps."""
+
+class SequentialIdsCheck(Check):
+    """Test 2: poem_ids are sequential with no gaps."""
+
+    name = 'Sequential IDs'
+
+    def __init__(self):
+        self.poem_ids = []
+
+    def visit(self, file_visit):
+        self.poem_ids.append(int(file_visit.row['poem_id']))
+
+    def finish(self):
         print("Test 2: Sequential poem IDs (no gaps)")
         print("-" * 60)
 
-        poem_ids = [int(row['poem_id']) for row in self.csv_data]
-        poem_ids_sorted = sorted(poem_ids)
+        poem_ids_sorted = sorted(self.poem_ids)
 
         # Check for duplicates
-        duplicates = [id for id, count in Counter(poem_ids).items() if count > 1]
+        duplicates = [id for id, count in Counter(self.poem_ids).items() if count > 1]
         if duplicates:
             print(f"  ✗ FAIL: Found {len(duplicates)} duplicate poem_ids")
             print(f"  First few duplicates: {duplicates[:10]}\n")
             return False
 
         # Check sequentiality
-        expected_ids = list(range(1, len(poem_ids) + 1))
+        expected_ids = list(range(1, len(self.poem_ids) + 1))
 
         if poem_ids_sorted == expected_ids:
-            print(f"  ✓ PASS: IDs are sequential (1 → {len(poem_ids)})\n")
+            print(f"  ✓ PASS: IDs are sequential (1 → {len(self.poem_ids)})\n")
             return True
         else:
             # Find gaps
-            gaps = []
-            for i, expected_id in enumerate(expected_ids):
-                if expected_id != poem_ids_sorted[i]:
-                    gaps.append(expected_id)
+            gaps = [expected_id for expected_id, actual_id in zip(expected_ids, poem_ids_sorted)
+                    if expected_id != actual_id]
 
             print(f"  ✗ FAIL: Found {len(gaps)} gaps in ID sequence")
             print(f"  First few gaps: {gaps[:20]}\n")
             return False
 
-    def validate_unique_hashes(self):
-        """Validate that all content_hashes are unique."""
+
+class UniqueHashesCheck(Check):
+    """Test 3: content_hashes in the CSV are unique."""
+
+    name = 'Unique hashes'
+
+    def __init__(self):
+        self.hash_counts = Counter()
+
+    def visit(self, file_visit):
+        self.hash_counts[file_visit.row['content_hash']] += 1
+
+    def finish(self):
         print("Test 3: Unique content hashes (no duplicates)")
         print("-" * 60)
 
-        hashes = [row['content_hash'] for row in self.csv_data]
-        hash_counts = Counter(hashes)
-        duplicates = {h: count for h, count in hash_counts.items() if count > 1}
+        duplicates = {h: count for h, count in self.hash_counts.items() if count > 1}
 
         if duplicates:
             print(f"  ✗ FAIL: Found {len(duplicates)} duplicate hashes")
@@ -112,215 +135,258 @@ class CorpusValidator:
             print(f"  Example: {list(duplicates.items())[0]}\n")
             return False
         else:
-            print(f"  ✓ PASS: All {len(hashes)} content hashes are unique\n")
+            print(f"  ✓ PASS: All {sum(self.hash_counts.values())} content hashes are unique\n")
             return True
 
-    def validate_file_existence(self):
-        """Validate that all CSV filepaths point to existing files."""
-        print("Test 4: All CSV filepaths exist on disk")
-        print("-" * 60)
 
-        missing_files = []
-        checked = 0
+class FileExistenceCheck(Check):
+    """Test 4: every CSV filepath exists on disk."""
 
-        for row in self.csv_data:
-            filepath = self.corpus_dir / row['filepath']
-            if not filepath.exists():
-                missing_files.append(row['filepath'])
+    name = 'File existence'
 
-            checked += 1
-            if checked % 10000 == 0:
-                print(f"  Checked {checked} files...")
+    def __init__(self):
+        self.missing_files = []
+        self.checked = 0
 
-        if missing_files:
-            print(f"  ✗ FAIL: {len(missing_files)} files not found on disk")
-            print(f"  First few missing: {missing_files[:10]}\n")
+    def visit(self, file_visit):
+        self.checked += 1
+        if not file_visit.exists:
+            self.missing_files.append(file_visit.row['filepath'])
+
+    def finish(self):
+        print("Test 4: All CSV filepaths exist on disk")
+        print("-" * 60)
+
+        if self.missing_files:
+            print(f"  ✗ FAIL: {len(self.missing_files)} files not found on disk")
+            print(f"  First few missing: {self.missing_files[:10]}\n")
             return False
         else:
-            print(f"  ✓ PASS: All {len(self.csv_data)} files exist\n")
+            print(f"  ✓ PASS: All {self.checked} files exist\n")
             return True
 
-    def validate_file_readability(self):
-        """Validate that all files are readable and non-empty."""
-        print("Test 5: All files are readable and non-empty")
-        print("-" * 60)
-
-        unreadable = []
-        empty = []
-        checked = 0
 
-        for row in self.csv_data:
-            filepath = self.corpus_dir / row['filepath']
+class ReadabilityCheck(Check):
+    """Test 5: every existing file is readable UTF-8 and non-empty."""
 
-            if not filepath.exists():
-                continue
+    name = 'File readability'
 
-            # Check if empty
-            if filepath.stat().st_size == 0:
-                empty.append(row['filepath'])
-                continue
+    def __init__(self):
+        self.unreadable = []
+        self.empty = []
+        self.checked = 0
 
-            # Check if readable
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if not content.strip():
-                        empty.append(row['filepath'])
-            except Exception as e:
-                unreadable.append((row['filepath'], str(e)))
+    def visit(self, file_visit):
+        if not file_visit.exists:
+            return
+        if file_visit.empty:
+            self.empty.append(file_visit.row['filepath'])
+            return
+        if not file_visit.readable:
+            self.unreadable.append((file_visit.row['filepath'], file_visit.error))
+        self.checked += 1
 
-            checked += 1
-            if checked % 10000 == 0:
-                print(f"  Checked {checked} files...")
+    def finish(self):
+        print("Test 5: All files are readable and non-empty")
+        print("-" * 60)
 
         issues = []
-        if unreadable:
-            print(f"  ✗ Unreadable files: {len(unreadable)}")
+        if self.unreadable:
+            print(f"  ✗ Unreadable files: {len(self.unreadable)}")
             issues.append(False)
-        if empty:
-            print(f"  ✗ Empty files: {len(empty)}")
+        if self.empty:
+            print(f"  ✗ Empty files: {len(self.empty)}")
             issues.append(False)
 
         if not issues:
-            print(f"  ✓ PASS: All {checked} files are readable and non-empty\n")
+            print(f"  ✓ PASS: All {self.checked} files are readable and non-empty\n")
             return True
         else:
-            print(f"  ✗ FAIL: Found {len(unreadable) + len(empty)} problematic files\n")
+            print(f"  ✗ FAIL: Found {len(self.unreadable) + len(self.empty)} problematic files\n")
             return False
 
-    def validate_filename_format(self):
-        """Validate that filenames follow the correct format."""
-        print("Test 6: Filename format validation")
-        print("-" * 60)
-
-        # Expected format: NNNNNN_Title_Author_Date.txt
-        # where NNNNNN is a 6-digit number
 
-        invalid_formats = []
-        checked = 0
+class FilenameFormatCheck(Check):
+    """Test 6: filenames follow NNNNNN_Title_Author_Date.txt."""
 
-        for row in self.csv_data:
-            filename = Path(row['filepath']).name
+    name = 'Filename format'
 
-            # Check if starts with 6 digits
-            if not filename[:6].isdigit():
-                invalid_formats.append((filename, "Missing 6-digit ID prefix"))
-                continue
+    def __init__(self):
+        self.invalid_formats = []
+        self.checked = 0
 
-            # Check if ends with .txt
-            if not filename.endswith('.txt'):
-                invalid_formats.append((filename, "Missing .txt extension"))
-                continue
+    def visit(self, file_visit):
+        filename = Path(file_visit.row['filepath']).name
 
-            # Check for underscores (should have at least 3)
-            if filename.count('_') < 3:
-                invalid_formats.append((filename, "Missing underscores (need 3+)"))
-                continue
+        # Check if starts with 6 digits
+        if not filename[:6].isdigit():
+            self.invalid_formats.append((filename, "Missing 6-digit ID prefix"))
+        # Check if ends with .txt
+        elif not filename.endswith('.txt'):
+            self.invalid_formats.append((filename, "Missing .txt extension"))
+        # Check for underscores (should have at least 3)
+        elif filename.count('_') < 3:
+            self.invalid_formats.append((filename, "Missing underscores (need 3+)"))
+        else:
+            self.checked += 1
 
-            checked += 1
-            if checked % 10000 == 0:
-                print(f"  Checked {checked} filenames...")
+    def finish(self):
+        print("Test 6: Filename format validation")
+        print("-" * 60)
 
-        if invalid_formats:
-            print(f"  ✗ FAIL: {len(invalid_formats)} filenames with invalid format")
+        if self.invalid_formats:
+            print(f"  ✗ FAIL: {len(self.invalid_formats)} filenames with invalid format")
             print(f"  Examples:")
-            for filename, reason in invalid_formats[:5]:
+            for filename, reason in self.invalid_formats[:5]:
                 print(f"    {filename}: {reason}")
             print()
             return False
         else:
-            print(f"  ✓ PASS: All {checked} filenames follow correct format\n")
+            print(f"  ✓ PASS: All {self.checked} filenames follow correct format\n")
             return True
 
-    def validate_metadata_completeness(self):
-        """Validate that all required CSV fields are complete."""
-        print("Test 7: Metadata completeness")
-        print("-" * 60)
 
-        required_fields = [
-            'poem_id', 'title', 'author', 'date', 'source',
-            'filepath', 'lines', 'words', 'content_hash'
-        ]
+class MetadataCompletenessCheck(Check):
+    """Test 7: all required CSV fields are filled in."""
+
+    name = 'Metadata completeness'
+
+    REQUIRED_FIELDS = [
+        'poem_id', 'title', 'author', 'date', 'source',
+        'filepath', 'lines', 'words', 'content_hash'
+    ]
 
-        incomplete_records = []
+    def __init__(self):
+        self.incomplete_records = []
+        self.checked = 0
 
-        for row in self.csv_data:
-            missing_fields = []
-            for field in required_fields:
-                if not row.get(field) or row[field].strip() == '':
-                    missing_fields.append(field)
+    def visit(self, file_visit):
+        row = file_visit.row
+        self.checked += 1
+        missing_fields = [field for field in self.REQUIRED_FIELDS
+                          if not row.get(field) or row[field].strip() == '']
 
-            if missing_fields:
-                incomplete_records.append({
-                    'poem_id': row.get('poem_id'),
-                    'title': row.get('title'),
-                    'missing_fields': missing_fields
-                })
+        if missing_fields:
+            self.incomplete_records.append({
+                'poem_id': row.get('poem_id'),
+                'title': row.get('title'),
+                'missing_fields': missing_fields
+            })
 
-        if incomplete_records:
-            print(f"  ✗ FAIL: {len(incomplete_records)} records with missing fields")
+    def finish(self):
+        print("Test 7: Metadata completeness")
+        print("-" * 60)
+
+        if self.incomplete_records:
+            print(f"  ✗ FAIL: {len(self.incomplete_records)} records with missing fields")
             print(f"  Examples:")
-            for record in incomplete_records[:5]:
+            for record in self.incomplete_records[:5]:
                 print(f"    Poem {record['poem_id']}: Missing {record['missing_fields']}")
             print()
             return False
         else:
-            print(f"  ✓ PASS: All {len(self.csv_data)} records have complete metadata\n")
+            print(f"  ✓ PASS: All {self.checked} records have complete metadata\n")
             return True
 
-    def validate_hash_integrity(self):
-        """Spot-check content hashes against actual file content."""
-        print("Test 8: Content hash integrity (spot check)")
+
+class HashIntegrityCheck(Check):
+    """Test 8: content hashes match the files."""
+
+    name = 'Hash integrity'
+
+    def __init__(self):
+        self.mismatches = []
+        self.report = HashReport()
+        self.start = time.perf_counter()
+
+    def visit(self, file_visit):
+        if not file_visit.exists:
+            return
+        row = file_visit.row
+
+        if file_visit.md5 is None:
+            self.report.errors[file_visit.relpath] = file_visit.error
+            self.mismatches.append({
+                'poem_id': row['poem_id'],
+                'filepath': row['filepath'],
+                'error': file_visit.error
+            })
+            return
+
+        self.report.hashes[file_visit.relpath] = file_visit.md5
+        if file_visit.from_manifest:
+            self.report.num_skipped += 1
+        else:
+            self.report.num_hashed += 1
+            self.report.bytes_hashed += file_visit.size
+
+        if file_visit.md5 != row['content_hash']:
+            self.mismatches.append({
+                'poem_id': row['poem_id'],
+                'filepath': row['filepath'],
+                'csv_hash': row['content_hash'],
+                'actual_hash': file_visit.md5
+            })
+
+    def finish(self):
+        report = self.report
+        report.seconds = time.perf_counter() - self.start
+
+        print("Test 8: Content hash integrity")
         print("-" * 60)
 
-        # Sample 100 random poems
-        import random
-        sample_size = min(100, len(self.csv_data))
-        sample = random.sample(self.csv_data, sample_size)
-
-        mismatches = []
-
-        for i, row in enumerate(sample, 1):
-            if i % 20 == 0:
-                print(f"  Checked {i}/{sample_size} hashes...")
-
-            filepath = self.corpus_dir / row['filepath']
-
-            if not filepath.exists():
-                continue
-
-            # Calculate hash
-            try:
-                with open(filepath, 'rb') as f:
-                    actual_hash = hashlib.md5(f.read()).hexdigest()
-
-                if actual_hash != row['content_hash']:
-                    mismatches.append({
-                        'poem_id': row['poem_id'],
-                        'filepath': row['filepath'],
-                        'csv_hash': row['content_hash'],
-                        'actual_hash': actual_hash
-                    })
-            except Exception as e:
-                mismatches.append({
-                    'poem_id': row['poem_id'],
-                    'filepath': row['filepath'],
-                    'error': str(e)
-                })
-
-        if mismatches:
-            print(f"  ✗ FAIL: {len(mismatches)} hash mismatches in sample")
+        print(f"  Checked: {report.num_files} files in {report.seconds:.1f}s "
+              f"({report.files_per_second:.0f} files/s)")
+        print(f"  Hashed: {report.num_hashed} files, {report.bytes_hashed / 1e6:.1f} MB "
+              f"({report.megabytes_per_second:.1f} MB/s)")
+        print(f"  Unchanged since last verification (skipped): {report.num_skipped}")
+
+        if self.mismatches:
+            print(f"  ✗ FAIL: {len(self.mismatches)} hash mismatches")
             print(f"  Examples:")
-            for m in mismatches[:3]:
+            for m in self.mismatches[:3]:
                 print(f"    Poem {m['poem_id']}: {m.get('error', 'Hash mismatch')}")
             print()
             return False
         else:
-            print(f"  ✓ PASS: All {sample_size} sampled hashes match\n")
+            print(f"  ✓ PASS: All {report.num_files} hashes match\n")
             return True
 
+
+class CorpusValidator:
+    def __init__(self, csv_path, corpus_dir, listing_cache=None,
+                 hash_manifest=None, num_workers=DEFAULT_IO_WORKERS):
+        self.csv_path = csv_path
+        self.corpus_dir = corpus_dir
+        self.reader = CorpusReader(corpus_dir, listing_cache=listing_cache, num_workers=num_workers)
+        self.hash_manifest = hash_manifest
+        self.num_workers = num_workers
+        self.csv_data = []
+        self.results = {}
+
+    def load_csv(self):
+        """Load CSV data."""
+        print("Loading CSV...")
+        with open(self.csv_path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            self.csv_data = list(reader)
+        print(f"✓ Loaded {len(self.csv_data)} entries from CSV\n")
+
+    def build_checks(self):
+        """Checks run on every row, in report order."""
+        return [
+            FileCountCheck(self.reader),
+            SequentialIdsCheck(),
+            UniqueHashesCheck(),
+            FileExistenceCheck(),
+            ReadabilityCheck(),
+            FilenameFormatCheck(),
+            MetadataCompletenessCheck(),
+            HashIntegrityCheck(),
+        ]
+
     def run_all_tests(self):
-        """Run all validation tests."""
+        """Run all validation tests in a single pass over the corpus."""
         print("=" * 80)
         print("CORPUS VALIDATION SUITE")
         print("=" * 80)
@@ -328,21 +394,17 @@ class CorpusValidator:
 
         self.load_csv()
 
-        # Run all tests
-        tests = [
-            ('File count match', self.validate_file_count),
-            ('Sequential IDs', self.validate_sequential_ids),
-            ('Unique hashes', self.validate_unique_hashes),
-            ('File existence', self.validate_file_existence),
-            ('File readability', self.validate_file_readability),
-            ('Filename format', self.validate_filename_format),
-            ('Metadata completeness', self.validate_metadata_completeness),
-            ('Hash integrity', self.validate_hash_integrity),
-        ]
-
-        results = {}
-        for test_name, test_func in tests:
-            results[test_name] = test_func()
+        # One visit per row (stat + read + hash + decode) feeds every check
+        print(f"Visiting {len(self.csv_data)} files with {self.num_workers} threads...")
+        manifest = FileManifest(self.hash_manifest)
+        start = time.perf_counter()
+        results = run_checks(
+            self.build_checks(),
+            visit_files(self.corpus_dir, self.csv_data, manifest=manifest, num_workers=self.num_workers)
+        )
+        seconds = time.perf_counter() - start
+        manifest.save()
+        self.results = results
 
         # Summary
         print("=" * 80)
@@ -359,6 +421,8 @@ class CorpusValidator:
 
         print()
         print(f"Tests passed: {passed}/{total}")
+        rate = len(self.csv_data) / seconds if seconds else 0.0
+        print(f"Validated {len(self.csv_data)} files in {seconds:.1f}s ({rate:.0f} files/s)")
 
         if passed == total:
             print("\n🎉 ALL TESTS PASSED! Corpus is valid.\n")
@@ -369,11 +433,24 @@ class CorpusValidator:
 
 
 def main():
-    validator = CorpusValidator(CSV_PATH, CORPUS_DIR)
+    parser = argparse.ArgumentParser(description='Validate the poetry corpus against its metadata CSV')
+    parser.add_argument('--hash-manifest', type=str, default=str(HASH_MANIFEST),
+                       help='Manifest of verified files; unchanged files are not re-read')
+    parser.add_argument('--no-manifest', action='store_true',
+                       help='Read and hash every file, ignoring the manifest')
+    parser.add_argument('--workers', type=int, default=DEFAULT_IO_WORKERS,
+                       help='Threads for stat/read/hash')
+    args = parser.parse_args()
+
+    validator = CorpusValidator(
+        CSV_PATH, CORPUS_DIR,
+        listing_cache=LISTING_CACHE,
+        hash_manifest=None if args.no_manifest else args.hash_manifest,
+        num_workers=args.workers
+    )
     success = validator.run_all_tests()
 
     # Exit code
-    import sys
     sys.exit(0 if success else 1)
 
 
@@ -12,27 +12,121 @@ This script processes text data using sentence transformers to:
 import pandas as pd
 import numpy as np
 import json
-import pickle
-from typing import List, Tuple
+import hashlib
+from pathlib import Path
+from typing import List, Optional, Tuple
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from .embedding_store import EmbeddingStore
 import warnings
 warnings.filterwarnings('ignore')
 
 
+class EmbeddingCache:
+    """
+    Persistent text -> embedding cache, keyed by content hash.
+    
+    Keys are BLAKE2b digests of the model name and the exact text. Each
+    put_many() call appends one segment (keys and float32 vectors as .npy
+    files); segments are memory-mapped when the cache is opened.
+    """
+    
+    def __init__(self, cache_dir: str, model_name: str):
+        """
+        Args:
+            cache_dir: Root cache directory
+            model_name: Model the embeddings come from (one subdirectory per model)
+        """
+        self.model_name = model_name
+        self.path = Path(cache_dir) / model_name.replace('/', '__')
+        self.path.mkdir(parents=True, exist_ok=True)
+        
+        self._segments = []
+        self._index = {}
+        for keys_file in sorted(self.path.glob('keys-*.npy')):
+            self._load_segment(keys_file)
+    
+    def _load_segment(self, keys_file: Path) -> None:
+        """Memory-map one segment and index its keys."""
+        vectors_file = keys_file.with_name(keys_file.name.replace('keys-', 'vectors-'))
+        keys = np.load(keys_file)
+        vectors = np.load(vectors_file, mmap_mode='r')
+        segment = len(self._segments)
+        self._segments.append(vectors)
+        for row, key in enumerate(keys.tolist()):
+            self._index[key] = (segment, row)
+    
+    def key(self, text: str) -> bytes:
+        """Content hash of a text under this cache's model."""
+        payload = f"{self.model_name}\x1f{text}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=16).digest()
+    
+    def __len__(self):
+        return len(self._index)
+    
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Look up cached embeddings.
+        
+        Args:
+            texts: Texts to look up
+            
+        Returns:
+            (found, vectors): boolean mask over texts, and the embeddings of
+            the found texts in order (None if nothing was found)
+        """
+        locations = [self._index.get(self.key(text)) for text in texts]
+        found = np.array([loc is not None for loc in locations], dtype=bool)
+        if not found.any():
+            return found, None
+        vectors = np.stack([
+            self._segments[seg][row] for seg, row in (loc for loc in locations if loc is not None)
+        ])
+        return found, vectors
+    
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Append embeddings for texts as a new segment.
+        
+        Args:
+            texts: Texts that were encoded
+            vectors: Their embeddings, [len(texts), dim]
+        """
+        if len(texts) == 0:
+            return
+        segment = len(self._segments)
+        keys_file = self.path / f'keys-{segment:05d}.npy'
+        vectors_file = self.path / f'vectors-{segment:05d}.npy'
+        
+        # Vectors first: a segment only counts once its keys file exists
+        np.save(vectors_file, np.asarray(vectors, dtype=np.float32))
+        np.save(keys_file, np.array([self.key(text) for text in texts], dtype='S16'))
+        self._load_segment(keys_file)
+
+
 class TextEmbeddingAnalyzer:
     """Class to handle text embedding analysis with sentence transformers."""
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        cache_dir: Optional[str] = None,
+        batch_size: int = 256
+    ):
         """
         Initialize the analyzer with a sentence transformer model.
         
         Args:
             model_name: Name of the sentence transformer model to use
+            cache_dir: Directory for the persistent embedding cache (None: no cache)
+            batch_size: Encoding batch size for corpus-level embedding
         """
         print(f"Loading model: {model_name}")
         self.model = SentenceTransformer(model_name)
         print("Model loaded successfully!")
+        
+        self.batch_size = batch_size
+        self.cache = EmbeddingCache(cache_dir, model_name) if cache_dir else None
     
     def generate_embeddings(self, text_list: List[str]) -> np.ndarray:
         """
@@ -51,17 +145,83 @@ class TextEmbeddingAnalyzer:
         embeddings = self.model.encode(text_list, convert_to_numpy=True)
         return embeddings
     
-    def save_embeddings(self, embeddings: np.ndarray, filepath: str) -> None:
+    def generate_corpus_embeddings(self, poems: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Function 2: Save embeddings to a pickle file.
+        Generate embeddings for every line of every poem in a few large batches.
+        
+        All lines are flattened and deduplicated, cached embeddings are
+        reused, and the remaining lines are encoded in one call (which sorts
+        them by length into batches of batch_size). Results are scattered
+        back into corpus order.
         
         Args:
-            embeddings: numpy array of embeddings
-            filepath: path to save the pickle file
+            poems: List of poems, each a list of line strings
+            
+        Returns:
+            (embeddings, offsets): embeddings [total_lines, dim] for all lines
+            in order, and poem offsets [num_poems + 1]; poem i's embeddings are
+            embeddings[offsets[i]:offsets[i + 1]]
+        """
+        offsets = np.zeros(len(poems) + 1, dtype=np.int64)
+        np.cumsum([len(lines) for lines in poems], out=offsets[1:])
+        
+        # Deduplicate: each distinct line is encoded (or looked up) once
+        unique_index = {}
+        line_to_unique = np.fromiter(
+            (unique_index.setdefault(line, len(unique_index)) for lines in poems for line in lines),
+            dtype=np.int64, count=int(offsets[-1])
+        )
+        unique_texts = list(unique_index)
+        dim = self.model.get_sentence_embedding_dimension()
+        unique_embeddings = np.zeros((len(unique_texts), dim), dtype=np.float32)
+        
+        missing = np.ones(len(unique_texts), dtype=bool)
+        if self.cache is not None and unique_texts:
+            found, cached = self.cache.get_many(unique_texts)
+            if cached is not None:
+                unique_embeddings[found] = cached
+            missing = ~found
+        
+        to_encode = [unique_texts[i] for i in np.flatnonzero(missing)]
+        print(f"{int(offsets[-1])} lines, {len(unique_texts)} distinct, "
+              f"{len(to_encode)} to encode")
+        if to_encode:
+            encoded = self.model.encode(
+                to_encode, batch_size=self.batch_size, convert_to_numpy=True
+            )
+            unique_embeddings[missing] = encoded
+            if self.cache is not None:
+                self.cache.put_many(to_encode, encoded)
+        
+        return unique_embeddings[line_to_unique], offsets
+    
+    def save_embeddings(
+        self,
+        embeddings: List[np.ndarray],
+        filepath: str,
+        poem_ids: Optional[List] = None,
+        dtype: str = 'float16'
+    ) -> EmbeddingStore:
         """
-        with open(filepath, 'wb') as f:
-            pickle.dump(embeddings, f)
+        Function 2: Save embeddings to a memory-mapped embedding store.
+        
+        Args:
+            embeddings: list of per-poem embedding arrays
+            filepath: embedding store directory (appended to if it exists)
+            poem_ids: identifier of each poem (default: list positions)
+            dtype: storage precision for a new store, 'float16' or 'float32'
+            
+        Returns:
+            the EmbeddingStore written to
+        """
+        if poem_ids is None:
+            poem_ids = list(range(len(embeddings)))
+        dim = self.model.get_sentence_embedding_dimension()
+        
+        store = EmbeddingStore(filepath, dim=dim, dtype=dtype)
+        store.append_poems(dict(zip(poem_ids, embeddings)))
         print(f"Embeddings saved to {filepath}")
+        return store
     
     def consecutive_cosine_similarities(self, embeddings: np.ndarray) -> Tuple[float, float]:
         """
@@ -76,14 +236,10 @@ class TextEmbeddingAnalyzer:
         if len(embeddings) < 2:
             return np.nan, np.nan
         
-        similarities = []
-        for i in range(len(embeddings) - 1):
-            # Calculate cosine similarity between consecutive embeddings
-            sim = cosine_similarity(
-                embeddings[i].reshape(1, -1), 
-                embeddings[i + 1].reshape(1, -1)
-            )[0, 0]
-            similarities.append(sim)
+        # Cosine similarity of each line with the next: row-wise dot products
+        # of the normalized embeddings
+        normalized = _normalize_rows(embeddings)
+        similarities = np.einsum('ij,ij->i', normalized[:-1], normalized[1:])
         
         return np.mean(similarities), np.std(similarities)
     
@@ -100,11 +256,8 @@ class TextEmbeddingAnalyzer:
         if len(embeddings) < 2:
             return np.nan
         
-        first_embedding = embeddings[0].reshape(1, -1)
-        last_embedding = embeddings[-1].reshape(1, -1)
-        
-        similarity = cosine_similarity(first_embedding, last_embedding)[0, 0]
-        return similarity
+        first_embedding, last_embedding = _normalize_rows(embeddings[[0, -1]])
+        return np.dot(first_embedding, last_embedding)
     
     def semantic_breadth(self, embeddings: np.ndarray) -> float:
         """
@@ -121,18 +274,86 @@ class TextEmbeddingAnalyzer:
             return np.nan
         
         # Calculate the mean embedding
-        mean_embedding = np.mean(embeddings, axis=0).reshape(1, -1)
+        mean_embedding = _normalize_rows(np.mean(embeddings, axis=0, keepdims=True))[0]
         
-        # Calculate cosine similarity of each embedding to the mean
-        similarities = []
-        for embedding in embeddings:
-            sim = cosine_similarity(
-                embedding.reshape(1, -1), 
-                mean_embedding
-            )[0, 0]
-            similarities.append(sim)
+        # Cosine similarity of each embedding to the mean
+        similarities = _normalize_rows(embeddings) @ mean_embedding
         
         return np.mean(similarities)
+    
+    def segmented_metrics(self, embeddings: np.ndarray, offsets: np.ndarray) -> dict:
+        """
+        Calculate functions 3-5 for all poems at once.
+        
+        Args:
+            embeddings: embeddings of all lines, [total_lines, dim]
+            offsets: poem offsets [num_poems + 1], as returned by
+                generate_corpus_embeddings()
+            
+        Returns:
+            dictionary of per-poem arrays [num_poems]: consecutive_cosine_mean,
+            consecutive_cosine_std, first_last_cosine_similarity and
+            semantic_breadth (NaN where the poem has too few lines)
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+        num_poems = len(lengths)
+        normalized = _normalize_rows(embeddings)
+        poem_of_line = np.repeat(np.arange(num_poems), lengths)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Consecutive pairs, dropping pairs that straddle two poems
+            pair_similarities = np.einsum('ij,ij->i', normalized[:-1], normalized[1:])
+            same_poem = poem_of_line[:-1] == poem_of_line[1:]
+            pair_poem = poem_of_line[:-1][same_poem]
+            pair_similarities = pair_similarities[same_poem]
+            pair_counts = np.bincount(pair_poem, minlength=num_poems)
+            consecutive_mean = np.bincount(
+                pair_poem, weights=pair_similarities, minlength=num_poems
+            ) / pair_counts
+            consecutive_std = np.sqrt(np.bincount(
+                pair_poem, weights=(pair_similarities - consecutive_mean[pair_poem]) ** 2,
+                minlength=num_poems
+            ) / pair_counts)
+            
+            # First vs last line
+            first_last = np.full(num_poems, np.nan)
+            multi_line = lengths >= 2
+            first_last[multi_line] = np.einsum(
+                'ij,ij->i',
+                normalized[offsets[:-1][multi_line]],
+                normalized[offsets[1:][multi_line] - 1]
+            )
+            
+            # Each line against its poem's mean embedding (segment sums via reduceat)
+            non_empty = lengths > 0
+            mean_embeddings = np.zeros((num_poems, embeddings.shape[-1]), dtype=np.float64)
+            if non_empty.any():
+                mean_embeddings[non_empty] = np.add.reduceat(
+                    np.asarray(embeddings, dtype=np.float64), offsets[:-1][non_empty], axis=0
+                ) / lengths[non_empty, None]
+            mean_normalized = _normalize_rows(mean_embeddings)
+            line_similarities = np.einsum('ij,ij->i', normalized, mean_normalized[poem_of_line])
+            breadth = np.bincount(
+                poem_of_line, weights=line_similarities, minlength=num_poems
+            ) / lengths
+        
+        consecutive_mean[pair_counts == 0] = np.nan
+        consecutive_std[pair_counts == 0] = np.nan
+        breadth[~non_empty] = np.nan
+        
+        return {
+            'consecutive_cosine_mean': consecutive_mean,
+            'consecutive_cosine_std': consecutive_std,
+            'first_last_cosine_similarity': first_last,
+            'semantic_breadth': breadth
+        }
+
+
+def _normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize rows; all-zero rows stay zero (as in sklearn's cosine_similarity)."""
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
 
 
 def load_and_process_data(csv_filepath: str, analyzer: TextEmbeddingAnalyzer) -> pd.DataFrame:
@@ -186,11 +407,37 @@ def process_row(row, analyzer: TextEmbeddingAnalyzer) -> dict:
     }
 
 
+def process_corpus(df: pd.DataFrame, analyzer: TextEmbeddingAnalyzer) -> List[dict]:
+    """
+    Process all rows with corpus-level batched embedding.
+    
+    Args:
+        df: DataFrame with a parsed 'text_parsed' column
+        analyzer: TextEmbeddingAnalyzer instance
+        
+    Returns:
+        list of dictionaries with calculated metrics, one per row (as process_row)
+    """
+    embeddings, offsets = analyzer.generate_corpus_embeddings(df['text_parsed'].tolist())
+    metrics = analyzer.segmented_metrics(embeddings, offsets)
+    
+    return [
+        {
+            'embeddings': embeddings[offsets[i]:offsets[i + 1]],
+            **{name: values[i] for name, values in metrics.items()}
+        }
+        for i in range(len(df))
+    ]
+
+
 def main():
     """Main function to run the text embedding analysis."""
     
-    # Initialize the analyzer with mini L6 model
-    analyzer = TextEmbeddingAnalyzer('all-MiniLM-L6-v2')
+    # Initialize the analyzer with mini L6 model (reruns reuse cached embeddings)
+    analyzer = TextEmbeddingAnalyzer(
+        'all-MiniLM-L6-v2',
+        cache_dir='/Users/justin/Repos/AI Project/Data/embedding_cache'
+    )
     
     # Load and process the data
     csv_filepath = '/Users/justin/Repos/AI Project/Data/poetry_all_clean.csv'
@@ -200,28 +447,24 @@ def main():
         df=df[:10]
         print('test mode!')
         print(df)
-    # Process each ro
+    # Embed all rows at once, then calculate metrics per row
     print("Processing rows and calculating metrics...")
-    results = []
-    embeddings_list = []
-    
-    for idx, row in df.iterrows():
-        print(f"Processing row {idx + 1}/{len(df)}")
-        result = process_row(row, analyzer)
-        results.append(result)
-        embeddings_list.append(result['embeddings'])
+    results = process_corpus(df, analyzer)
     
     # Add results to dataframe
-    df['embeddings'] = embeddings_list
+    df['embeddings'] = [r['embeddings'] for r in results]
     df['consecutive_cosine_mean'] = [r['consecutive_cosine_mean'] for r in results]
     df['consecutive_cosine_std'] = [r['consecutive_cosine_std'] for r in results]
     df['first_last_cosine_similarity'] = [r['first_last_cosine_similarity'] for r in results]
     df['semantic_breadth'] = [r['semantic_breadth'] for r in results]
     
-    # Save embeddings as pickle file
-    print("Saving embeddings to pickle file...")
-    all_embeddings = df['embeddings'].tolist()
-    analyzer.save_embeddings(all_embeddings, '/Users/justin/Repos/AI Project/Data/embeddings.pkl')
+    # Save embeddings to the memory-mapped store, keyed by CSV row;
+    # rows already stored by an earlier run are not written again
+    print("Saving embeddings to embedding store...")
+    store_path = '/Users/justin/Repos/AI Project/Data/embeddings'
+    stored = EmbeddingStore(store_path) if Path(store_path, 'meta.json').exists() else None
+    new_rows = [idx for idx in df.index.tolist() if stored is None or idx not in stored]
+    analyzer.save_embeddings(df.loc[new_rows, 'embeddings'].tolist(), store_path, poem_ids=new_rows)
     
     # Save final CSV without embeddings column
     print("Saving results to CSV...")
@@ -230,7 +473,7 @@ def main():
     
     print("Analysis complete!")
     print(f"Results saved to: results_with_metrics.csv")
-    print(f"Embeddings saved to: embeddings.pkl")
+    print(f"Embeddings saved to: embeddings/ (EmbeddingStore)")
     
     # Display summary statistics
     print("\nSummary Statistics:")
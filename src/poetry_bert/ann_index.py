@@ -0,0 +1,510 @@
+"""
+Approximate Nearest-Neighbour Search over Line and Poem Embeddings
+
+Cosine-similarity search in pure numpy:
+- exact_search(): blocked brute force, the reference (and fallback)
+- IVFIndex: inverted-file index. Vectors are clustered with spherical
+  k-means; a query only scores the vectors in its nprobe closest clusters.
+- EmbeddingSearch: an index over an EmbeddingStore that answers "most
+  similar lines/poems to X" with poem ids and line numbers
+
+Index layout on disk (IVFIndex.save):
+    meta.json           nlist, dim, dtype
+    centroids.npy       [nlist, dim] float32, unit norm
+    vectors.npy         [N, dim] unit-norm vectors, grouped by cluster
+    ids.npy             [N] int64 caller id of each row of vectors.npy
+    list_offsets.npy    [nlist + 1] row offset of each cluster
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Collections up to this size are searched exactly; clustering would not pay off
+EXACT_SEARCH_THRESHOLD = 20_000
+
+# Rows scored per matrix product in brute-force search and assignment
+BLOCK_SIZE = 65_536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows as float32 (all-zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores along the last axis, best first."""
+    k = min(k, scores.shape[-1])
+    if k == 0:
+        return np.zeros(scores.shape[:-1] + (0,), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(top, order, axis=-1)
+
+
+def _pad(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pad (scores, ids) rows to k entries with (-inf, -1)."""
+    missing = k - scores.shape[-1]
+    if missing <= 0:
+        return scores, ids
+    shape = scores.shape[:-1] + (missing,)
+    return (
+        np.concatenate([scores, np.full(shape, -np.inf, dtype=scores.dtype)], axis=-1),
+        np.concatenate([ids, np.full(shape, -1, dtype=np.int64)], axis=-1),
+    )
+
+
+def exact_search(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    block_size: int = BLOCK_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force cosine search.
+
+    Args:
+        vectors: [N, dim] unit-norm vectors (may be memory-mapped)
+        queries: [Q, dim] unit-norm queries
+        k: Neighbours per query
+        block_size: Vectors scored per matrix product
+
+    Returns:
+        (scores, rows), each [Q, k], best first; missing entries are (-inf, -1)
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        rows = np.concatenate(
+            [best_rows, np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))],
+            axis=1
+        )
+        top = _top_k(scores, k)
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_rows = np.take_along_axis(rows, top, axis=1)
+
+    return _pad(best_scores, best_rows, k)
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    num_clusters: int,
+    num_iterations: int = 10,
+    seed: int = 42
+) -> np.ndarray:
+    """
+    Cluster unit-norm vectors by cosine similarity.
+
+    Args:
+        vectors: [N, dim] unit-norm training vectors
+        num_clusters: Number of centroids
+        num_iterations: Lloyd iterations
+        seed: Random seed for initialization and empty-cluster reseeding
+
+    Returns:
+        [num_clusters, dim] unit-norm centroids
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)].copy()
+
+    for _ in range(num_iterations):
+        assignment = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=num_clusters)
+
+        # Reseed empty clusters with random training vectors
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize(sums)
+
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block_size: int = BLOCK_SIZE) -> np.ndarray:
+    """Closest centroid of each vector, computed in blocks."""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+def _permute_rows(array: np.ndarray, order: np.ndarray, block_size: int = BLOCK_SIZE) -> None:
+    """
+    Reorder rows in place so that array[i] becomes the old array[order[i]].
+
+    Follows the cycles of the permutation, moving up to block_size rows at a
+    time, so the extra memory is one block rather than a second array.
+    """
+    done = np.zeros(len(order), dtype=bool)
+    order_list = order.tolist()
+    for start in np.flatnonzero(order != np.arange(len(order))).tolist():
+        if done[start]:
+            continue
+        cycle = [start]
+        row = order_list[start]
+        while row != start:
+            cycle.append(row)
+            row = order_list[row]
+        cycle = np.array(cycle)
+        done[cycle] = True
+
+        first = array[cycle[0]].copy()
+        for i in range(0, len(cycle) - 1, block_size):
+            stop = min(i + block_size, len(cycle) - 1)
+            array[cycle[i:stop]] = array[cycle[i + 1:stop + 1]]
+        array[cycle[-1]] = first
+
+
+class IVFIndex:
+    """
+    Inverted-file cosine index with exact brute-force fallback.
+
+    Vectors are stored normalized and grouped by cluster, so each probed
+    cluster is one contiguous slice.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        list_offsets: np.ndarray
+    ):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.list_offsets = list_offsets
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        ids: Optional[np.ndarray] = None,
+        nlist: Optional[int] = None,
+        train_size: Optional[int] = None,
+        num_iterations: int = 10,
+        dtype: str = 'float32',
+        seed: int = 42,
+        copy: bool = True
+    ) -> 'IVFIndex':
+        """
+        Build an index.
+
+        Args:
+            vectors: [N, dim] vectors (normalized here; may be memory-mapped)
+            ids: Caller id of each vector (default: row numbers)
+            nlist: Number of clusters (default: ~4 * sqrt(N); 1 for small N,
+                   which makes every search exact)
+            train_size: Vectors sampled to train the centroids
+                        (default: 64 per cluster)
+            num_iterations: k-means iterations
+            dtype: Storage dtype of the vectors, 'float32' or 'float16'
+            seed: Random seed
+            copy: With False, vectors (a writable array of the storage
+                  dtype) is normalized and reordered in place and becomes
+                  the index's storage, instead of being copied
+
+        Returns:
+            Built IVFIndex
+        """
+        num_vectors = len(vectors)
+        in_place = not copy and vectors.dtype == np.dtype(dtype) and vectors.flags.writeable
+        if in_place:
+            for start in range(0, num_vectors, BLOCK_SIZE):
+                vectors[start:start + BLOCK_SIZE] = normalize(vectors[start:start + BLOCK_SIZE])
+        ids = np.arange(num_vectors, dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        if nlist is None:
+            nlist = 1 if num_vectors <= EXACT_SEARCH_THRESHOLD else int(4 * np.sqrt(num_vectors))
+        nlist = max(1, min(nlist, num_vectors))
+
+        if nlist == 1:
+            centroids = normalize(np.ones((1, vectors.shape[1])))
+            assignment = np.zeros(num_vectors, dtype=np.int64)
+        else:
+            rng = np.random.default_rng(seed)
+            train_size = min(num_vectors, train_size or nlist * 64)
+            sample = np.sort(rng.choice(num_vectors, train_size, replace=False))
+            centroids = spherical_kmeans(
+                normalize(vectors[sample]), nlist, num_iterations=num_iterations, seed=seed
+            )
+            assignment = np.concatenate([
+                _assign(normalize(vectors[start:start + BLOCK_SIZE]), centroids)
+                for start in range(0, num_vectors, BLOCK_SIZE)
+            ])
+
+        order = np.argsort(assignment, kind='stable')
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=list_offsets[1:])
+
+        if in_place:
+            _permute_rows(vectors, order)
+            stored = vectors
+        else:
+            stored = np.empty((num_vectors, vectors.shape[1]), dtype=dtype)
+            for start in range(0, num_vectors, BLOCK_SIZE):
+                rows = order[start:start + BLOCK_SIZE]
+                stored[start:start + len(rows)] = normalize(vectors[rows])
+
+        return cls(centroids, stored, ids[order], list_offsets)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        nprobe: int = 8,
+        exact: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most cosine-similar vectors to each query.
+
+        Args:
+            queries: [Q, dim] or [dim] query vectors
+            k: Neighbours per query
+            nprobe: Clusters scanned per query (more: better recall, slower)
+            exact: Scan everything (brute force)
+
+        Returns:
+            (scores, ids), each [Q, k], best first; missing entries are (-inf, -1)
+        """
+        queries = normalize(np.atleast_2d(queries))
+
+        if exact or nprobe >= self.nlist:
+            scores, rows = exact_search(self.vectors, queries, k)
+            return scores, np.where(rows >= 0, self.ids[np.maximum(rows, 0)], -1)
+
+        # Each probed list is scored once, against all queries that probe it
+        num_queries = len(queries)
+        probes = _top_k(queries @ self.centroids.T, nprobe)
+        nprobe = probes.shape[1]
+        candidate_scores = np.full((num_queries, nprobe, k), -np.inf, dtype=np.float32)
+        candidate_rows = np.full((num_queries, nprobe, k), -1, dtype=np.int64)
+
+        probe_lists = probes.ravel()
+        probe_order = np.argsort(probe_lists, kind='stable')
+        boundaries = np.flatnonzero(np.diff(probe_lists[probe_order])) + 1
+        for group in np.split(probe_order, boundaries):
+            cluster = probe_lists[group[0]]
+            start, stop = self.list_offsets[cluster], self.list_offsets[cluster + 1]
+            if start == stop:
+                continue
+            query_rows, slots = np.divmod(group, nprobe)
+            block = np.asarray(self.vectors[start:stop], dtype=np.float32)
+            scores = queries[query_rows] @ block.T
+            top = _top_k(scores, k)
+            candidate_scores[query_rows, slots, :top.shape[1]] = np.take_along_axis(scores, top, axis=1)
+            candidate_rows[query_rows, slots, :top.shape[1]] = top + start
+
+        candidate_scores = candidate_scores.reshape(num_queries, -1)
+        candidate_rows = candidate_rows.reshape(num_queries, -1)
+        top = _top_k(candidate_scores, k)
+        all_scores = np.take_along_axis(candidate_scores, top, axis=1)
+        rows = np.take_along_axis(candidate_rows, top, axis=1)
+        all_ids = np.where(rows >= 0, self.ids[np.maximum(rows, 0)], -1)
+
+        return all_scores, all_ids
+
+    def save(self, path: str) -> None:
+        """Write the index to a directory."""
+        output_path = Path(path)
+        output_path.mkdir(parents=True, exist_ok=True)
+        np.save(output_path / 'centroids.npy', self.centroids)
+        np.save(output_path / 'vectors.npy', self.vectors)
+        np.save(output_path / 'ids.npy', self.ids)
+        np.save(output_path / 'list_offsets.npy', self.list_offsets)
+        with open(output_path / 'meta.json', 'w') as f:
+            json.dump({
+                'nlist': self.nlist,
+                'dim': int(self.vectors.shape[1]),
+                'dtype': str(self.vectors.dtype),
+                'num_vectors': len(self),
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'IVFIndex':
+        """
+        Read an index written by save().
+
+        Args:
+            path: Index directory
+            mmap: Memory-map the stored vectors instead of reading them
+        """
+        input_path = Path(path)
+        return cls(
+            np.load(input_path / 'centroids.npy'),
+            np.load(input_path / 'vectors.npy', mmap_mode='r' if mmap else None),
+            np.load(input_path / 'ids.npy'),
+            np.load(input_path / 'list_offsets.npy'),
+        )
+
+
+class EmbeddingSearch:
+    """
+    Most-similar lines or poems across an EmbeddingStore.
+
+    Line level indexes every line embedding; poem level indexes the mean of
+    each poem's line embeddings.
+    """
+
+    LEVELS = ('line', 'poem')
+
+    def __init__(
+        self,
+        index: IVFIndex,
+        level: str,
+        poem_ids: List,
+        row_poem: np.ndarray,
+        row_line: np.ndarray
+    ):
+        """
+        Args:
+            index: Index whose ids are rows of row_poem/row_line
+            level: 'line' or 'poem'
+            poem_ids: Poem identifiers
+            row_poem: [N] position in poem_ids of each indexed vector
+            row_line: [N] line number of each indexed vector (-1 at poem level)
+        """
+        self.index = index
+        self.level = level
+        self.poem_ids = poem_ids
+        self.row_poem = row_poem
+        self.row_line = row_line
+
+    @classmethod
+    def from_store(
+        cls,
+        store,
+        level: str = 'line',
+        memmap_path: Optional[str] = None,
+        **index_kwargs
+    ) -> 'EmbeddingSearch':
+        """
+        Build a search index over an EmbeddingStore.
+
+        The vectors are gathered into one preallocated array, which the index
+        then normalizes and reorders in place, so the store is copied once.
+
+        Args:
+            store: EmbeddingStore to index
+            level: 'line' or 'poem'
+            memmap_path: Gather the vectors into this .npy file (memory-mapped)
+                         instead of RAM
+            **index_kwargs: Passed to IVFIndex.build (nlist, dtype, ...)
+        """
+        if level not in cls.LEVELS:
+            raise ValueError(f"level must be one of {cls.LEVELS}, got {level}")
+
+        # Upper bound on rows: superseded poems and empty poems are skipped
+        capacity = store.num_vectors if level == 'line' else len(store)
+        shape = (capacity, store.dim)
+        dtype = index_kwargs.get('dtype', 'float32')
+        if memmap_path is not None:
+            vectors = np.lib.format.open_memmap(memmap_path, mode='w+', dtype=dtype, shape=shape)
+        else:
+            vectors = np.empty(shape, dtype=dtype)
+
+        num_vectors = 0
+        poem_ids, row_poem, row_line = [], [], []
+        for segment_ids, embeddings, row_ranges in store.iter_segments():
+            first = len(poem_ids)
+            poem_ids.extend(segment_ids)
+            lengths = row_ranges[:, 1] - row_ranges[:, 0]
+            if level == 'line':
+                for start, stop in row_ranges.tolist():
+                    vectors[num_vectors:num_vectors + stop - start] = embeddings[start:stop]
+                    num_vectors += stop - start
+                row_poem.append(np.repeat(np.arange(first, len(poem_ids)), lengths))
+                row_line.append(np.concatenate(
+                    [np.arange(n) for n in lengths] or [np.zeros(0, dtype=np.int64)]
+                ))
+            else:
+                keep = lengths > 0
+                for start, stop in row_ranges[keep].tolist():
+                    vectors[num_vectors] = np.asarray(embeddings[start:stop], dtype=np.float32).mean(axis=0)
+                    num_vectors += 1
+                row_poem.append(np.arange(first, len(poem_ids))[keep])
+                row_line.append(np.full(int(keep.sum()), -1))
+
+        index = IVFIndex.build(vectors[:num_vectors], copy=False, **index_kwargs)
+        return cls(
+            index,
+            level,
+            poem_ids,
+            np.concatenate(row_poem).astype(np.int64) if row_poem else np.zeros(0, np.int64),
+            np.concatenate(row_line).astype(np.int32) if row_line else np.zeros(0, np.int32),
+        )
+
+    def query(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        nprobe: int = 8,
+        exact: bool = False
+    ) -> List[List[Dict]]:
+        """
+        Most similar lines/poems to each query embedding.
+
+        Args:
+            queries: [Q, dim] or [dim] query embeddings
+            k: Results per query
+            nprobe: Clusters scanned per query
+            exact: Brute-force search
+
+        Returns:
+            Per query, up to k dicts {'poem_id', 'line', 'score'}, best first
+            ('line' is None at poem level)
+        """
+        scores, rows = self.index.search(queries, k=k, nprobe=nprobe, exact=exact)
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            hits = []
+            for score, row in zip(query_scores.tolist(), query_rows.tolist()):
+                if row < 0:
+                    break
+                line = int(self.row_line[row])
+                hits.append({
+                    'poem_id': self.poem_ids[self.row_poem[row]],
+                    'line': line if line >= 0 else None,
+                    'score': score,
+                })
+            results.append(hits)
+        return results
+
+    def save(self, path: str) -> None:
+        """Write the index and its poem/line labels to a directory."""
+        output_path = Path(path)
+        self.index.save(output_path)
+        np.save(output_path / 'row_poem.npy', self.row_poem)
+        np.save(output_path / 'row_line.npy', self.row_line)
+        with open(output_path / 'labels.json', 'w') as f:
+            json.dump({'level': self.level, 'poem_ids': self.poem_ids}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'EmbeddingSearch':
+        """Read a search index written by save()."""
+        input_path = Path(path)
+        with open(input_path / 'labels.json', 'r') as f:
+            labels = json.load(f)
+        return cls(
+            IVFIndex.load(input_path, mmap=mmap),
+            labels['level'],
+            labels['poem_ids'],
+            np.load(input_path / 'row_poem.npy'),
+            np.load(input_path / 'row_line.npy'),
+        )
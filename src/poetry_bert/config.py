@@ -222,6 +222,10 @@ class ProsodicConfig:
     ideal_meter: str = "iambic_pentameter"
     ideal_pattern: list = None
 
+    # Meter parse cache (SQLite file; None disables the on-disk tier)
+    parse_cache_path: Optional[Path] = None
+    parse_cache_memory_entries: int = 100_000
+
     # Feature dimensions
     prosodic_feature_dims: int = 4  # meter_deviation, rhyme, position, couplet
 
@@ -230,6 +234,9 @@ class ProsodicConfig:
             # Iambic pentameter: unstressed-stressed × 5
             self.ideal_pattern = [0, 1, 0, 1, 0, 1, 0, 1, 0, 1]
 
+        if os.getenv("PARSE_CACHE_PATH"):
+            self.parse_cache_path = Path(os.getenv("PARSE_CACHE_PATH"))
+
 
 @dataclass
 class DeviceConfig:
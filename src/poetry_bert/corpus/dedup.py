@@ -0,0 +1,264 @@
+"""
+Near-Duplicate Poem Detection with MinHash and LSH
+
+Exact content hashes miss reprints that differ in whitespace, punctuation,
+capitalization or lineation. Here each poem becomes a set of word shingles
+over its normalized lines, summarized by a MinHash signature whose
+agreement rate estimates the Jaccard similarity of two poems' shingle sets.
+
+Locality-sensitive hashing splits signatures into bands; poems that agree
+on all rows of any band share a bucket and become candidate pairs. Only
+candidates are compared, so finding duplicates is roughly linear in corpus
+size instead of quadratic. Candidate pairs above the similarity threshold
+are joined into duplicate groups (connected components).
+
+Typical use:
+    hasher = MinHasher()
+    signatures = compute_signatures(texts, hasher)
+    groups = find_duplicate_groups(signatures, threshold=0.8)
+"""
+
+import re
+import unicodedata
+import zlib
+from multiprocessing import Pool
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Prime just above 2**32; shingle hashes are 32-bit
+_MINHASH_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_lines(text: str) -> List[str]:
+    """
+    Lines of a poem with case, accents, punctuation and spacing normalized.
+
+    Args:
+        text: Poem text
+
+    Returns:
+        Non-empty normalized lines
+    """
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    lines = (_WHITESPACE.sub(' ', _NON_WORD.sub(' ', line)).strip() for line in text.splitlines())
+    return [line for line in lines if line]
+
+
+def shingle_hashes(text: str, shingle_size: int = 3) -> np.ndarray:
+    """
+    32-bit hashes of the word shingles of a poem.
+
+    Shingles are runs of shingle_size words over the normalized lines joined
+    in order, so relineated reprints share most of their shingles. Poems
+    shorter than one shingle hash their whole normalized text.
+
+    Args:
+        text: Poem text
+        shingle_size: Words per shingle
+
+    Returns:
+        Unique shingle hashes (uint32)
+    """
+    words = ' '.join(normalize_lines(text)).split()
+    if len(words) <= shingle_size:
+        shingles = [' '.join(words)] if words else []
+    else:
+        shingles = [' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return np.unique(np.fromiter(
+        (zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint32, count=len(shingles)
+    ))
+
+
+class MinHasher:
+    """MinHash signatures from universal hash functions (a * x + b) mod p."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            num_perm: Signature length (number of hash functions)
+            shingle_size: Words per shingle
+            seed: Seed of the hash function parameters (signatures are only
+                  comparable between hashers with the same seed and num_perm)
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a * x (x < 2**32) within uint64
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash signature of a poem.
+
+        Returns:
+            [num_perm] uint32; an empty poem gets the all-max signature
+        """
+        hashes = shingle_hashes(text, self.shingle_size).astype(np.uint64)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _MINHASH_PRIME
+        return (permuted.min(axis=1) & _MAX_HASH).astype(np.uint32)
+
+
+# Hasher owned by each worker process, built once by _init_worker()
+_WORKER_HASHER = None
+
+
+def _init_worker(num_perm: int, shingle_size: int, seed: int) -> None:
+    global _WORKER_HASHER
+    _WORKER_HASHER = MinHasher(num_perm, shingle_size, seed)
+
+
+def _worker_signature(text: str) -> np.ndarray:
+    return _WORKER_HASHER.signature(text)
+
+
+def compute_signatures(
+    texts: Iterable[str],
+    hasher: MinHasher,
+    num_workers: int = 1,
+    chunksize: int = 64
+) -> np.ndarray:
+    """
+    MinHash signatures of many poems.
+
+    Args:
+        texts: Poem texts
+        hasher: MinHasher to use
+        num_workers: Worker processes (1: in-process)
+        chunksize: Poems sent to a worker per task
+
+    Returns:
+        [num_poems, num_perm] uint32 signatures, in input order
+    """
+    if num_workers > 1:
+        init_args = (hasher.num_perm, hasher.shingle_size, hasher.seed)
+        with Pool(num_workers, initializer=_init_worker, initargs=init_args) as pool:
+            signatures = list(pool.imap(_worker_signature, texts, chunksize=chunksize))
+    else:
+        signatures = [hasher.signature(text) for text in texts]
+
+    if not signatures:
+        return np.zeros((0, hasher.num_perm), dtype=np.uint32)
+    return np.stack(signatures)
+
+
+def lsh_threshold(bands: int, rows: int) -> float:
+    """Similarity at which a pair becomes a candidate with probability ~1/2."""
+    return (1.0 / bands) ** (1.0 / rows)
+
+
+def candidate_pairs(
+    signatures: np.ndarray,
+    bands: int = 16,
+    max_bucket_size: int = 1000
+) -> np.ndarray:
+    """
+    Pairs of poems that share an LSH bucket in at least one band.
+
+    Args:
+        signatures: [num_poems, num_perm] MinHash signatures
+        bands: Number of bands (num_perm must be divisible by it)
+        max_bucket_size: Buckets with more poems than this are skipped (they
+                         are degenerate, e.g. many empty poems, and would make
+                         the search quadratic)
+
+    Returns:
+        [num_pairs, 2] unique (i, j) pairs with i < j
+    """
+    num_poems, num_perm = signatures.shape
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    rows = num_perm // bands
+
+    pairs = []
+    for band in range(bands):
+        # Each band's rows as one opaque key per poem
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * rows))).ravel()
+        _, bucket, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+        shared = (counts[bucket] > 1) & (counts[bucket] <= max_bucket_size)
+        members = np.flatnonzero(shared)
+        if len(members) == 0:
+            continue
+        order = members[np.argsort(bucket[members], kind='stable')]
+        boundaries = np.flatnonzero(np.diff(bucket[order])) + 1
+        for group in np.split(order, boundaries):
+            i, j = np.triu_indices(len(group), k=1)
+            pairs.append(np.stack([group[i], group[j]], axis=1))
+
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+
+def estimated_similarity(signatures: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of each pair (share of agreeing signature rows)."""
+    if len(pairs) == 0:
+        return np.zeros(0)
+    return (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+
+
+def _connected_components(num_nodes: int, edges: np.ndarray) -> np.ndarray:
+    """Component label (smallest member) of each node, by union-find."""
+    parent = np.arange(num_nodes)
+
+    def find(node):
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    for i, j in edges.tolist():
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    return np.array([find(node) for node in range(num_nodes)])
+
+
+def find_duplicate_groups(
+    signatures: np.ndarray,
+    threshold: float = 0.8,
+    bands: int = 16,
+    max_bucket_size: int = 1000
+) -> Tuple[List[List[int]], Dict[Tuple[int, int], float]]:
+    """
+    Group near-duplicate poems.
+
+    Args:
+        signatures: [num_poems, num_perm] MinHash signatures
+        threshold: Minimum estimated Jaccard similarity of a duplicate pair
+        bands: LSH bands (more bands find lower-similarity candidates)
+        max_bucket_size: See candidate_pairs()
+
+    Returns:
+        (groups, similarities): groups of poem indices (each sorted, two or
+        more poems), and the estimated similarity of every matched pair
+    """
+    pairs = candidate_pairs(signatures, bands=bands, max_bucket_size=max_bucket_size)
+    similarity = estimated_similarity(signatures, pairs)
+
+    # Empty poems all share one signature; they are not duplicates of each other
+    empty = (signatures == _MAX_HASH).all(axis=1)
+    keep = (similarity >= threshold) & ~empty[pairs[:, 0]]
+    pairs, similarity = pairs[keep], similarity[keep]
+
+    labels = _connected_components(len(signatures), pairs)
+    groups = {}
+    for node in np.unique(pairs).tolist():
+        groups.setdefault(int(labels[node]), []).append(node)
+
+    similarities = {(int(i), int(j)): float(s) for (i, j), s in zip(pairs.tolist(), similarity)}
+    return sorted(groups.values()), similarities
@@ -0,0 +1,60 @@
+"""
+Content Hashing of Corpus Files
+
+Files are hashed in fixed size chunks. hashlib releases the GIL while
+digesting, so the validation engine's thread pool (see
+validation.visit_files) overlaps both I/O and hashing.
+HashReport collects the counts and timing of a hashing pass.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Bytes read per chunk while hashing
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_md5(path, chunk_size: int = HASH_CHUNK_SIZE, chunks: Optional[List[bytes]] = None) -> str:
+    """
+    MD5 hex digest of a file, read in chunks.
+
+    Args:
+        path: File to hash
+        chunk_size: Bytes read per chunk
+        chunks: If given, the chunks read are appended to it, so callers that
+                also need the content don't read the file twice
+
+    Returns:
+        MD5 hex digest
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+            if chunks is not None:
+                chunks.append(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class HashReport:
+    """Hashes of a set of files, with counts and timing."""
+    hashes: Dict[str, str] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    num_hashed: int = 0
+    num_skipped: int = 0
+    bytes_hashed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def num_files(self) -> int:
+        return len(self.hashes) + len(self.errors)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.num_files / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes_hashed / 1e6 / self.seconds if self.seconds else 0.0
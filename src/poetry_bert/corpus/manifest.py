@@ -0,0 +1,93 @@
+"""
+Persisted File Manifest
+
+Records, per corpus file, the size and mtime it had when it was last
+processed, together with values derived from its content (e.g. its MD5).
+A file whose size and mtime still match its entry does not need to be
+read again.
+
+Manifest format (JSON):
+    {"version": 1,
+     "files": {"<relative path>": {"size": ..., "mtime": ..., "md5": ..., ...}}}
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+MANIFEST_VERSION = 1
+
+
+class FileManifest:
+    """Per-file size/mtime and derived values, persisted as JSON."""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            path: Manifest file (None: in-memory only); loaded if it exists
+        """
+        self.path = Path(path) if path else None
+        self.entries = {}
+
+        if self.path is not None and self.path.exists():
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                self.entries = manifest['files']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, relpath: str) -> bool:
+        return relpath in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def get(self, relpath: str) -> Optional[Dict]:
+        return self.entries.get(relpath)
+
+    def lookup(self, relpath: str, size: int, mtime: float) -> Optional[Dict]:
+        """
+        Entry for a file, if it is still current.
+
+        Args:
+            relpath: Path relative to the corpus root
+            size: Current size in bytes
+            mtime: Current modification time
+
+        Returns:
+            The entry if size and mtime match, else None
+        """
+        entry = self.entries.get(relpath)
+        if entry is not None and entry['size'] == size and entry['mtime'] == mtime:
+            return entry
+        return None
+
+    def update(self, relpath: str, size: int, mtime: float, **values) -> None:
+        """Record a file's current size/mtime and the values derived from it."""
+        self.entries[relpath] = dict(values, size=size, mtime=mtime)
+
+    def remove(self, relpath: str) -> None:
+        self.entries.pop(relpath, None)
+
+    def clear(self) -> None:
+        """Forget all entries (forces every file to be processed again)."""
+        self.entries = {}
+
+    def save(self) -> None:
+        """Write the manifest (atomically, via a temporary file in the same directory)."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per writer, so concurrent saves never share a temporary file
+        fd, tmp_file = tempfile.mkstemp(dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, f)
+            os.replace(tmp_file, self.path)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
@@ -0,0 +1,246 @@
+"""
+Indexed Fuzzy Title/Author Matching
+
+Finds corpus records for (title, author) queries without scanning the
+corpus per query:
+- author blocking: an inverted index from normalized author name tokens to
+  records; a query only considers records sharing its author's last name
+  (or any of its name tokens)
+- title scoring: each record's title as a sorted array of trigram ids; the
+  overlap of a query with its author's records is counted with one
+  membership test over just those records' trigrams (an inverted index
+  over all titles serves queries without an author) and turned into a
+  Dice coefficient
+- the best few candidates can be rescored with difflib's ratio, so scores
+  and thresholds stay comparable with SequenceMatcher-based matching
+
+Typical use:
+    matcher = FuzzyMatcher(corpus_df['title'], corpus_df['author'])
+    results = matcher.match_batch(zip(titles, authors), k=1)
+"""
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+# Name tokens ignored for author blocking
+_NAME_STOPWORDS = frozenset({'lord', 'sir', 'dame', 'earl', 'of', 'the', 'de', 'van', 'von', 'jr', 'sr'})
+
+
+def normalize_text(text) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace ('' for NaN/None)."""
+    if text is None or (isinstance(text, float) and text != text):
+        return ''
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+def author_tokens(author) -> List[str]:
+    """
+    Name tokens of an author usable for blocking, surname last.
+
+    "Last, First" names are reordered to "First Last"; initials and titles
+    (Lord, Sir, ...) are dropped.
+    """
+    if isinstance(author, str) and author.count(',') == 1:
+        last, first = author.split(',')
+        author = f"{first} {last}"
+    return [t for t in normalize_text(author).split() if len(t) > 1 and t not in _NAME_STOPWORDS]
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class FuzzyMatcher:
+    """Inverted indexes over corpus titles and authors for batched fuzzy lookup."""
+
+    def __init__(self, titles: Sequence, authors: Sequence):
+        """
+        Args:
+            titles: Title of each corpus record
+            authors: Author of each corpus record (same length)
+        """
+        self.titles = [normalize_text(t) for t in titles]
+        self.authors = [normalize_text(a) for a in authors]
+        num_records = len(self.titles)
+
+        # Author token -> record indices
+        author_index = {}
+        for idx, author in enumerate(authors):
+            for token in set(author_tokens(author)):
+                author_index.setdefault(token, []).append(idx)
+        self.author_index = {token: np.array(ids) for token, ids in author_index.items()}
+
+        # Trigram ids of every title, concatenated (CSR: title_offsets), and
+        # trigram id -> record indices for queries without an author
+        vocabulary = {}
+        title_grams = []
+        self.title_sizes = np.zeros(num_records, dtype=np.int64)
+        for idx, title in enumerate(self.titles):
+            grams = sorted({vocabulary.setdefault(g, len(vocabulary)) for g in _trigrams(title)}) if title else []
+            self.title_sizes[idx] = len(grams)
+            title_grams.extend(grams)
+        self.vocabulary = vocabulary
+        self.title_grams = np.array(title_grams, dtype=np.int64)
+        self.title_offsets = np.zeros(num_records + 1, dtype=np.int64)
+        np.cumsum(self.title_sizes, out=self.title_offsets[1:])
+
+        gram_records = np.repeat(np.arange(num_records), self.title_sizes)
+        order = np.argsort(self.title_grams, kind='stable')
+        self.postings = np.split(
+            gram_records[order],
+            np.searchsorted(self.title_grams[order], np.arange(1, len(vocabulary)))
+        )
+
+        # Exact (title, author) key -> record indices
+        self.exact_index = {}
+        for idx, key in enumerate(zip(self.titles, self.authors)):
+            self.exact_index.setdefault(key, []).append(idx)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def lookup_exact(self, title, author) -> List[int]:
+        """Records whose normalized title and author both equal the query's."""
+        return list(self.exact_index.get((normalize_text(title), normalize_text(author)), []))
+
+    def candidates(self, author, block_on: str = 'last') -> Optional[np.ndarray]:
+        """
+        Records sharing the query author's name token(s).
+
+        Args:
+            author: Query author (e.g. "John Keats" or "Keats, John")
+            block_on: 'last' (the surname) or 'any' (any name token)
+
+        Returns:
+            Sorted record indices, or None when the query has no usable
+            author (no blocking: every record is a candidate)
+        """
+        tokens = author_tokens(author)
+        if not tokens:
+            return None
+        if block_on == 'last':
+            tokens = tokens[-1:]
+        blocks = [self.author_index[t] for t in tokens if t in self.author_index]
+        if not blocks:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(blocks))
+
+    def title_scores(self, title, candidates: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Trigram Dice similarity of a title to candidate records.
+
+        Args:
+            title: Query title
+            candidates: Record indices to score (None: all records)
+
+        Returns:
+            (record indices, scores in [0, 1]); an empty title scores 0
+        """
+        title = normalize_text(title)
+        grams = set(_trigrams(title)) if title else set()
+        gram_ids = np.array(sorted(self.vocabulary[g] for g in grams if g in self.vocabulary), dtype=np.int64)
+
+        if candidates is None:
+            # No blocking: only records sharing a trigram can score above 0
+            if len(gram_ids) == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+            hits = np.concatenate([self.postings[g] for g in gram_ids])
+            candidates, shared = np.unique(hits, return_counts=True)
+        else:
+            candidates = np.asarray(candidates, dtype=np.int64)
+            if len(gram_ids) == 0 or len(candidates) == 0:
+                return candidates, np.zeros(len(candidates))
+            # Overlap counted over the candidates' own trigrams only
+            sizes = self.title_sizes[candidates]
+            starts = self.title_offsets[candidates]
+            positions = np.arange(int(sizes.sum())) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            candidate_grams = self.title_grams[np.repeat(starts, sizes) + positions]
+            found = np.isin(candidate_grams, gram_ids, assume_unique=False)
+            shared = np.bincount(np.repeat(np.arange(len(candidates)), sizes), weights=found,
+                                 minlength=len(candidates))
+
+        scores = 2.0 * shared / (len(grams) + self.title_sizes[candidates])
+        return candidates, scores
+
+    def match(
+        self,
+        title,
+        author=None,
+        k: int = 5,
+        min_score: float = 0.0,
+        block_on: str = 'last',
+        rescore: bool = True,
+        shortlist: int = 20
+    ) -> List[Tuple[int, float]]:
+        """
+        Best corpus records for one (title, author) query.
+
+        Args:
+            title: Query title
+            author: Query author (None: match on title alone)
+            k: Matches to return
+            min_score: Drop matches scoring below this
+            block_on: See candidates()
+            rescore: Rescore the trigram shortlist with difflib's ratio
+            shortlist: Candidates kept from trigram scoring for rescoring
+
+        Returns:
+            Up to k (record index, score) pairs, best first; none for an
+            empty title
+        """
+        if not normalize_text(title):
+            return []
+        candidates = self.candidates(author, block_on) if author is not None else None
+        candidates, scores = self.title_scores(title, candidates)
+        if len(candidates) == 0:
+            return []
+
+        keep = min(len(scores), max(k, shortlist) if rescore else k)
+        top = np.argpartition(-scores, keep - 1)[:keep]
+        ranked = [(int(candidates[i]), float(scores[i])) for i in top]
+
+        if rescore:
+            query = normalize_text(title)
+            ranked = [(idx, SequenceMatcher(None, query, self.titles[idx]).ratio()) for idx, _ in ranked]
+
+        ranked.sort(key=lambda match: (-match[1], match[0]))
+        return [(idx, score) for idx, score in ranked[:k] if score >= min_score]
+
+    def match_batch(
+        self,
+        queries: Iterable[Tuple],
+        k: int = 5,
+        **match_kwargs
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        match() for many (title, author) queries.
+
+        Returns:
+            Per query, up to k (record index, score) pairs, best first
+        """
+        return [self.match(title, author, k=k, **match_kwargs) for title, author in queries]
+
+
+def parse_corpus_filename(relpath: str) -> Dict[str, str]:
+    """
+    Title and author of a corpus file from its path.
+
+    Paths look like "<Author>/<NNNNNN>_<Title>_<Author>_<Date>.txt".
+
+    Returns:
+        {'author': author directory, 'title': title from the filename}
+    """
+    author_dir, _, filename = relpath.rpartition('/')
+    stem = filename[:-4] if filename.endswith('.txt') else filename
+    parts = stem.split('_')
+    title_parts = parts[1:-2] if len(parts) >= 4 else parts[1:] or parts
+    return {'author': author_dir, 'title': ' '.join(title_parts)}
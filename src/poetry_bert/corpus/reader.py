@@ -0,0 +1,281 @@
+"""
+Streaming Corpus Reader
+
+One access path for the plain-text poetry corpus, laid out as
+    <root>/<author>/<poem>.txt
+(or, with recursive=True, .txt files at any depth below root).
+
+- list_files() scans the author directories in parallel threads and returns
+  the files with their size and mtime. With a listing cache, a directory
+  whose mtime is unchanged since the last scan is not re-listed.
+- iter_poems() reads files lazily in a thread pool and yields PoemRecords
+  in listing order, with at most a bounded number of files in flight.
+
+Listing cache format (JSON):
+    {"root": ..., "pattern": ..., "recursive": ...,
+     "dirs": {"<relative dir>": {"mtime": ..., "subdirs": [...],
+                                 "files": [[name, size, mtime], ...]}}}
+
+Files created or deleted change their directory's mtime, so the cache picks
+them up. A file rewritten in place keeps its directory mtime; pass
+refresh_stats=True to list_files() when current sizes/mtimes matter.
+"""
+
+import fnmatch
+import json
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# Threads used for directory scans and file reads (I/O-bound)
+DEFAULT_IO_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+@dataclass(frozen=True)
+class CorpusFile:
+    """A poem file in the corpus listing."""
+    path: Path
+    relpath: str
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+
+    @property
+    def author_dir(self) -> str:
+        """Name of the top-level (author) directory, '' for files in root."""
+        parts = self.relpath.split('/')
+        return parts[0] if len(parts) > 1 else ''
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+@dataclass
+class PoemRecord:
+    """Contents of one corpus file (data is None if it could not be read)."""
+    file: CorpusFile
+    data: Optional[bytes] = None
+    error: Optional[str] = None
+
+    def text(self, errors: str = 'ignore') -> Optional[str]:
+        """
+        Decode the file as UTF-8 with universal newlines (as open() in text mode).
+
+        Args:
+            errors: Codec error handling ('strict' raises UnicodeDecodeError)
+
+        Returns:
+            Decoded text, or None if the file could not be read
+        """
+        if self.data is None:
+            return None
+        text = self.data.decode('utf-8', errors=errors)
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def lines(self, errors: str = 'ignore') -> List[str]:
+        """Non-blank lines of the file."""
+        text = self.text(errors)
+        return [] if text is None else [line for line in text.split('\n') if line.strip()]
+
+
+def _read_file(corpus_file: CorpusFile) -> PoemRecord:
+    """Read one file fully, capturing the error instead of raising."""
+    try:
+        with open(corpus_file.path, 'rb') as f:
+            return PoemRecord(corpus_file, data=f.read())
+    except OSError as e:
+        return PoemRecord(corpus_file, error=str(e))
+
+
+class CorpusReader:
+    """Lazy, parallel access to the files of a corpus directory."""
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        pattern: str = '*.txt',
+        recursive: bool = False,
+        listing_cache: Optional[Union[str, Path]] = None,
+        num_workers: int = DEFAULT_IO_WORKERS
+    ):
+        """
+        Args:
+            root: Corpus directory
+            pattern: Filename glob of poem files
+            recursive: Match files at any depth (default: only root/<author>/<file>)
+            listing_cache: JSON file to persist the directory listing in
+            num_workers: Threads for scanning and reading
+        """
+        self.root = Path(root)
+        self.pattern = pattern
+        self.recursive = recursive
+        self.listing_cache = Path(listing_cache) if listing_cache else None
+        self.num_workers = max(1, num_workers)
+        self._files = None
+        self._authors = None
+
+    def __iter__(self) -> Iterator[PoemRecord]:
+        return self.iter_poems()
+
+    def __len__(self):
+        return len(self.list_files())
+
+    @property
+    def authors(self) -> List[str]:
+        """Names of all top-level (author) directories, including empty ones."""
+        if self._authors is None:
+            self.list_files()
+        return self._authors
+
+    def list_files(self, refresh: bool = False, refresh_stats: bool = False) -> List[CorpusFile]:
+        """
+        List poem files, sorted by relative path.
+
+        Args:
+            refresh: Ignore the in-memory listing and rescan
+            refresh_stats: Re-stat every file, even in unchanged directories
+
+        Returns:
+            CorpusFiles with size and mtime
+        """
+        if self._files is not None and not (refresh or refresh_stats):
+            return self._files
+
+        if not self.root.is_dir():
+            self._files, self._authors = [], []
+            return self._files
+
+        cached = self._load_listing_cache()
+        listing = {}
+
+        # The root is listed here; each top-level directory is scanned by one thread
+        root_entry = self._scan_dir('', cached, listing, refresh_stats)
+        self._authors = sorted(root_entry['subdirs'])
+        with ThreadPoolExecutor(self.num_workers) as executor:
+            list(executor.map(
+                lambda subdir: self._scan_tree(subdir, cached, listing, refresh_stats),
+                self._authors
+            ))
+
+        self._save_listing_cache(listing)
+
+        files = []
+        for rel_dir, entry in listing.items():
+            if rel_dir == '' and not self.recursive:
+                continue
+            for name, size, mtime in entry['files']:
+                relpath = f"{rel_dir}/{name}" if rel_dir else name
+                files.append(CorpusFile(self.root / relpath, relpath, size, mtime))
+        files.sort(key=lambda f: f.relpath.split('/'))
+
+        self._files = files
+        return files
+
+    def _scan_tree(self, rel_dir: str, cached: Dict, listing: Dict, refresh_stats: bool) -> None:
+        """List a directory and, when recursive, everything below it."""
+        entry = self._scan_dir(rel_dir, cached, listing, refresh_stats)
+        if self.recursive:
+            for subdir in entry['subdirs']:
+                self._scan_tree(f"{rel_dir}/{subdir}", cached, listing, refresh_stats)
+
+    def _scan_dir(self, rel_dir: str, cached: Dict, listing: Dict, refresh_stats: bool) -> Dict:
+        """List one directory, reusing the cached entry if its mtime is unchanged."""
+        directory = self.root / rel_dir
+        try:
+            mtime = directory.stat().st_mtime
+        except OSError:
+            return {'mtime': None, 'subdirs': [], 'files': []}
+
+        previous = cached.get(rel_dir)
+        if previous is not None and previous['mtime'] == mtime and not refresh_stats:
+            listing[rel_dir] = previous
+            return previous
+
+        subdirs, files = [], []
+        with os.scandir(directory) as entries:
+            for dir_entry in entries:
+                try:
+                    if dir_entry.is_dir():
+                        subdirs.append(dir_entry.name)
+                    elif fnmatch.fnmatch(dir_entry.name, self.pattern):
+                        stat = dir_entry.stat()
+                        files.append([dir_entry.name, stat.st_size, stat.st_mtime])
+                except OSError:
+                    continue
+
+        entry = {'mtime': mtime, 'subdirs': sorted(subdirs), 'files': sorted(files)}
+        listing[rel_dir] = entry
+        return entry
+
+    def _cache_settings(self) -> Dict:
+        return {'root': str(self.root), 'pattern': self.pattern, 'recursive': self.recursive}
+
+    def _load_listing_cache(self) -> Dict:
+        """Cached directory entries, if the cache was written for this listing."""
+        if self.listing_cache is None or not self.listing_cache.exists():
+            return {}
+        try:
+            with open(self.listing_cache, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if {k: cache.get(k) for k in self._cache_settings()} != self._cache_settings():
+            return {}
+        return cache.get('dirs', {})
+
+    def _save_listing_cache(self, listing: Dict) -> None:
+        if self.listing_cache is None:
+            return
+        self.listing_cache.parent.mkdir(parents=True, exist_ok=True)
+        # A temporary file of our own: parallel sessions may save the same cache
+        fd, tmp_file = tempfile.mkstemp(
+            dir=self.listing_cache.parent, prefix=f'.{self.listing_cache.name}.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(dict(self._cache_settings(), dirs=listing), f)
+            os.replace(tmp_file, self.listing_cache)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+
+    def resolve(self, relpaths: Iterable[Union[str, Path]]) -> List[CorpusFile]:
+        """CorpusFiles for paths relative to root (no listing or stat)."""
+        return [CorpusFile(self.root / relpath, Path(relpath).as_posix()) for relpath in relpaths]
+
+    def iter_poems(
+        self,
+        files: Optional[Iterable[CorpusFile]] = None,
+        max_in_flight: Optional[int] = None
+    ) -> Iterator[PoemRecord]:
+        """
+        Read files lazily, in order, with parallel I/O.
+
+        Args:
+            files: Files to read (default: the whole listing); see resolve()
+                   for reading paths from e.g. a metadata CSV
+            max_in_flight: Files read ahead of the consumer
+                           (default: 4 per worker thread)
+
+        Yields:
+            PoemRecord per file, in the order given
+        """
+        files = self.list_files() if files is None else files
+        max_in_flight = max_in_flight or self.num_workers * 4
+
+        if self.num_workers == 1:
+            yield from map(_read_file, files)
+            return
+
+        with ThreadPoolExecutor(self.num_workers) as executor:
+            pending = deque()
+            for corpus_file in files:
+                pending.append(executor.submit(_read_file, corpus_file))
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
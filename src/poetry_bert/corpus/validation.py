@@ -0,0 +1,174 @@
+"""
+Single-Pass Corpus Validation Engine
+
+Validation checks over a metadata CSV and the files it points to share one
+visit per row: the file is stat'ed and read once (in a thread pool, in
+chunks via file_md5), its MD5 and UTF-8 decoding are computed in the
+worker, and the resulting FileVisit is handed to every registered Check
+in row order.
+
+With a FileManifest, files whose size and mtime are unchanged since the last
+run are not read; their MD5, readability and emptiness come from the
+manifest.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .hashing import HASH_CHUNK_SIZE, file_md5
+from .manifest import FileManifest
+from .reader import DEFAULT_IO_WORKERS
+
+# Manifest fields recorded for each visited file
+VISIT_MANIFEST_FIELDS = ('md5', 'readable', 'empty')
+
+
+@dataclass
+class FileVisit:
+    """Everything the checks may need to know about one row's file."""
+    row: Dict
+    relpath: str
+    exists: bool = False
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+    data: Optional[bytes] = None
+    text: Optional[str] = None
+    md5: Optional[str] = None
+    readable: bool = False
+    empty: bool = False
+    error: Optional[str] = None
+    from_manifest: bool = False
+
+
+class Check(ABC):
+    """
+    A validation check fed by the shared visit loop.
+
+    Subclasses set name, accumulate state in visit() and report in finish().
+    """
+
+    name = ''
+
+    def visit(self, file_visit: FileVisit) -> None:
+        """Inspect one row and its file (called in row order)."""
+
+    @abstractmethod
+    def finish(self) -> bool:
+        """Print the outcome; return True if the check passed."""
+
+
+def _visit_file(task) -> FileVisit:
+    """Stat, read, hash and decode one file (runs in a worker thread)."""
+    row, relpath, path, cached, chunk_size = task
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return FileVisit(row, relpath)
+    except OSError as e:
+        return FileVisit(row, relpath, exists=True, error=str(e))
+
+    visit = FileVisit(row, relpath, exists=True, size=stat.st_size, mtime=stat.st_mtime)
+    if (cached is not None and all(k in cached for k in VISIT_MANIFEST_FIELDS)
+            and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime):
+        visit.md5, visit.readable, visit.empty = (cached[k] for k in VISIT_MANIFEST_FIELDS)
+        visit.from_manifest = True
+        return visit
+
+    chunks = []
+    try:
+        visit.md5 = file_md5(path, chunk_size, chunks=chunks)
+    except OSError as e:
+        visit.error = str(e)
+        return visit
+
+    visit.data = b''.join(chunks)
+    try:
+        visit.text = visit.data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        visit.readable = True
+        visit.empty = not visit.text.strip()
+    except UnicodeDecodeError as e:
+        visit.error = str(e)
+        visit.empty = len(visit.data) == 0
+    return visit
+
+
+def visit_files(
+    corpus_dir: Path,
+    rows: Iterable[Dict],
+    manifest: Optional[FileManifest] = None,
+    num_workers: int = DEFAULT_IO_WORKERS,
+    path_field: str = 'filepath',
+    max_in_flight: Optional[int] = None,
+    chunk_size: int = HASH_CHUNK_SIZE
+) -> Iterator[FileVisit]:
+    """
+    Visit each row's file once, in parallel, yielding visits in row order.
+
+    Args:
+        corpus_dir: Directory the row paths are relative to
+        rows: Metadata rows
+        manifest: Unchanged files are not read; files that are read update it
+        num_workers: Threads for stat/read/hash
+        path_field: Row field holding the relative file path
+        max_in_flight: Files visited ahead of the consumer (default: 4 per thread)
+        chunk_size: Bytes read per chunk while hashing
+
+    Yields:
+        FileVisit per row
+    """
+    corpus_dir = Path(corpus_dir)
+    max_in_flight = max_in_flight or num_workers * 4
+
+    def tasks():
+        for row in rows:
+            relpath = Path(row[path_field]).as_posix()
+            cached = manifest.get(relpath) if manifest is not None else None
+            yield row, relpath, corpus_dir / relpath, cached, chunk_size
+
+    def record(visit: FileVisit) -> FileVisit:
+        if manifest is not None and visit.md5 is not None and not visit.from_manifest:
+            manifest.update(
+                visit.relpath, visit.size, visit.mtime,
+                **{k: getattr(visit, k) for k in VISIT_MANIFEST_FIELDS}
+            )
+        return visit
+
+    with ThreadPoolExecutor(max(1, num_workers)) as executor:
+        pending = deque()
+        for task in tasks():
+            pending.append(executor.submit(_visit_file, task))
+            if len(pending) >= max_in_flight:
+                yield record(pending.popleft().result())
+        while pending:
+            yield record(pending.popleft().result())
+
+
+def run_checks(
+    checks: List[Check],
+    visits: Iterable[FileVisit],
+    progress_every: int = 10000
+) -> Dict[str, bool]:
+    """
+    Feed every visit to every check, then collect the outcomes.
+
+    Args:
+        checks: Checks to run
+        visits: FileVisits, e.g. from visit_files()
+        progress_every: Print progress every this many rows (0: never)
+
+    Returns:
+        {check name: passed}, in the order of checks
+    """
+    for num_visited, file_visit in enumerate(visits, 1):
+        for check in checks:
+            check.visit(file_visit)
+        if progress_every and num_visited % progress_every == 0:
+            print(f"  Visited {num_visited} files...")
+    print()
+
+    return {check.name: check.finish() for check in checks}
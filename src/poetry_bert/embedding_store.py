@@ -0,0 +1,191 @@
+"""
+Memory-Mapped Embedding Store
+
+Line embeddings for a whole corpus run to several GB, so they are stored
+as .npy matrices that are memory-mapped on read, with an index from poem id
+to row range. A single poem's vectors are a slice of the mapped file;
+nothing else is read.
+
+Store layout:
+    meta.json               Embedding dimension and dtype
+    segment-00000.npy       [rows, dim] embeddings (float16 or float32)
+    segment-00000.json      [[poem_id, start, stop], ...] row ranges in the segment
+    segment-00001.npy       Added by a later append()
+    segment-00001.json
+    ...
+
+append() only ever adds a segment, so incremental additions never rewrite
+existing data. A poem id appended again maps to its newest rows.
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+SUPPORTED_DTYPES = ('float16', 'float32')
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped store of per-poem line embeddings."""
+
+    def __init__(self, path: str, dim: Optional[int] = None, dtype: str = 'float32'):
+        """
+        Open a store, creating it if needed.
+
+        Args:
+            path: Store directory
+            dim: Embedding dimension (required to create a new store)
+            dtype: 'float16' or 'float32' (new stores only; existing stores
+                   keep the dtype they were created with)
+        """
+        self.path = Path(path)
+        meta_file = self.path / 'meta.json'
+
+        if meta_file.exists():
+            with open(meta_file, 'r') as f:
+                self.meta = json.load(f)
+            if dim is not None and dim != self.meta['dim']:
+                raise ValueError(
+                    f"Embedding store {path} holds {self.meta['dim']}-d vectors, got dim={dim}"
+                )
+        else:
+            if dim is None:
+                raise ValueError(f"No embedding store at {path}; pass dim to create one")
+            if dtype not in SUPPORTED_DTYPES:
+                raise ValueError(f"Unsupported dtype {dtype}; use one of {SUPPORTED_DTYPES}")
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.meta = {'dim': dim, 'dtype': dtype}
+            with open(meta_file, 'w') as f:
+                json.dump(self.meta, f)
+
+        self._segments = []
+        self._index = {}
+        for index_file in sorted(self.path.glob('segment-*.json')):
+            self._load_segment(index_file)
+
+    @property
+    def dim(self) -> int:
+        return self.meta['dim']
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self.meta['dtype'])
+
+    def _load_segment(self, index_file: Path) -> None:
+        """Memory-map one segment and add its row ranges to the index."""
+        segment = len(self._segments)
+        self._segments.append(np.load(index_file.with_suffix('.npy'), mmap_mode='r'))
+        with open(index_file, 'r') as f:
+            for poem_id, start, stop in json.load(f):
+                self._index[_index_key(poem_id)] = (segment, start, stop)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, poem_id) -> bool:
+        return _index_key(poem_id) in self._index
+
+    @property
+    def poem_ids(self) -> List:
+        """Ids of all stored poems, in order of first insertion."""
+        return list(self._index)
+
+    @property
+    def num_vectors(self) -> int:
+        return sum(len(segment) for segment in self._segments)
+
+    def get(self, poem_id) -> np.ndarray:
+        """
+        Embeddings of one poem.
+
+        Args:
+            poem_id: Poem identifier
+
+        Returns:
+            [num_lines, dim] read-only view into the memory-mapped segment
+        """
+        segment, start, stop = self._index[_index_key(poem_id)]
+        return self._segments[segment][start:stop]
+
+    def append(
+        self,
+        poem_ids: Sequence,
+        embeddings: np.ndarray,
+        offsets: np.ndarray
+    ) -> None:
+        """
+        Add poems as a new segment.
+
+        Args:
+            poem_ids: Poem identifiers (JSON-serializable), one per poem
+            embeddings: Line embeddings of all poems, [total_lines, dim]
+            offsets: Poem offsets [len(poem_ids) + 1] into embeddings
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if len(offsets) != len(poem_ids) + 1 or offsets[-1] != len(embeddings):
+            raise ValueError(
+                f"offsets must have {len(poem_ids) + 1} entries ending at {len(embeddings)}"
+            )
+        embeddings = np.asarray(embeddings).reshape(len(embeddings), -1)
+        if embeddings.shape[1] != self.dim and len(embeddings):
+            raise ValueError(f"Expected {self.dim}-d embeddings, got {embeddings.shape[1]}-d")
+
+        name = f'segment-{len(self._segments):05d}'
+        np.save(self.path / f'{name}.npy', embeddings.astype(self.dtype).reshape(-1, self.dim))
+
+        # The index is written last: a segment without one is ignored on open
+        index = [
+            [_json_id(poem_id), int(start), int(stop)]
+            for poem_id, start, stop in zip(poem_ids, offsets[:-1], offsets[1:])
+        ]
+        index_file = self.path / f'{name}.json'
+        tmp_file = index_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(index, f)
+        tmp_file.rename(index_file)
+
+        self._load_segment(index_file)
+
+    def append_poems(self, poem_embeddings: Dict) -> None:
+        """
+        Add poems given as {poem_id: [num_lines, dim] embeddings}.
+
+        Args:
+            poem_embeddings: Mapping of poem id to that poem's line embeddings
+        """
+        arrays = [np.asarray(e).reshape(-1, self.dim) for e in poem_embeddings.values()]
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        embeddings = np.concatenate(arrays) if arrays else np.zeros((0, self.dim), self.dtype)
+        self.append(list(poem_embeddings), embeddings, offsets)
+
+    def iter_segments(self) -> Iterator[Tuple[List, np.ndarray, np.ndarray]]:
+        """
+        Iterate over stored segments, e.g. to build an index over all vectors.
+
+        Yields:
+            (poem_ids, embeddings, row_ranges) per segment: embeddings are
+            memory-mapped, row_ranges is [len(poem_ids), 2] (start, stop);
+            poems superseded by a later append are left out
+        """
+        by_segment = [[] for _ in self._segments]
+        for poem_id, (segment, start, stop) in self._index.items():
+            by_segment[segment].append((start, stop, poem_id))
+
+        for embeddings, entries in zip(self._segments, by_segment):
+            entries.sort(key=lambda entry: entry[0])
+            poem_ids = [poem_id for _, _, poem_id in entries]
+            row_ranges = np.array([(start, stop) for start, stop, _ in entries], dtype=np.int64)
+            yield poem_ids, embeddings, row_ranges.reshape(-1, 2)
+
+
+def _json_id(poem_id):
+    """Poem id as stored in the JSON index (numpy scalars become Python values)."""
+    return poem_id.item() if isinstance(poem_id, np.generic) else poem_id
+
+
+def _index_key(poem_id):
+    """Hashable lookup key for a poem id (JSON turns tuples into lists)."""
+    poem_id = _json_id(poem_id)
+    return tuple(poem_id) if isinstance(poem_id, list) else poem_id
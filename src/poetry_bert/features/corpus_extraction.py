@@ -0,0 +1,241 @@
+"""
+Parallel Prosodic Feature Extraction over a Poetry Corpus
+
+Fans poems out to a process pool (prosodic parsing is CPU-bound and holds
+the GIL), streams per-poem results back in input order, and writes them as
+columnar part files. Poems are handed to the pool one part at a time
+(with the next part queued behind it), so memory stays bounded however
+large the corpus. Every part is written to a temporary directory and
+renamed into place once complete, so an interrupted run can be resumed
+and picks up after the last finished part.
+
+Output layout:
+    meta.json                   Extraction settings (checked on resume)
+    part-00000/                 FeatureStore segment (see features.store)
+    part-00001/
+    ...
+
+Read the result with FeatureStore(output_dir).
+"""
+
+import json
+import shutil
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .parse_cache import MeterParseCache
+from .prosodic import FEATURE_NAMES, ProsodicFeatureExtractor
+from .store import FeatureStoreWriter
+
+# Extractor owned by each worker process, built once by _init_worker()
+_WORKER_EXTRACTOR = None
+
+
+def _init_worker(
+    ideal_pattern: Optional[List[int]],
+    use_phonetic_rhyme: bool,
+    parse_cache_path: Optional[str]
+) -> None:
+    """Build this process's feature extractor (pool initializer)."""
+    global _WORKER_EXTRACTOR
+    parse_cache = MeterParseCache(parse_cache_path) if parse_cache_path else None
+    if parse_cache is not None:
+        # Writes buffered parses when the worker exits (after pool.close()/join())
+        Finalize(parse_cache, parse_cache.close, exitpriority=10)
+    _WORKER_EXTRACTOR = ProsodicFeatureExtractor(
+        ideal_pattern=ideal_pattern,
+        use_phonetic_rhyme=use_phonetic_rhyme,
+        parse_cache=parse_cache
+    )
+
+
+def _extract_poem(poem: Dict) -> Tuple[object, Dict]:
+    """
+    Extract features for one poem in a worker.
+
+    Returns:
+        (poem_id, columns) with columns from extract_feature_columns()
+    """
+    columns = _WORKER_EXTRACTOR.extract_feature_columns(
+        poem['lines'], is_sonnet=poem.get('is_sonnet', True)
+    )
+    return poem.get('poem_id'), columns
+
+
+def extract_corpus_features(
+    poems: Iterable[Dict],
+    output_dir: str,
+    num_workers: Optional[int] = None,
+    chunksize: int = 8,
+    part_size: int = 1000,
+    ideal_pattern: Optional[List[int]] = None,
+    use_phonetic_rhyme: bool = True,
+    parse_cache_path: Optional[str] = None,
+    resume: bool = True
+) -> Dict:
+    """
+    Extract prosodic features for a corpus and write them as columnar parts.
+
+    Args:
+        poems: Poem dicts with 'lines', and optionally 'poem_id' and
+               'is_sonnet' (default True), in a stable order
+        output_dir: Directory to write part files to
+        num_workers: Worker processes (default: all CPUs; 0 or 1: in-process)
+        chunksize: Poems handed to a worker per task
+        part_size: Poems per part file (the unit of resumption)
+        ideal_pattern: Expected stress pattern (default: iambic pentameter)
+        use_phonetic_rhyme: Use phonetic rhyme detection
+        parse_cache_path: SQLite meter parse cache shared by all workers
+        resume: Skip poems already covered by finished parts
+
+    Returns:
+        Extraction metadata (also written to meta.json)
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    if num_workers is None:
+        num_workers = cpu_count()
+
+    meta = {
+        'feature_names': list(FEATURE_NAMES),
+        'part_size': part_size,
+        'ideal_pattern': ideal_pattern,
+        'use_phonetic_rhyme': use_phonetic_rhyme,
+    }
+
+    # Leftovers of an interrupted part are never valid
+    for tmp_dir in output_path.glob('.part-*.tmp'):
+        shutil.rmtree(tmp_dir)
+
+    done_parts = sorted(output_path.glob('part-*'))
+    if done_parts and resume and not (output_path / 'meta.json').exists():
+        print(f"No meta.json in {output_dir}; cannot check the settings of "
+              f"{len(done_parts)} existing parts, starting over")
+        resume = False
+
+    if done_parts and resume:
+        with open(output_path / 'meta.json', 'r') as f:
+            previous = json.load(f)
+        if {k: previous.get(k) for k in meta} != meta:
+            raise ValueError(
+                f"Existing parts in {output_dir} were written with different settings "
+                f"({previous}); use a new output directory or resume=False"
+            )
+        done_parts = _contiguous_parts(done_parts)
+    else:
+        done_parts = []
+    for part_dir in sorted(output_path.glob('part-*'))[len(done_parts):]:
+        shutil.rmtree(part_dir)
+
+    with open(output_path / 'meta.json', 'w') as f:
+        json.dump(meta, f)
+
+    # Parts hold consecutive poems, so finished parts map to a prefix of the
+    # input; the last one may be short if the input has grown since
+    part_index = len(done_parts)
+    num_poems = sum(part_meta['num_poems'] for _, part_meta in done_parts)
+    remaining = islice(iter(poems), num_poems, None)
+    if part_index:
+        print(f"Resuming after {part_index} parts ({num_poems} poems)")
+
+    init_args = (ideal_pattern, use_phonetic_rhyme, parse_cache_path)
+    pool = None
+    if num_workers > 1:
+        pool = Pool(num_workers, initializer=_init_worker, initargs=init_args)
+    else:
+        _init_worker(*init_args)
+
+    def windows():
+        while True:
+            window = list(islice(remaining, part_size))
+            if not window:
+                return
+            yield window
+
+    def submit(window):
+        if pool is not None:
+            return pool.imap(_extract_poem, window, chunksize=chunksize)
+        return map(_extract_poem, window)
+
+    def write(results):
+        nonlocal part_index, num_poems
+        part = list(results)
+        _write_part(output_path, part_index, part, first_poem_index=num_poems)
+        part_index += 1
+        num_poems += len(part)
+        print(f"  Wrote part {part_index - 1:05d} ({num_poems} poems)")
+
+    try:
+        # One part being extracted and the next queued, so workers stay busy
+        # while a part is written
+        pending = deque()
+        for window in windows():
+            pending.append(submit(window))
+            if len(pending) > 1:
+                write(pending.popleft())
+        while pending:
+            write(pending.popleft())
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        raise
+
+    if pool is not None:
+        # Let workers exit normally so they flush their parse caches
+        pool.close()
+        pool.join()
+    elif _WORKER_EXTRACTOR.meter_analyzer.cache is not None:
+        _WORKER_EXTRACTOR.meter_analyzer.cache.close()
+
+    meta['num_parts'] = part_index
+    meta['num_poems'] = num_poems
+    with open(output_path / 'meta.json', 'w') as f:
+        json.dump(meta, f)
+
+    return meta
+
+
+def _contiguous_parts(part_dirs: List[Path]) -> List[Tuple[Path, Dict]]:
+    """
+    Finished parts that form an unbroken prefix of the corpus.
+
+    Returns:
+        (part directory, part meta) for each part up to the first one that is
+        unreadable or does not start where the previous one ended
+    """
+    parts = []
+    next_poem_index = 0
+    for part_index, part_dir in enumerate(part_dirs):
+        try:
+            with open(part_dir / 'meta.json', 'r') as f:
+                part_meta = json.load(f)
+        except (OSError, ValueError):
+            break
+        if part_dir.name != f'part-{part_index:05d}' or part_meta.get('first_poem_index') != next_poem_index:
+            break
+        parts.append((part_dir, part_meta))
+        next_poem_index += part_meta['num_poems']
+    return parts
+
+
+def _write_part(
+    output_path: Path,
+    part_index: int,
+    part: List[Tuple[object, Dict]],
+    first_poem_index: int
+) -> None:
+    """Write one part as a feature store segment, then atomically move it into place."""
+    tmp_dir = output_path / f'.part-{part_index:05d}.tmp'
+
+    writer = FeatureStoreWriter(tmp_dir, first_poem_index=first_poem_index)
+    for poem_id, columns in part:
+        writer.add_poem(poem_id, columns)
+    writer.close()
+
+    tmp_dir.rename(output_path / f'part-{part_index:05d}')
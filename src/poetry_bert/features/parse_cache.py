@@ -0,0 +1,211 @@
+"""
+Persistent Cache for Prosodic Meter Parses
+
+prosodic's metrical parse is by far the slowest step of feature extraction,
+and its result never changes for the same line. MeterParseCache stores
+MetricalAnalyzer.score_deviation() results keyed by a hash of the normalized
+line text and the ideal stress pattern, in two tiers:
+
+- memory: bounded LRU, per process
+- disk: SQLite database (WAL mode), shared across runs and processes;
+  new entries are buffered and written in batches, one transaction per
+  flush, so call flush() or close() when a process is done with the cache
+
+Entries are namespaced by the installed prosodic version, so upgrading the
+parser never serves stale parses.
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    from importlib.metadata import version as _package_version
+    PROSODIC_VERSION = _package_version('prosodic')
+except Exception:
+    PROSODIC_VERSION = 'unknown'
+
+# (deviation_score, actual_pattern), as returned by score_deviation()
+MeterParse = Tuple[float, Optional[List[int]]]
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_line(line_text: str) -> str:
+    """Normalize a line for cache lookup (Unicode NFC, collapsed whitespace)."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', line_text)).strip()
+
+
+def parse_cache_key(line_text: str, ideal_pattern: List[int]) -> str:
+    """
+    Content address of a meter parse.
+
+    Args:
+        line_text: Line of poetry
+        ideal_pattern: Stress pattern the deviation is scored against
+
+    Returns:
+        Hex digest of (prosodic version, ideal pattern, normalized text)
+    """
+    pattern = ''.join(str(s) for s in ideal_pattern)
+    payload = f"{PROSODIC_VERSION}\x1f{pattern}\x1f{normalize_line(line_text)}"
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _copy_parse(result: MeterParse) -> MeterParse:
+    """Copy a parse so callers cannot mutate cached patterns."""
+    deviation, pattern = result
+    return deviation, list(pattern) if pattern is not None else None
+
+
+class MeterParseCache:
+    """Two-tier (memory LRU + SQLite) cache of meter parse results."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_memory_entries: int = 100_000,
+        flush_every: int = 1000
+    ):
+        """
+        Args:
+            path: SQLite database file for the on-disk tier (None: memory only)
+            max_memory_entries: Size bound of the in-memory LRU tier
+            flush_every: New entries buffered before they are written to disk
+        """
+        self.path = Path(path) if path is not None else None
+        self.max_memory_entries = max_memory_entries
+        self.flush_every = flush_every
+
+        self._memory = OrderedDict()
+        # key -> (deviation, pattern string) not yet written to disk
+        self._pending = {}
+        self._conn = None
+        self._conn_pid = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # SQLite connections cannot be pickled or shared across processes
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_conn_pid'] = None
+        # Unwritten entries stay with (and are flushed by) this process
+        state['_pending'] = {}
+        return state
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """SQLite connection for the current process, opened on first use."""
+        if self.path is None:
+            return None
+
+        pid = os.getpid()
+        if self._conn is None or self._conn_pid != pid:
+            # A connection inherited through fork must not be reused
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=30.0)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS meter_parses ('
+                'key TEXT PRIMARY KEY, deviation REAL NOT NULL, pattern TEXT)'
+            )
+            self._conn.commit()
+            self._conn_pid = pid
+        return self._conn
+
+    def get(self, line_text: str, ideal_pattern: List[int]) -> Optional[MeterParse]:
+        """
+        Look up a cached parse.
+
+        Returns:
+            (deviation_score, actual_pattern), or None on a cache miss
+        """
+        key = parse_cache_key(line_text, ideal_pattern)
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return _copy_parse(self._memory[key])
+
+        if key in self._pending:
+            deviation, pattern = self._pending[key]
+            result = (deviation, [int(s) for s in pattern] if pattern is not None else None)
+            self._remember(key, result)
+            self.hits += 1
+            return _copy_parse(result)
+
+        conn = self._connection()
+        if conn is not None:
+            row = conn.execute(
+                'SELECT deviation, pattern FROM meter_parses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                deviation, pattern = row
+                result = (deviation, [int(s) for s in pattern] if pattern is not None else None)
+                self._remember(key, result)
+                self.hits += 1
+                return _copy_parse(result)
+
+        self.misses += 1
+        return None
+
+    def put(self, line_text: str, ideal_pattern: List[int], result: MeterParse) -> None:
+        """
+        Store a parse result in both tiers (on disk with the next flush).
+
+        Args:
+            line_text: Line of poetry
+            ideal_pattern: Stress pattern the deviation was scored against
+            result: (deviation_score, actual_pattern) from score_deviation()
+        """
+        key = parse_cache_key(line_text, ideal_pattern)
+        self._remember(key, _copy_parse(result))
+
+        if self.path is not None:
+            deviation, pattern = result
+            self._pending[key] = (
+                float(deviation), ''.join(str(s) for s in pattern) if pattern is not None else None
+            )
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write buffered entries to disk in one transaction."""
+        if not self._pending:
+            return
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO meter_parses (key, deviation, pattern) VALUES (?, ?, ?)',
+                [(key, deviation, pattern) for key, (deviation, pattern) in self._pending.items()]
+            )
+        self._pending = {}
+
+    def _remember(self, key: str, result: MeterParse) -> None:
+        """Insert into the memory tier, evicting the least recently used entry."""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def __len__(self):
+        conn = self._connection()
+        if conn is not None:
+            self.flush()
+            return conn.execute('SELECT COUNT(*) FROM meter_parses').fetchone()[0]
+        return len(self._memory)
+
+    def close(self) -> None:
+        """Flush buffered entries and close this process's database connection."""
+        self.flush()
+        if self._conn is not None and self._conn_pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+        self._conn_pid = None
@@ -11,29 +11,46 @@ Features Layer 3 conditioning vectors for BERT embeddings.
 """
 
 import re
+import sys
+import numpy as np
+from functools import lru_cache
 from typing import List, Tuple, Optional, Dict
 import prosodic as p
 
+from .parse_cache import MeterParseCache
+
 try:
-    from pronouncing import rhymes
+    import pronouncing
     PRONOUNCING_AVAILABLE = True
 except ImportError:
     PRONOUNCING_AVAILABLE = False
 
+# Per-line feature vector layout (features_to_vector / features_to_matrix)
+FEATURE_NAMES = ('meter_deviation', 'rhyme', 'position', 'couplet')
+
+# Trailing punctuation stripped before taking a line's last word
+_LINE_END_PUNCTUATION = '.,!?;:\'"'
+
 
 class MetricalAnalyzer:
     """Analyze metrical patterns in poetry lines."""
 
-    def __init__(self, ideal_pattern: List[int] = None):
+    def __init__(
+        self,
+        ideal_pattern: List[int] = None,
+        cache: Optional[MeterParseCache] = None
+    ):
         """
         Args:
             ideal_pattern: Expected stress pattern (default: iambic pentameter)
+            cache: Parse cache consulted before running prosodic (default: none)
         """
         if ideal_pattern is None:
             # Iambic pentameter: 0 1 0 1 0 1 0 1 0 1
             self.ideal_pattern = [0, 1] * 5
         else:
             self.ideal_pattern = ideal_pattern
+        self.cache = cache
 
     def score_deviation(self, line_text: str) -> Tuple[float, Optional[List[int]]]:
         """
@@ -47,37 +64,50 @@ class MetricalAnalyzer:
             deviation_score: Number of syllables deviating from ideal
             actual_pattern: Detected stress pattern, or None if parsing failed
         """
+        if self.cache is not None:
+            cached = self.cache.get(line_text, self.ideal_pattern)
+            if cached is not None:
+                return cached
+
         try:
-            parsed = p.Text(line_text).parse()
+            result = self._parse_deviation(line_text)
+        except Exception:
+            # If prosodic fails, return neutral (not cached: may be transient)
+            return 0.0, None
 
-            if not parsed or len(parsed) == 0:
-                return 0.0, None
+        if self.cache is not None:
+            self.cache.put(line_text, self.ideal_pattern, result)
 
-            # Get best parse
-            best_parse = parsed[0][0]
+        return result
 
-            if not best_parse.stress_ints:
-                return 0.0, None
+    def _parse_deviation(self, line_text: str) -> Tuple[float, Optional[List[int]]]:
+        """Parse a line with prosodic and score it (uncached score_deviation)."""
+        parsed = p.Text(line_text).parse()
 
-            actual_pattern = list(best_parse.stress_ints)
+        if not parsed or len(parsed) == 0:
+            return 0.0, None
 
-            # Calculate mismatches
-            min_len = min(len(actual_pattern), len(self.ideal_pattern))
-            deviations = sum(
-                1 for i in range(min_len)
-                if actual_pattern[i] != self.ideal_pattern[i]
-            )
+        # Get best parse
+        best_parse = parsed[0][0]
+
+        if not best_parse.stress_ints:
+            return 0.0, None
 
-            # Penalty for wrong syllable count
-            length_penalty = abs(len(actual_pattern) - len(self.ideal_pattern))
+        actual_pattern = list(best_parse.stress_ints)
 
-            total_deviation = deviations + length_penalty
+        # Calculate mismatches
+        min_len = min(len(actual_pattern), len(self.ideal_pattern))
+        deviations = sum(
+            1 for i in range(min_len)
+            if actual_pattern[i] != self.ideal_pattern[i]
+        )
 
-            return float(total_deviation), actual_pattern
+        # Penalty for wrong syllable count
+        length_penalty = abs(len(actual_pattern) - len(self.ideal_pattern))
 
-        except Exception:
-            # If prosodic fails, return neutral
-            return 0.0, None
+        total_deviation = deviations + length_penalty
+
+        return float(total_deviation), actual_pattern
 
     def get_stress_string(self, pattern: Optional[List[int]]) -> str:
         """Convert stress pattern to string representation."""
@@ -86,6 +116,168 @@ class MetricalAnalyzer:
         return "".join(str(s) for s in pattern)
 
 
+class RhymeIndex:
+    """
+    Word -> phonetic rhyme key lookup, precomputed from the CMU Pronouncing
+    Dictionary.
+
+    The rhyme key of a word is the rhyming part (from the last stressed
+    vowel on) of its first CMU pronunciation, exactly what
+    pronouncing.rhyming_part(pronouncing.phones_for_word(word)[0]) returns.
+    Keys are interned, so the ~135K entries share a few thousand strings.
+    """
+
+    def __init__(self, keys: Dict[str, str]):
+        """
+        Args:
+            keys: Lowercase word -> rhyme key
+        """
+        self._keys = keys
+
+    @classmethod
+    def from_cmudict(cls) -> 'RhymeIndex':
+        """Build the index from the pronouncing library's copy of CMUdict."""
+        pronouncing.init_cmu()
+        keys = {}
+        for word, phones in pronouncing.pronunciations:
+            # First pronunciation wins, as with phones_for_word(word)[0]
+            if word not in keys:
+                keys[word] = sys.intern(pronouncing.rhyming_part(phones))
+        return cls(keys)
+
+    def get(self, word: str, default: Optional[str] = None) -> Optional[str]:
+        """Rhyme key of a lowercase word, or default if it is not in CMUdict."""
+        return self._keys.get(word, default)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+
+@lru_cache(maxsize=None)
+def get_rhyme_index() -> RhymeIndex:
+    """Process-wide RhymeIndex, built on first use."""
+    return RhymeIndex.from_cmudict()
+
+
+@lru_cache(maxsize=65536)
+def _fallback_rhyme_key(word: str, fallback_length: int) -> str:
+    """Character-based rhyme key for words without a CMU pronunciation."""
+    return word[-fallback_length:] if len(word) >= fallback_length else word
+
+
+# Fixed-length schemes, matched against the whole poem
+FIXED_RHYME_SCHEMES = {
+    'shakespearean': 'ABABCDCDEFEFGG',
+    'spenserian': 'ABABBCBCCDCDEE',
+    'petrarchan': 'ABBAABBA',  # Octave only; the sestet varies
+}
+
+# Repeating schemes: one stanza pattern, fresh rhymes in every stanza
+STANZAIC_RHYME_SCHEMES = {
+    'couplets': 'AA',
+    'alternate_quatrains': 'ABAB',
+    'envelope_quatrains': 'ABBA',
+    'ballad_quatrains': 'ABCB',
+}
+
+
+def rhyme_scheme_string(labels: List[int]) -> str:
+    """
+    Format rhyme labels as a scheme string.
+
+    Labels 0-25 are A-Z; later labels repeat the alphabet with a counter
+    (A1, B1, ...), as long poems run through more than 26 rhymes.
+    """
+    return ''.join(
+        chr(ord('A') + label % 26) + (str(label // 26) if label >= 26 else '')
+        for label in labels
+    )
+
+
+def _template_labels(form: str, num_lines: int) -> List[int]:
+    """Expected rhyme labels of a named form, for a poem of num_lines lines."""
+    if form in FIXED_RHYME_SCHEMES:
+        return [ord(c) - ord('A') for c in FIXED_RHYME_SCHEMES[form][:num_lines]]
+    if form == 'terza_rima':
+        # ABA BCB CDC ...: the middle line of each tercet sets the next rhyme
+        return [i // 3 + (i % 3 == 1) for i in range(num_lines)]
+    stanza = STANZAIC_RHYME_SCHEMES[form]
+    labels = []
+    for i in range(num_lines):
+        stanza_idx, pos = divmod(i, len(stanza))
+        labels.append(stanza_idx * len(stanza) + ord(stanza[pos]) - ord('A'))
+    return labels
+
+
+def _scheme_agreement(labels: List[int], template: List[int]) -> Tuple[int, int]:
+    """
+    Count a template's expected rhymes that are present in the observed labels.
+
+    Each template line that should rhyme with an earlier line counts once
+    (against the nearest earlier line with the same template label).
+
+    Returns:
+        (matched, expected)
+    """
+    last_seen = {}
+    expected = matched = 0
+    for i, label in enumerate(template):
+        j = last_seen.get(label)
+        if j is not None:
+            expected += 1
+            matched += labels[i] == labels[j]
+        last_seen[label] = i
+    return matched, expected
+
+
+def classify_rhyme_scheme(labels: List[int], min_agreement: float = 0.75) -> str:
+    """
+    Name the rhyme form of a poem from its rhyme labels.
+
+    Args:
+        labels: Per-line rhyme labels, e.g. from RhymeDetector.infer_rhyme_scheme()
+        min_agreement: Fraction of a form's expected rhymes that must be present
+
+    Returns:
+        'shakespearean', 'spenserian', 'petrarchan', 'terza_rima', 'couplets',
+        'alternate_quatrains', 'envelope_quatrains', 'ballad_quatrains',
+        'monorhyme', 'unrhymed' or 'irregular'
+    """
+    num_lines = len(labels)
+    num_rhymes = len(set(labels))
+
+    if num_rhymes == num_lines:
+        return 'unrhymed'
+    if num_rhymes == 1 and num_lines >= 3:
+        return 'monorhyme'
+
+    candidates = []
+    if num_lines == 14:
+        candidates.extend(FIXED_RHYME_SCHEMES)
+    if num_lines >= 4:
+        candidates.append('terza_rima')
+    candidates.extend(
+        form for form, stanza in STANZAIC_RHYME_SCHEMES.items()
+        if num_lines >= len(stanza)
+    )
+
+    # Best agreement wins; on a tie, the form predicting more rhymes (e.g.
+    # spenserian over shakespearean), then the earlier candidate
+    best_form, best_score = 'irregular', None
+    for form in candidates:
+        matched, expected = _scheme_agreement(labels, _template_labels(form, num_lines))
+        if not expected or matched / expected < min_agreement:
+            continue
+        score = (matched / expected, expected)
+        if best_score is None or score > best_score:
+            best_form, best_score = form, score
+
+    return best_form
+
+
 class RhymeDetector:
     """Detect rhymes between poetry lines."""
 
@@ -97,6 +289,7 @@ class RhymeDetector:
         """
         self.use_phonetic = use_phonetic and PRONOUNCING_AVAILABLE
         self.fallback_length = fallback_length
+        self.rhyme_index = get_rhyme_index() if self.use_phonetic else None
 
         if not self.use_phonetic and PRONOUNCING_AVAILABLE:
             # User explicitly disabled phonetic
@@ -121,7 +314,7 @@ class RhymeDetector:
             Rhyme key (phonetic or character-based)
         """
         # Clean line
-        clean = line.lower().strip().rstrip('.,!?;:\'"')
+        clean = line.lower().strip().rstrip(_LINE_END_PUNCTUATION)
         words = clean.split()
 
         if not words:
@@ -129,23 +322,38 @@ class RhymeDetector:
 
         last_word = words[-1]
 
-        if self.use_phonetic:
-            # Use phonetic rhyme key (pronuncing library)
-            try:
-                # Get rhyming part (typically from primary stress onwards)
-                import pronouncing
-                phones = pronouncing.phones_for_word(last_word)
-                if phones:
-                    # Use first pronunciation
-                    phone = phones[0]
-                    # Get rhyme part (from primary stress onwards)
-                    rhyme_part = pronouncing.rhyming_part(phone)
-                    return rhyme_part
-            except Exception:
-                pass
+        if self.rhyme_index is not None:
+            # Phonetic rhyme key (from the last stressed vowel onwards)
+            rhyme_part = self.rhyme_index.get(last_word)
+            if rhyme_part is not None:
+                return rhyme_part
 
         # Fallback: use last N characters
-        return last_word[-self.fallback_length:] if len(last_word) >= self.fallback_length else last_word
+        return _fallback_rhyme_key(last_word, self.fallback_length)
+
+    def get_rhyme_keys(self, lines: List[str]) -> List[str]:
+        """
+        Extract rhyme keys for many lines at once.
+
+        Args:
+            lines: Lines of poetry
+
+        Returns:
+            Rhyme key of each line (same as get_rhyme_key)
+        """
+        index = self.rhyme_index
+        fallback_length = self.fallback_length
+
+        keys = []
+        for line in lines:
+            words = line.lower().strip().rstrip(_LINE_END_PUNCTUATION).split()
+            if not words:
+                keys.append("")
+                continue
+            last_word = words[-1]
+            key = index.get(last_word) if index is not None else None
+            keys.append(key if key is not None else _fallback_rhyme_key(last_word, fallback_length))
+        return keys
 
     def do_lines_rhyme(self, line1: str, line2: str) -> bool:
         """Check if two lines rhyme."""
@@ -173,7 +381,7 @@ class RhymeDetector:
             # Not a complete sonnet, do best effort
             return []
 
-        rhyme_keys = [self.get_rhyme_key(line) for line in lines[:14]]
+        rhyme_keys = self.get_rhyme_keys(lines[:14])
 
         # Expected pairs for Shakespearean sonnet
         expected_pairs = [
@@ -190,6 +398,58 @@ class RhymeDetector:
 
         return rhyme_pairs
 
+    def infer_rhyme_scheme(self, lines: List[str], max_distance: int = 4) -> Dict:
+        """
+        Infer the rhyme scheme of a poem of any length.
+
+        End words are grouped by rhyme key in one pass (O(n), no pairwise
+        comparison). Lines sharing a key get the same label, in order of
+        first appearance; lines without a key never rhyme.
+
+        Args:
+            lines: Lines of the poem
+            max_distance: Furthest apart (in lines) two lines can be and
+                still form a rhyme pair
+
+        Returns:
+            {
+                'labels': per-line rhyme labels (List[int]),
+                'scheme': scheme string, e.g. 'ABABCDCDEFEFGG',
+                'form': named form (see classify_rhyme_scheme),
+                'rhyme_pairs': (line_idx1, line_idx2) pairs, each line joined to
+                               the nearest earlier line with its rhyme key
+            }
+        """
+        label_of_key = {}
+        last_line_of_key = {}
+        labels = []
+        rhyme_pairs = []
+        num_labels = 0
+
+        for idx, key in enumerate(self.get_rhyme_keys(lines)):
+            if not key:
+                labels.append(num_labels)
+                num_labels += 1
+                continue
+
+            label = label_of_key.get(key)
+            if label is None:
+                label = label_of_key[key] = num_labels
+                num_labels += 1
+            labels.append(label)
+
+            prev = last_line_of_key.get(key)
+            if prev is not None and idx - prev <= max_distance:
+                rhyme_pairs.append((prev, idx))
+            last_line_of_key[key] = idx
+
+        return {
+            'labels': labels,
+            'scheme': rhyme_scheme_string(labels),
+            'form': classify_rhyme_scheme(labels),
+            'rhyme_pairs': rhyme_pairs,
+        }
+
 
 class ProsodicFeatureExtractor:
     """
@@ -205,9 +465,10 @@ class ProsodicFeatureExtractor:
     def __init__(
         self,
         ideal_pattern: List[int] = None,
-        use_phonetic_rhyme: bool = True
+        use_phonetic_rhyme: bool = True,
+        parse_cache: Optional[MeterParseCache] = None
     ):
-        self.meter_analyzer = MetricalAnalyzer(ideal_pattern)
+        self.meter_analyzer = MetricalAnalyzer(ideal_pattern, cache=parse_cache)
         self.rhyme_detector = RhymeDetector(use_phonetic=use_phonetic_rhyme)
 
     def extract_features(
@@ -231,14 +492,50 @@ class ProsodicFeatureExtractor:
                 'couplet': float (0 or 1)
             }
         """
+        return self._extract(lines, is_sonnet)[0]
+
+    def extract_feature_columns(
+        self,
+        lines: List[str],
+        is_sonnet: bool = True
+    ) -> Dict:
+        """
+        Extract prosodic features for all lines in columnar form.
+
+        Args:
+            lines: List of poetry lines
+            is_sonnet: Whether this is a sonnet (affects rhyme/couplet detection)
+
+        Returns:
+            {
+                'features': float32 array [num_lines, 4] (FEATURE_NAMES order),
+                'stress': detected stress pattern of each line (None if unparsed),
+                'rhyme_keys': rhyme key of each line
+            }
+        """
+        features, stress = self._extract(lines, is_sonnet)
+        return {
+            'features': self.features_to_matrix(features),
+            'stress': stress,
+            'rhyme_keys': self.rhyme_detector.get_rhyme_keys(lines),
+        }
+
+    def _extract(
+        self,
+        lines: List[str],
+        is_sonnet: bool
+    ) -> Tuple[List[Dict[str, float]], List[Optional[List[int]]]]:
+        """Feature dicts and stress patterns for all lines."""
         num_lines = len(lines)
         features = []
+        stress = []
 
-        # Detect rhyme pairs
-        if is_sonnet:
+        # Detect rhyme pairs (expected Shakespearean pairs for full sonnets,
+        # inferred scheme otherwise)
+        if is_sonnet and num_lines >= 14:
             rhyme_pairs = self.rhyme_detector.detect_sonnet_rhymes(lines)
         else:
-            rhyme_pairs = []  # Could implement other rhyme schemes
+            rhyme_pairs = self.rhyme_detector.infer_rhyme_scheme(lines)['rhyme_pairs']
 
         # Create rhyme lookup
         rhyming_lines = set()
@@ -249,7 +546,8 @@ class ProsodicFeatureExtractor:
         # Extract features for each line
         for idx, line in enumerate(lines):
             # 1. Metrical deviation
-            deviation, _ = self.meter_analyzer.score_deviation(line)
+            deviation, pattern = self.meter_analyzer.score_deviation(line)
+            stress.append(pattern)
 
             # 2. Rhyme indicator
             rhyme = 1.0 if idx in rhyming_lines else 0.0
@@ -267,7 +565,7 @@ class ProsodicFeatureExtractor:
                 'couplet': couplet
             })
 
-        return features
+        return features, stress
 
     def features_to_vector(self, features: Dict[str, float]) -> List[float]:
         """
@@ -286,37 +584,60 @@ class ProsodicFeatureExtractor:
             features['couplet']
         ]
 
-    def analyze_corpus_stats(self, all_features: List[List[Dict[str, float]]]) -> Dict:
+    def features_to_matrix(self, features: List[Dict[str, float]]) -> np.ndarray:
         """
-        Compute statistics over a corpus of poems.
+        Convert a poem's feature dicts to a matrix in one pass.
 
         Args:
-            all_features: List of feature lists (one per poem)
+            features: Feature dicts from extract_features()
 
         Returns:
-            Dictionary of statistics
+            float32 array [num_lines, 4], rows as in features_to_vector()
         """
-        import numpy as np
-
-        all_deviations = []
-        rhyme_counts = []
-        couplet_counts = []
-
-        for poem_features in all_features:
-            for feat in poem_features:
-                all_deviations.append(feat['meter_deviation'])
-                rhyme_counts.append(feat['rhyme'])
-                couplet_counts.append(feat['couplet'])
-
-        stats = {
-            'mean_deviation': np.mean(all_deviations),
-            'std_deviation': np.std(all_deviations),
-            'rhyme_frequency': np.mean(rhyme_counts),
-            'couplet_frequency': np.mean(couplet_counts),
-            'total_lines': len(all_deviations)
-        }
+        return np.fromiter(
+            (feat[name] for feat in features for name in FEATURE_NAMES),
+            dtype=np.float32,
+            count=len(features) * len(FEATURE_NAMES)
+        ).reshape(len(features), len(FEATURE_NAMES))
+
+    def analyze_corpus_stats(
+        self,
+        all_features,
+        group_by: Optional[Dict[str, Dict]] = None,
+        max_deviation_bin: int = 20
+    ) -> Dict:
+        """
+        Compute statistics over a corpus of poems, streaming.
+
+        Args:
+            all_features: One of
+                - a FeatureStore (read segment by segment, memory-mapped)
+                - an iterable of per-poem features, each a feature matrix
+                  [num_lines, 4] or a list of feature dicts; may be a generator
+            group_by: Grouping name -> {poem_id: label} (e.g. period, author,
+                      form) for per-group statistics; poem ids are the store's
+                      ids, or poem positions for an iterable
+            max_deviation_bin: Last integer bin of the deviation histogram
+
+        Returns:
+            Dictionary of statistics (see CorpusStatsAccumulator.results)
+        """
+        from .stats import CorpusStatsAccumulator, iter_store_batches
+        from .store import FeatureStore
+
+        accumulator = CorpusStatsAccumulator(group_by=group_by, max_deviation_bin=max_deviation_bin)
+
+        if isinstance(all_features, FeatureStore):
+            for features, poem_ids in iter_store_batches(all_features, with_poem_ids=bool(group_by)):
+                accumulator.update(features, poem_ids)
+        else:
+            for poem_idx, poem_features in enumerate(all_features):
+                if not isinstance(poem_features, np.ndarray):
+                    poem_features = self.features_to_matrix(poem_features)
+                poem_ids = [poem_idx] * len(poem_features) if group_by else None
+                accumulator.update(poem_features, poem_ids)
 
-        return stats
+        return accumulator.results()
 
 
 # Convenience functions
@@ -324,7 +645,8 @@ class ProsodicFeatureExtractor:
 def extract_prosodic_features(
     lines: List[str],
     is_sonnet: bool = True,
-    use_phonetic_rhyme: bool = True
+    use_phonetic_rhyme: bool = True,
+    parse_cache: Optional[MeterParseCache] = None
 ) -> List[Dict[str, float]]:
     """
     Convenience function to extract prosodic features.
@@ -333,11 +655,15 @@ def extract_prosodic_features(
         lines: List of poetry lines
         is_sonnet: Whether this is a sonnet
         use_phonetic_rhyme: Use phonetic rhyme detection
+        parse_cache: Meter parse cache to reuse across calls
 
     Returns:
         List of feature dicts
     """
-    extractor = ProsodicFeatureExtractor(use_phonetic_rhyme=use_phonetic_rhyme)
+    extractor = ProsodicFeatureExtractor(
+        use_phonetic_rhyme=use_phonetic_rhyme,
+        parse_cache=parse_cache
+    )
     return extractor.extract_features(lines, is_sonnet=is_sonnet)
 
 
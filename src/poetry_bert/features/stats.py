@@ -0,0 +1,249 @@
+"""
+Streaming Corpus Statistics for Prosodic Features
+
+Accumulates per-line feature statistics batch by batch, so corpus-wide
+numbers never require every line in memory:
+- means and variances via Welford/Chan merging of per-batch moments
+- a histogram of metrical deviation
+- the same moments per group (e.g. period, author, form), computed for all
+  groups of a batch at once with bincount
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .prosodic import FEATURE_NAMES
+
+METER_COLUMN = FEATURE_NAMES.index('meter_deviation')
+
+# Streaming batch size when reading a FeatureStore (lines)
+STORE_BATCH_LINES = 1 << 20
+
+
+def _merge_moments(
+    count_a: np.ndarray, mean_a: np.ndarray, m2_a: np.ndarray,
+    count_b: np.ndarray, mean_b: np.ndarray, m2_b: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge two sets of (count, mean, M2) moments (Chan et al.).
+
+    Counts broadcast against the trailing feature dimension of mean/M2.
+    """
+    count = count_a + count_b
+    safe = np.maximum(count, 1)[..., None]
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (count_b[..., None] / safe)
+    m2 = m2_a + m2_b + delta ** 2 * (count_a * count_b)[..., None] / safe
+    return count, mean, m2
+
+
+class RunningStats:
+    """Streaming count, mean and variance of feature vectors."""
+
+    def __init__(self, num_features: int = len(FEATURE_NAMES)):
+        self.count = np.zeros((), dtype=np.int64)
+        self.mean = np.zeros(num_features)
+        self.m2 = np.zeros(num_features)
+
+    def update(self, batch: np.ndarray) -> None:
+        """Add a [num_lines, num_features] batch."""
+        if len(batch) == 0:
+            return
+        batch = np.asarray(batch, dtype=np.float64)
+        batch_mean = batch.mean(axis=0)
+        batch_m2 = ((batch - batch_mean) ** 2).sum(axis=0)
+        self.count, self.mean, self.m2 = _merge_moments(
+            self.count, self.mean, self.m2,
+            np.asarray(len(batch)), batch_mean, batch_m2
+        )
+
+    def merge(self, other: 'RunningStats') -> None:
+        """Fold in statistics accumulated elsewhere (e.g. another process)."""
+        self.count, self.mean, self.m2 = _merge_moments(
+            self.count, self.mean, self.m2, other.count, other.mean, other.m2
+        )
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Population variance (ddof=0, as np.var)."""
+        return self.m2 / max(int(self.count), 1)
+
+
+class GroupedRunningStats:
+    """RunningStats for many groups, updated for a whole batch at once."""
+
+    def __init__(self, num_features: int = len(FEATURE_NAMES)):
+        self.num_features = num_features
+        self.labels = []
+        self._codes = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros((0, num_features))
+        self.m2 = np.zeros((0, num_features))
+
+    def _encode(self, labels: Sequence) -> np.ndarray:
+        """Map group labels to dense codes, growing the state for new labels."""
+        codes = np.fromiter(
+            (self._codes.setdefault(label, len(self._codes)) for label in labels),
+            dtype=np.int64, count=len(labels)
+        )
+        num_groups = len(self._codes)
+        if num_groups > len(self.count):
+            self.labels = list(self._codes)
+            grow = num_groups - len(self.count)
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+            self.mean = np.vstack([self.mean, np.zeros((grow, self.num_features))])
+            self.m2 = np.vstack([self.m2, np.zeros((grow, self.num_features))])
+        return codes
+
+    def update(self, batch: np.ndarray, labels: Sequence) -> None:
+        """
+        Add a batch of lines.
+
+        Args:
+            batch: [num_lines, num_features] feature matrix
+            labels: Group label of each line (None: line is not counted)
+        """
+        keep = np.fromiter((label is not None for label in labels), dtype=bool, count=len(labels))
+        if not keep.any():
+            return
+        batch = np.asarray(batch, dtype=np.float64)[keep]
+        codes = self._encode([label for label, k in zip(labels, keep) if k])
+
+        num_groups = len(self.count)
+        batch_count = np.bincount(codes, minlength=num_groups)
+        safe = np.maximum(batch_count, 1)[:, None]
+        batch_mean = np.stack([
+            np.bincount(codes, weights=batch[:, j], minlength=num_groups)
+            for j in range(self.num_features)
+        ], axis=1) / safe
+        centered = batch - batch_mean[codes]
+        batch_m2 = np.stack([
+            np.bincount(codes, weights=centered[:, j] ** 2, minlength=num_groups)
+            for j in range(self.num_features)
+        ], axis=1)
+
+        self.count, self.mean, self.m2 = _merge_moments(
+            self.count, self.mean, self.m2, batch_count, batch_mean, batch_m2
+        )
+
+    def results(self) -> Dict:
+        """Per-group summary, keyed by group label."""
+        return {
+            label: _summarize(self.count[g], self.mean[g], self.m2[g])
+            for g, label in enumerate(self.labels)
+        }
+
+
+def _summarize(count, mean: np.ndarray, m2: np.ndarray) -> Dict:
+    """Summary statistics from accumulated moments (keys of analyze_corpus_stats)."""
+    count = int(count)
+    if count == 0:
+        nan = float('nan')
+        return {
+            'mean_deviation': nan, 'std_deviation': nan,
+            'rhyme_frequency': nan, 'couplet_frequency': nan, 'total_lines': 0,
+        }
+    std = np.sqrt(m2 / count)
+    return {
+        'mean_deviation': float(mean[METER_COLUMN]),
+        'std_deviation': float(std[METER_COLUMN]),
+        'rhyme_frequency': float(mean[FEATURE_NAMES.index('rhyme')]),
+        'couplet_frequency': float(mean[FEATURE_NAMES.index('couplet')]),
+        'total_lines': count,
+    }
+
+
+class CorpusStatsAccumulator:
+    """
+    Streaming corpus statistics over per-line feature matrices.
+
+    Feed poems (or batches of lines) with update(); results() returns the
+    overall summary, a meter deviation histogram and per-group summaries.
+    """
+
+    def __init__(
+        self,
+        group_by: Optional[Dict[str, Dict]] = None,
+        max_deviation_bin: int = 20
+    ):
+        """
+        Args:
+            group_by: Grouping name -> {poem_id: label}, e.g.
+                      {'period': {...}, 'author': {...}}; poems missing from
+                      a mapping are left out of that grouping
+            max_deviation_bin: Deviations are binned per integer value from
+                               0 up to this value (larger values go in the last bin)
+        """
+        self.group_by = group_by or {}
+        self.overall = RunningStats()
+        self.groups = {name: GroupedRunningStats() for name in self.group_by}
+
+        self.bin_edges = np.arange(max_deviation_bin + 2, dtype=np.float64)
+        self.histogram = np.zeros(max_deviation_bin + 1, dtype=np.int64)
+
+    def update(self, features: np.ndarray, poem_ids: Optional[Sequence] = None) -> None:
+        """
+        Add lines.
+
+        Args:
+            features: [num_lines, 4] feature matrix (FEATURE_NAMES order)
+            poem_ids: Poem id of each line (needed for group_by)
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(-1, len(FEATURE_NAMES))
+        self.overall.update(features)
+
+        deviation = np.clip(features[:, METER_COLUMN], self.bin_edges[0], self.bin_edges[-2])
+        self.histogram += np.histogram(deviation, bins=self.bin_edges)[0]
+
+        if self.groups:
+            if poem_ids is None:
+                raise ValueError("poem_ids are required when grouping statistics")
+            for name, mapping in self.group_by.items():
+                self.groups[name].update(features, [mapping.get(pid) for pid in poem_ids])
+
+    def results(self) -> Dict:
+        """
+        Returns:
+            Overall summary (mean_deviation, std_deviation, rhyme_frequency,
+            couplet_frequency, total_lines), plus 'deviation_histogram'
+            ({'bin_edges', 'counts'}) and, with group_by, 'groups'
+            ({grouping name: {label: summary}})
+        """
+        stats = _summarize(self.overall.count, self.overall.mean, self.overall.m2)
+        stats['deviation_histogram'] = {
+            'bin_edges': self.bin_edges.tolist(),
+            'counts': self.histogram.tolist(),
+        }
+        if self.groups:
+            stats['groups'] = {name: grouped.results() for name, grouped in self.groups.items()}
+        return stats
+
+
+def iter_store_batches(
+    store,
+    batch_lines: int = STORE_BATCH_LINES,
+    with_poem_ids: bool = True
+) -> Iterable[Tuple[np.ndarray, Optional[List]]]:
+    """
+    Stream (features, poem_ids per line) batches from a FeatureStore.
+
+    Args:
+        store: FeatureStore to read
+        batch_lines: Maximum lines per batch
+        with_poem_ids: Map lines to poem ids; without it (no grouping) the
+                       poem_ids of each batch are None and no poem index is read
+    """
+    for segment in store.segments:
+        features = segment.arrays['features']
+        if not with_poem_ids:
+            for start in range(0, len(features), batch_lines):
+                yield features[start:start + batch_lines], None
+            continue
+
+        poem_index = segment.arrays['poem_index']
+        first = segment.meta['first_poem_index']
+        poem_ids = segment.poem_ids
+        for start in range(0, len(features), batch_lines):
+            stop = start + batch_lines
+            local = np.asarray(poem_index[start:stop]) - first
+            yield features[start:stop], [poem_ids[i] for i in local.tolist()]
@@ -0,0 +1,341 @@
+"""
+Columnar Feature Store for Per-Line Prosodic Features
+
+Per-line features are kept as flat numpy arrays instead of lists of dicts:
+the four model features form one float32 matrix (so features_to_matrix()
+and single columns are views, not copies), and variable-length stress
+patterns and rhyme keys are stored as offsets and dictionary codes.
+
+Store layout (one directory per segment):
+    meta.json                   Counts and feature names
+    features.npy                [num_lines, 4] float32 (FEATURE_NAMES order)
+    poem_index.npy              [num_lines] int32 corpus-wide poem ordinal
+    line_index.npy              [num_lines] int32 line number within the poem
+    poem_line_offsets.npy       [num_poems + 1] line offset of each poem
+    stress.npy                  Concatenated stress patterns (uint8)
+    stress_offsets.npy          [num_lines + 1] offset of each line's pattern
+    stress_parsed.npy           [num_lines] bool, False where meter parsing failed
+    rhyme_key_codes.npy         [num_lines] int32 index into rhyme_keys.json
+    rhyme_keys.json             Distinct rhyme keys of the segment
+    poem_ids.json               Poem identifiers, in order
+
+A store is either a single segment directory or a directory of part-*
+segments (as written by extract_corpus_features); FeatureStore reads both.
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .prosodic import FEATURE_NAMES
+
+ARRAY_NAMES = (
+    'features',
+    'poem_index',
+    'line_index',
+    'poem_line_offsets',
+    'stress',
+    'stress_offsets',
+    'stress_parsed',
+    'rhyme_key_codes',
+)
+
+
+class FeatureStoreWriter:
+    """Accumulate per-poem feature columns and write them as one segment."""
+
+    def __init__(self, output_dir: str, first_poem_index: int = 0):
+        """
+        Args:
+            output_dir: Segment directory to write
+            first_poem_index: Corpus-wide ordinal of the first poem added
+        """
+        self.output_path = Path(output_dir)
+        self.first_poem_index = first_poem_index
+
+        self.poem_ids = []
+        self._features = []
+        self._stress = []
+        self._rhyme_keys = []
+
+    def add_poem(self, poem_id, columns: Dict) -> None:
+        """
+        Add one poem.
+
+        Args:
+            poem_id: Poem identifier (JSON-serializable)
+            columns: Output of ProsodicFeatureExtractor.extract_feature_columns()
+        """
+        self.poem_ids.append(poem_id)
+        self._features.append(np.asarray(columns['features'], dtype=np.float32))
+        self._stress.extend(columns['stress'])
+        self._rhyme_keys.extend(columns['rhyme_keys'])
+
+    def close(self) -> Dict:
+        """
+        Write the segment.
+
+        Returns:
+            Segment metadata (also written to meta.json)
+        """
+        self.output_path.mkdir(parents=True, exist_ok=True)
+
+        line_counts = [len(f) for f in self._features]
+        num_lines = sum(line_counts)
+
+        features = (
+            np.concatenate(self._features) if self._features
+            else np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32)
+        )
+        poem_line_offsets = _offsets(line_counts)
+        poem_index = np.repeat(
+            np.arange(self.first_poem_index, self.first_poem_index + len(line_counts), dtype=np.int32),
+            line_counts
+        )
+        line_index = (
+            np.arange(num_lines, dtype=np.int64) - np.repeat(poem_line_offsets[:-1], line_counts)
+        ).astype(np.int32)
+
+        stress_parsed = np.array([p is not None for p in self._stress], dtype=bool)
+        stress_lengths = [len(p) if p is not None else 0 for p in self._stress]
+        stress = np.fromiter(
+            (s for p in self._stress if p is not None for s in p),
+            dtype=np.uint8, count=sum(stress_lengths)
+        )
+
+        # Dictionary-encode rhyme keys (a few thousand distinct keys per corpus)
+        key_codes = {}
+        rhyme_key_codes = np.fromiter(
+            (key_codes.setdefault(key, len(key_codes)) for key in self._rhyme_keys),
+            dtype=np.int32, count=len(self._rhyme_keys)
+        )
+
+        arrays = {
+            'features': features,
+            'poem_index': poem_index,
+            'line_index': line_index,
+            'poem_line_offsets': poem_line_offsets,
+            'stress': stress,
+            'stress_offsets': _offsets(stress_lengths),
+            'stress_parsed': stress_parsed,
+            'rhyme_key_codes': rhyme_key_codes,
+        }
+        for name, array in arrays.items():
+            np.save(self.output_path / f'{name}.npy', array)
+
+        with open(self.output_path / 'rhyme_keys.json', 'w') as f:
+            json.dump(list(key_codes), f)
+        with open(self.output_path / 'poem_ids.json', 'w') as f:
+            json.dump(self.poem_ids, f)
+
+        meta = {
+            'feature_names': list(FEATURE_NAMES),
+            'num_poems': len(self.poem_ids),
+            'num_lines': num_lines,
+            'first_poem_index': self.first_poem_index,
+        }
+        with open(self.output_path / 'meta.json', 'w') as f:
+            json.dump(meta, f)
+
+        return meta
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    """Cumulative offsets [0, l0, l0+l1, ...] for a ragged array."""
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class _Segment:
+    """One store segment, arrays memory-mapped on first access."""
+
+    def __init__(self, path: Path, mmap: bool):
+        self.path = path
+        self.mmap_mode = 'r' if mmap else None
+        with open(path / 'meta.json', 'r') as f:
+            self.meta = json.load(f)
+        self._arrays = None
+        self._poem_ids = None
+        self._rhyme_keys = None
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        if self._arrays is None:
+            self._arrays = {
+                name: np.load(self.path / f'{name}.npy', mmap_mode=self.mmap_mode)
+                for name in ARRAY_NAMES
+            }
+        return self._arrays
+
+    @property
+    def poem_ids(self) -> List:
+        if self._poem_ids is None:
+            with open(self.path / 'poem_ids.json', 'r') as f:
+                self._poem_ids = json.load(f)
+        return self._poem_ids
+
+    @property
+    def rhyme_keys(self) -> List[str]:
+        if self._rhyme_keys is None:
+            with open(self.path / 'rhyme_keys.json', 'r') as f:
+                self._rhyme_keys = json.load(f)
+        return self._rhyme_keys
+
+
+class FeatureStore:
+    """
+    Reader for a columnar feature store.
+
+    Poems are addressed by corpus-wide ordinal (0..len-1) or by poem id.
+    Arrays returned for a poem, or for a range of poems within one segment,
+    are views into the memory-mapped files.
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        """
+        Args:
+            path: Segment directory, or directory of part-* segments
+            mmap: Memory-map arrays instead of reading them into memory
+        """
+        root = Path(path)
+        segment_dirs = [root] if (root / 'features.npy').exists() else sorted(root.glob('part-*'))
+        if not segment_dirs:
+            raise FileNotFoundError(f"No feature store segments found in {path}")
+
+        self.segments = [_Segment(d, mmap) for d in segment_dirs]
+        self._poem_starts = _offsets([seg.meta['num_poems'] for seg in self.segments])
+        self._poem_lookup = None
+
+    def __len__(self):
+        return int(self._poem_starts[-1])
+
+    @property
+    def num_lines(self) -> int:
+        return sum(seg.meta['num_lines'] for seg in self.segments)
+
+    @property
+    def poem_ids(self) -> List:
+        return [poem_id for seg in self.segments for poem_id in seg.poem_ids]
+
+    def index_of(self, poem_id) -> int:
+        """Corpus-wide ordinal of a poem id."""
+        if self._poem_lookup is None:
+            self._poem_lookup = {poem_id: idx for idx, poem_id in enumerate(self.poem_ids)}
+        return self._poem_lookup[poem_id]
+
+    def _locate(self, idx: int) -> Tuple[_Segment, int]:
+        """Segment holding poem ordinal idx, and the poem's index within it."""
+        if not 0 <= idx < len(self):
+            raise IndexError(f"Poem index {idx} out of range for {len(self)} poems")
+        seg_idx = int(np.searchsorted(self._poem_starts, idx, side='right')) - 1
+        return self.segments[seg_idx], idx - int(self._poem_starts[seg_idx])
+
+    def poem(self, idx: Optional[int] = None, poem_id=None) -> Dict[str, np.ndarray]:
+        """
+        Columns for one poem.
+
+        Args:
+            idx: Corpus-wide poem ordinal
+            poem_id: Poem identifier (instead of idx)
+
+        Returns:
+            Dict with 'features' [num_lines, 4] and 'poem_index', 'line_index',
+            'stress_parsed' [num_lines] (views), plus
+            'stress' (list of patterns), 'rhyme_keys' (list of str) and 'poem_id'
+        """
+        if poem_id is not None:
+            idx = self.index_of(poem_id)
+        segment, local = self._locate(idx)
+        columns = self._slice_segment(segment, local, local + 1)
+        columns['poem_id'] = segment.poem_ids[local]
+        return columns
+
+    def slice(self, start: int, stop: int) -> Dict[str, np.ndarray]:
+        """
+        Columns for poems [start, stop).
+
+        Zero-copy when the range lies within one segment; ranges spanning
+        segments are concatenated.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        parts = []
+        idx = start
+        while idx < stop:
+            segment, local = self._locate(idx)
+            count = min(stop - idx, segment.meta['num_poems'] - local)
+            parts.append(self._slice_segment(segment, local, local + count))
+            idx += count
+
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return self._slice_segment(self.segments[0], 0, 0)
+        return {
+            name: (
+                np.concatenate([p[name] for p in parts]) if isinstance(parts[0][name], np.ndarray)
+                else [v for p in parts for v in p[name]]
+            )
+            for name in parts[0]
+        }
+
+    def features_to_matrix(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Feature matrix [num_lines, 4] for poems [start, stop) (default: all).
+
+        A view into the store when the range lies within one segment.
+        """
+        return self.slice(start, len(self) if stop is None else stop)['features']
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        One per-line column over the whole store.
+
+        Args:
+            name: A feature name (FEATURE_NAMES), 'poem_index', 'line_index',
+                  'stress_parsed', or 'rhyme_key' (decoded to an object array)
+
+        Returns:
+            Column array; a view for a single-segment store (except 'rhyme_key')
+        """
+        if name in FEATURE_NAMES:
+            col = FEATURE_NAMES.index(name)
+            arrays = [seg.arrays['features'][:, col] for seg in self.segments]
+        elif name == 'rhyme_key':
+            # Codes index each segment's own key list
+            arrays = [
+                np.asarray(seg.rhyme_keys, dtype=object)[seg.arrays['rhyme_key_codes']]
+                for seg in self.segments
+            ]
+        elif name in ('poem_index', 'line_index', 'stress_parsed'):
+            arrays = [seg.arrays[name] for seg in self.segments]
+        else:
+            raise KeyError(f"Unknown feature store column: {name}")
+        return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+
+    @staticmethod
+    def _slice_segment(segment: _Segment, start: int, stop: int) -> Dict:
+        """Columns for poems [start, stop) of one segment."""
+        arrays = segment.arrays
+        line_start, line_stop = (int(x) for x in arrays['poem_line_offsets'][[start, stop]])
+
+        stress_offsets = arrays['stress_offsets'][line_start:line_stop + 1]
+        stress_parsed = arrays['stress_parsed'][line_start:line_stop]
+        stress_values = arrays['stress']
+        stress = [
+            stress_values[stress_offsets[i]:stress_offsets[i + 1]].tolist() if parsed else None
+            for i, parsed in enumerate(stress_parsed)
+        ]
+
+        codes = arrays['rhyme_key_codes'][line_start:line_stop]
+        rhyme_keys = segment.rhyme_keys
+
+        return {
+            'features': arrays['features'][line_start:line_stop],
+            'poem_index': arrays['poem_index'][line_start:line_stop],
+            'line_index': arrays['line_index'][line_start:line_stop],
+            'stress_parsed': stress_parsed,
+            'stress': stress,
+            'rhyme_keys': [rhyme_keys[c] for c in codes.tolist()],
+        }
@@ -7,13 +7,20 @@ Implements:
 3. Quatrain Contrastive Loss - 0.2 weight
 4. Sonnet Contrastive Loss - 0.1 weight
 
-Uses InfoNCE (NT-Xent) loss for contrastive components.
+Uses InfoNCE (NT-Xent) loss for contrastive components. Line and quatrain
+negatives are either the explicitly sampled negative pairs or, with
+negative_mode='in_batch', every other line in the batch.
 """
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
+
+# (first, second) embeddings of a batch of pairs, each (num_pairs, hidden_dim)
+PairTensors = Tuple[torch.Tensor, torch.Tensor]
+
+NEGATIVE_MODES = ('sampled', 'in_batch')
 
 
 class HierarchicalLoss(nn.Module):
@@ -29,7 +36,9 @@ class HierarchicalLoss(nn.Module):
         mlm_weight: float = 0.5,
         line_weight: float = 0.2,
         quatrain_weight: float = 0.2,
-        sonnet_weight: float = 0.1
+        sonnet_weight: float = 0.1,
+        negative_mode: str = 'sampled',
+        max_negatives_per_anchor: Optional[int] = None
     ):
         """
         Args:
@@ -38,14 +47,25 @@ class HierarchicalLoss(nn.Module):
             line_weight: Weight for line contrastive loss (default: 0.2)
             quatrain_weight: Weight for quatrain contrastive loss (default: 0.2)
             sonnet_weight: Weight for sonnet contrastive loss (default: 0.1)
+            negative_mode: Negatives for line/quatrain losses: 'sampled' uses
+                the dataset's negative pairs, 'in_batch' uses every other line
+                in the batch that isn't a positive for the anchor
+                (default: 'sampled')
+            max_negatives_per_anchor: In 'in_batch' mode, randomly keep at most
+                this many negatives per anchor (default: None, keep all)
         """
         super().__init__()
 
+        if negative_mode not in NEGATIVE_MODES:
+            raise ValueError(f"negative_mode must be one of {NEGATIVE_MODES}, got {negative_mode!r}")
+
         self.temperature = temperature
         self.mlm_weight = mlm_weight
         self.line_weight = line_weight
         self.quatrain_weight = quatrain_weight
         self.sonnet_weight = sonnet_weight
+        self.negative_mode = negative_mode
+        self.max_negatives_per_anchor = max_negatives_per_anchor
 
         # Verify weights sum to 1.0
         total_weight = mlm_weight + line_weight + quatrain_weight + sonnet_weight
@@ -68,8 +88,10 @@ class HierarchicalLoss(nn.Module):
         Args:
             mlm_logits: Logits from MLM head (batch_size, seq_len, vocab_size)
             mlm_labels: MLM labels (batch_size, seq_len)
-            line_embeddings: Dict with 'positive_pairs' and 'negative_pairs'
-            quatrain_embeddings: Dict with 'positive_pairs' and 'negative_pairs'
+            line_embeddings: Dict with 'positive_pairs' and 'negative_pairs',
+                each a (first, second) tuple of (num_pairs, hidden_dim) tensors;
+                'in_batch' mode also needs 'lines' and 'positive_index'
+            quatrain_embeddings: Same structure as line_embeddings
             sonnet_embeddings: Sonnet-level embeddings (batch_size, hidden_dim)
 
         Returns:
@@ -84,16 +106,10 @@ class HierarchicalLoss(nn.Module):
         mlm_loss = self._compute_mlm_loss(mlm_logits, mlm_labels)
 
         # 2. Line Contrastive Loss
-        line_loss = self._compute_contrastive_loss(
-            line_embeddings['positive_pairs'],
-            line_embeddings['negative_pairs']
-        )
+        line_loss = self._compute_level_loss(line_embeddings)
 
         # 3. Quatrain Contrastive Loss
-        quatrain_loss = self._compute_contrastive_loss(
-            quatrain_embeddings['positive_pairs'],
-            quatrain_embeddings['negative_pairs']
-        )
+        quatrain_loss = self._compute_level_loss(quatrain_embeddings)
 
         # 4. Sonnet Contrastive Loss
         sonnet_loss = self._compute_sonnet_contrastive_loss(sonnet_embeddings)
@@ -136,10 +152,40 @@ class HierarchicalLoss(nn.Module):
         )
         return loss
 
+    def _compute_level_loss(self, embeddings: Dict) -> torch.Tensor:
+        """
+        Compute the line or quatrain contrastive loss in the configured mode.
+
+        Args:
+            embeddings: Line or quatrain embeddings dict from HierarchicalBertModel
+
+        Returns:
+            scalar loss
+        """
+        if self.negative_mode == 'sampled':
+            return self._compute_contrastive_loss(
+                embeddings['positive_pairs'],
+                embeddings['negative_pairs']
+            )
+
+        if _stack_pairs(embeddings['positive_pairs']) is None:
+            return torch.tensor(0.0, requires_grad=True)
+
+        if 'lines' not in embeddings:
+            raise ValueError(
+                "negative_mode='in_batch' needs 'lines' and 'positive_index' "
+                "(HierarchicalBertModel with batch_line_encoding=True)"
+            )
+
+        return self._compute_in_batch_contrastive_loss(
+            embeddings['lines'],
+            embeddings['positive_index']
+        )
+
     def _compute_contrastive_loss(
         self,
-        positive_pairs: List[torch.Tensor],
-        negative_pairs: List[torch.Tensor]
+        positive_pairs: Union[PairTensors, List[PairTensors]],
+        negative_pairs: Union[PairTensors, List[PairTensors]]
     ) -> torch.Tensor:
         """
         Compute InfoNCE contrastive loss.
@@ -148,52 +194,94 @@ class HierarchicalLoss(nn.Module):
         - Positive: similar embedding (adjacent/rhyming line, same quatrain)
         - Negatives: dissimilar embeddings (random lines, different quatrains)
 
+        Every anchor is scored against its positive and against ALL negatives
+        in the batch, as one (num_positive, 1 + num_negative) logit matrix.
+
         Args:
-            positive_pairs: List of (anchor, positive) embedding pairs
-            negative_pairs: List of (anchor, negative) embedding pairs
+            positive_pairs: (anchors, positives) tensors of shape (P, hidden_dim),
+                or a list of (anchor, positive) embedding pairs
+            negative_pairs: (anchors, negatives) tensors of shape (N, hidden_dim),
+                or a list of (anchor, negative) embedding pairs
 
         Returns:
             scalar loss
         """
-        if len(positive_pairs) == 0:
+        positive_pairs = _stack_pairs(positive_pairs)
+        negative_pairs = _stack_pairs(negative_pairs)
+
+        if positive_pairs is None:
             # Return 0 loss on same device as model parameters
             return torch.tensor(0.0, requires_grad=True)
 
-        if len(negative_pairs) == 0:
+        if negative_pairs is None:
             # Can't compute contrastive loss without negatives
             return torch.tensor(0.0, requires_grad=True)
 
-        losses = []
+        anchors, positives = positive_pairs
+        _, negatives = negative_pairs
 
-        # Use all negative samples for each positive pair
-        # (standard InfoNCE: one anchor+positive vs many negatives)
-        all_negatives = [neg for _, neg in negative_pairs]
+        # Normalize embeddings
+        anchor_norm = F.normalize(anchors, dim=-1)
+        positive_norm = F.normalize(positives, dim=-1)
+        negative_norm = F.normalize(negatives, dim=-1)
 
-        for anchor, positive in positive_pairs:
-            # Normalize embeddings
-            anchor_norm = F.normalize(anchor, dim=-1)
-            positive_norm = F.normalize(positive, dim=-1)
+        # Positive similarities (P, 1)
+        pos_sims = torch.sum(anchor_norm * positive_norm, dim=-1, keepdim=True) / self.temperature
 
-            # Positive similarity
-            pos_sim = torch.sum(anchor_norm * positive_norm, dim=-1) / self.temperature
+        # Negative similarities (P, N) (use ALL negatives, not just matched anchors)
+        neg_sims = torch.matmul(anchor_norm, negative_norm.T) / self.temperature
 
-            # Negative similarities (use ALL negatives, not just matched anchors)
-            neg_sims = []
-            for negative in all_negatives:
-                negative_norm = F.normalize(negative, dim=-1)
-                neg_sim = torch.sum(anchor_norm * negative_norm, dim=-1) / self.temperature
-                neg_sims.append(neg_sim)
+        # InfoNCE loss: -log(exp(pos) / (exp(pos) + sum(exp(neg))))
+        logits = torch.cat([pos_sims, neg_sims], dim=1)
+        labels = torch.zeros(logits.size(0), dtype=torch.long, device=logits.device)
 
-            # InfoNCE loss: -log(exp(pos) / (exp(pos) + sum(exp(neg))))
-            neg_sims_tensor = torch.stack(neg_sims)
-            logits = torch.cat([pos_sim.unsqueeze(0), neg_sims_tensor], dim=0)
-            loss = -F.log_softmax(logits, dim=0)[0]
-            losses.append(loss)
+        return F.cross_entropy(logits, labels)
 
-        if len(losses) == 0:
-            return torch.tensor(0.0, requires_grad=True)
+    def _compute_in_batch_contrastive_loss(
+        self,
+        lines: torch.Tensor,
+        positive_index: torch.Tensor
+    ) -> torch.Tensor:
+        """
+        Compute InfoNCE loss with in-batch negatives.
+
+        Each anchor is scored against its positive and against every other
+        line in the batch, excluding itself and any line it forms a positive
+        pair with (as _compute_sonnet_contrastive_loss does for sonnets).
+
+        Args:
+            lines: (num_lines, hidden_dim) embeddings of every line in the batch
+            positive_index: (num_pairs, 2) anchor/positive rows into lines
+
+        Returns:
+            scalar loss
+        """
+        num_lines = lines.size(0)
+        anchor_rows, positive_rows = positive_index[:, 0], positive_index[:, 1]
+
+        # Normalize embeddings and score every anchor against every line
+        lines_norm = F.normalize(lines, dim=-1)
+        sims = torch.matmul(lines_norm[anchor_rows], lines_norm.T) / self.temperature
+        pos_sims = sims.gather(1, positive_rows.unsqueeze(1))
+
+        # Lines that are not negatives for a given anchor: itself and its positives
+        related = torch.eye(num_lines, dtype=torch.bool, device=lines.device)
+        related[anchor_rows, positive_rows] = True
+        related[positive_rows, anchor_rows] = True
+        excluded = related[anchor_rows]
+
+        if self.max_negatives_per_anchor is not None and self.max_negatives_per_anchor < num_lines:
+            # Random subset of each anchor's valid negatives
+            scores = torch.rand(sims.shape, device=sims.device).masked_fill(excluded, -1.0)
+            keep = scores.topk(self.max_negatives_per_anchor, dim=1).indices
+            neg_sims = sims.gather(1, keep).masked_fill(excluded.gather(1, keep), float('-inf'))
+        else:
+            neg_sims = sims.masked_fill(excluded, float('-inf'))
 
-        return torch.mean(torch.stack(losses))
+        logits = torch.cat([pos_sims, neg_sims], dim=1)
+        labels = torch.zeros(logits.size(0), dtype=torch.long, device=logits.device)
+
+        return F.cross_entropy(logits, labels)
 
     def _compute_sonnet_contrastive_loss(
         self,
@@ -231,6 +319,30 @@ class HierarchicalLoss(nn.Module):
         return loss
 
 
+def _stack_pairs(
+    pairs: Union[PairTensors, List[PairTensors]]
+) -> Optional[PairTensors]:
+    """
+    Normalize pair embeddings to a (first, second) tuple of stacked tensors.
+
+    Args:
+        pairs: (first, second) tensors of shape (num_pairs, hidden_dim), or a
+            list of (first, second) embedding pairs of shape (hidden_dim,)
+
+    Returns:
+        (first, second) tensors, or None if there are no pairs
+    """
+    if isinstance(pairs, tuple):
+        first, second = pairs
+        return (first, second) if first.size(0) > 0 else None
+
+    if len(pairs) == 0:
+        return None
+
+    first, second = zip(*pairs)
+    return torch.stack(first), torch.stack(second)
+
+
 class InfoNCELoss(nn.Module):
     """
     InfoNCE (Normalized Temperature-scaled Cross Entropy) Loss.
@@ -8,13 +8,18 @@ PyTorch Dataset that provides hierarchical structure for:
 - Sonnet level (contrastive)
 """
 
+import os
 import json
 import random
 import torch
-from torch.utils.data import Dataset
-from typing import Dict, List, Tuple
+import torch.nn.functional as F
+from torch.utils.data import Dataset, Sampler
+from typing import Dict, List, Optional, Tuple
 from transformers import BertTokenizer
 
+# Lines are shorter than full sonnets
+LINE_MAX_LENGTH = 64
+
 
 class HierarchicalPoetryDataset(Dataset):
     """
@@ -39,7 +44,7 @@ class HierarchicalPoetryDataset(Dataset):
         """
         Args:
             data_path: Path to hierarchical JSONL file
-            tokenizer: BERT tokenizer
+            tokenizer: BERT tokenizer (BertTokenizerFast recommended)
             max_length: Max sequence length for tokenization
             mlm_probability: Probability of masking tokens for MLM
             line_negative_samples: Number of negative line pairs per positive
@@ -51,7 +56,15 @@ class HierarchicalPoetryDataset(Dataset):
         self.line_negative_samples = line_negative_samples
         self.quatrain_negative_samples = quatrain_negative_samples
 
-        # Load data
+        # Per-process random state, created on first use (see _rngs)
+        self._rng_pid = None
+        self._rng = None
+        self._generator = None
+
+        self._load(data_path)
+
+    def _load(self, data_path: str) -> None:
+        """Load hierarchical sonnets from JSONL."""
         self.sonnets = []
         with open(data_path, 'r') as f:
             for line in f:
@@ -62,6 +75,34 @@ class HierarchicalPoetryDataset(Dataset):
     def __len__(self):
         return len(self.sonnets)
 
+    def __getstate__(self) -> Dict:
+        # Workers started with spawn get a pickled copy; they seed their own RNGs
+        state = self.__dict__.copy()
+        state['_rng_pid'] = None
+        state['_rng'] = None
+        state['_generator'] = None
+        return state
+
+    def _rngs(self) -> Tuple[random.Random, torch.Generator]:
+        """
+        Random number generators for pair sampling and MLM masking.
+
+        Created lazily in each process and seeded from torch.initial_seed(),
+        which the DataLoader sets to base_seed + worker_id in every worker.
+        Forked workers therefore never replay the parent's (or each other's)
+        random stream, and single-process runs follow torch.manual_seed().
+
+        Returns:
+            (random.Random, torch.Generator) owned by the current process
+        """
+        pid = os.getpid()
+        if self._rng_pid != pid:
+            seed = torch.initial_seed()
+            self._rng = random.Random(seed)
+            self._generator = torch.Generator().manual_seed(seed)
+            self._rng_pid = pid
+        return self._rng, self._generator
+
     def __getitem__(self, idx: int) -> Dict:
         """
         Get a single sonnet with all hierarchical annotations.
@@ -70,52 +111,32 @@ class HierarchicalPoetryDataset(Dataset):
         - input_ids: Tokenized sonnet (for MLM)
         - attention_mask: Attention mask
         - mlm_labels: Labels for MLM (-100 for unmasked tokens)
-        - line_pairs_positive: List of (line_i, line_j) positive pairs
-        - line_pairs_negative: List of (line_i, line_j) negative pairs
-        - quatrain_pairs_positive: List of quatrain pairs
-        - quatrain_pairs_negative: List of quatrain pairs
+        - line_input_ids: Tokenized lines (shape: [num_lines, longest_line])
+        - line_attention_mask: Line attention masks (shape: [num_lines, longest_line])
+        - line_pairs_positive: (line_i, line_j) positive pairs (shape: [P, 2])
+        - line_pairs_negative: (line_i, line_j) negative pairs (shape: [N, 2])
+        - quatrain_pairs_positive: Positive quatrain line pairs (shape: [Q, 2])
+        - quatrain_pairs_negative: Negative quatrain line pairs (shape: [M, 2])
         - sonnet_id: Sonnet identifier
+
+        Pair tensors hold row indices into line_input_ids. Sequences are not
+        padded beyond this sonnet; collate_hierarchical pads per batch.
         """
-        sonnet = self.sonnets[idx]
-
-        # Get full sonnet text
-        full_text = " [SEP] ".join(sonnet['lines'])
-
-        # Tokenize
-        encoding = self.tokenizer(
-            full_text,
-            max_length=self.max_length,
-            padding='max_length',
-            truncation=True,
-            return_tensors='pt'
-        )
+        sonnet = self._get_sonnet(idx)
 
-        input_ids = encoding['input_ids'].squeeze(0)
-        attention_mask = encoding['attention_mask'].squeeze(0)
+        # Tokenize sonnet (for MLM) and individual lines (for contrastive learning)
+        input_ids, attention_mask, line_input_ids, line_attention_mask = self._tokenize(sonnet)
 
         # Create MLM labels
         mlm_labels = self._create_mlm_labels(input_ids)
 
-        # Tokenize individual lines for contrastive learning
-        line_encodings = []
-        for line in sonnet['lines']:
-            line_enc = self.tokenizer(
-                line,
-                max_length=64,  # Lines are shorter
-                padding='max_length',
-                truncation=True,
-                return_tensors='pt'
-            )
-            line_encodings.append({
-                'input_ids': line_enc['input_ids'].squeeze(0),
-                'attention_mask': line_enc['attention_mask'].squeeze(0)
-            })
+        num_lines = line_input_ids.size(0)
 
         # Create line pairs for contrastive learning
-        line_pairs_pos, line_pairs_neg = self._create_line_pairs(sonnet, line_encodings)
+        line_pairs_pos, line_pairs_neg = self._create_line_pairs(sonnet, num_lines)
 
         # Create quatrain pairs for contrastive learning
-        quatrain_pairs_pos, quatrain_pairs_neg = self._create_quatrain_pairs(sonnet, line_encodings)
+        quatrain_pairs_pos, quatrain_pairs_neg = self._create_quatrain_pairs(sonnet, num_lines)
 
         return {
             # Token level (MLM)
@@ -123,6 +144,10 @@ class HierarchicalPoetryDataset(Dataset):
             'attention_mask': attention_mask,
             'mlm_labels': mlm_labels,
 
+            # Lines, encoded once and referenced by index in the pairs below
+            'line_input_ids': line_input_ids,
+            'line_attention_mask': line_attention_mask,
+
             # Line level (contrastive)
             'line_pairs_positive': line_pairs_pos,
             'line_pairs_negative': line_pairs_neg,
@@ -136,6 +161,74 @@ class HierarchicalPoetryDataset(Dataset):
             'num_lines': sonnet['num_lines']
         }
 
+    def _get_sonnet(self, idx: int) -> Dict:
+        """Return the hierarchical annotation dict for one sonnet."""
+        return self.sonnets[idx]
+
+    def _tokenize(
+        self,
+        sonnet: Dict
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Tokenize a sonnet and its lines.
+
+        Returns:
+            (input_ids, attention_mask) for the full sonnet (shape: [seq_len],
+            at most max_length) and (line_input_ids, line_attention_mask) for
+            its lines (shape: [num_lines, longest_line], at most LINE_MAX_LENGTH)
+        """
+        return self._assemble(tokenize_lines(self.tokenizer, sonnet['lines']))
+
+    def _assemble(
+        self,
+        line_token_ids: List[List[int]]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Build sonnet and line model inputs from per-line token ids.
+
+        The sonnet sequence is [CLS] line_1 [SEP] line_2 [SEP] ... [SEP],
+        the same ids the tokenizer produces for " [SEP] ".join(lines), so
+        each line is only tokenized once.
+
+        Args:
+            line_token_ids: Token ids of each line, without special tokens
+
+        Returns:
+            Same as _tokenize()
+        """
+        cls_id = self.tokenizer.cls_token_id
+        sep_id = self.tokenizer.sep_token_id
+
+        body = []
+        for i, ids in enumerate(line_token_ids):
+            if i > 0:
+                body.append(sep_id)
+            body.extend(ids)
+
+        input_ids = torch.tensor([cls_id, *body[:self.max_length - 2], sep_id], dtype=torch.long)
+        attention_mask = torch.ones_like(input_ids)
+        line_input_ids, line_attention_mask = _pad_sequences(
+            [[cls_id, *ids[:LINE_MAX_LENGTH - 2], sep_id] for ids in line_token_ids],
+            self.tokenizer.pad_token_id
+        )
+
+        return input_ids, attention_mask, line_input_ids, line_attention_mask
+
+    @property
+    def lengths(self) -> List[int]:
+        """
+        Token length of each sonnet sequence, for length-bucketed batching.
+
+        Tokenizes the whole dataset on first access.
+        """
+        if getattr(self, '_lengths', None) is None:
+            self._lengths = [
+                min(sum(len(ids) for ids in tokenize_lines(self.tokenizer, sonnet['lines']))
+                    + max(len(sonnet['lines']), 1) + 1, self.max_length)
+                for sonnet in self.sonnets
+            ]
+        return self._lengths
+
     def _create_mlm_labels(self, input_ids: torch.Tensor) -> torch.Tensor:
         """
         Create MLM labels by masking tokens.
@@ -148,6 +241,7 @@ class HierarchicalPoetryDataset(Dataset):
                         -100 for unmasked tokens (ignored by loss)
         """
         labels = input_ids.clone()
+        _, generator = self._rngs()
 
         # Create probability mask
         probability_matrix = torch.full(labels.shape, self.mlm_probability)
@@ -159,18 +253,25 @@ class HierarchicalPoetryDataset(Dataset):
         probability_matrix.masked_fill_(torch.tensor(special_tokens_mask, dtype=torch.bool), value=0.0)
 
         # Create masked indices
-        masked_indices = torch.bernoulli(probability_matrix).bool()
+        masked_indices = torch.bernoulli(probability_matrix, generator=generator).bool()
 
         # Set unmasked tokens to -100 (ignored by loss)
         labels[~masked_indices] = -100
 
         # 80% of time: replace with [MASK]
-        indices_replaced = torch.bernoulli(torch.full(labels.shape, 0.8)).bool() & masked_indices
+        indices_replaced = (
+            torch.bernoulli(torch.full(labels.shape, 0.8), generator=generator).bool() & masked_indices
+        )
         input_ids[indices_replaced] = self.tokenizer.mask_token_id
 
         # 10% of time: replace with random token
-        indices_random = torch.bernoulli(torch.full(labels.shape, 0.5)).bool() & masked_indices & ~indices_replaced
-        random_words = torch.randint(len(self.tokenizer), labels.shape, dtype=torch.long)
+        indices_random = (
+            torch.bernoulli(torch.full(labels.shape, 0.5), generator=generator).bool()
+            & masked_indices & ~indices_replaced
+        )
+        random_words = torch.randint(
+            len(self.tokenizer), labels.shape, dtype=torch.long, generator=generator
+        )
         input_ids[indices_random] = random_words[indices_random]
 
         # 10% of time: keep original token (for contrastive learning)
@@ -181,8 +282,8 @@ class HierarchicalPoetryDataset(Dataset):
     def _create_line_pairs(
         self,
         sonnet: Dict,
-        line_encodings: List[Dict]
-    ) -> Tuple[List[Dict], List[Dict]]:
+        num_lines: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
         """
         Create positive and negative line pairs for contrastive learning.
 
@@ -192,30 +293,20 @@ class HierarchicalPoetryDataset(Dataset):
 
         Negative pairs:
         - Random lines from same sonnet (within-sonnet negatives)
+
+        Returns:
+            (positive_pairs, negative_pairs) as [num_pairs, 2] line index tensors
         """
         positive_pairs = []
         negative_pairs = []
+        rng, _ = self._rngs()
 
-        # Positive pairs: adjacent lines
-        for i, j in sonnet['adjacent_pairs']:
-            if i < len(line_encodings) and j < len(line_encodings):
-                positive_pairs.append({
-                    'anchor': line_encodings[i],
-                    'positive': line_encodings[j],
-                    'type': 'adjacent'
-                })
-
-        # Positive pairs: rhyming lines
-        for i, j in sonnet['rhyme_pairs']:
-            if i < len(line_encodings) and j < len(line_encodings):
-                positive_pairs.append({
-                    'anchor': line_encodings[i],
-                    'positive': line_encodings[j],
-                    'type': 'rhyme'
-                })
+        # Positive pairs: adjacent lines, then rhyming lines
+        for i, j in sonnet['adjacent_pairs'] + sonnet['rhyme_pairs']:
+            if i < num_lines and j < num_lines:
+                positive_pairs.append((i, j))
 
         # Negative pairs: random non-adjacent, non-rhyming lines
-        num_lines = len(line_encodings)
         positive_indices = set()
         for i, j in sonnet['adjacent_pairs'] + sonnet['rhyme_pairs']:
             positive_indices.add((i, j))
@@ -226,24 +317,20 @@ class HierarchicalPoetryDataset(Dataset):
             # Random pair that's not positive
             attempts = 0
             while attempts < 10:
-                i = random.randint(0, num_lines - 1)
-                j = random.randint(0, num_lines - 1)
+                i = rng.randint(0, num_lines - 1)
+                j = rng.randint(0, num_lines - 1)
                 if i != j and (i, j) not in positive_indices:
-                    negative_pairs.append({
-                        'anchor': line_encodings[i],
-                        'negative': line_encodings[j],
-                        'type': 'random'
-                    })
+                    negative_pairs.append((i, j))
                     break
                 attempts += 1
 
-        return positive_pairs, negative_pairs
+        return _pair_tensor(positive_pairs), _pair_tensor(negative_pairs)
 
     def _create_quatrain_pairs(
         self,
         sonnet: Dict,
-        line_encodings: List[Dict]
-    ) -> Tuple[List[Dict], List[Dict]]:
+        num_lines: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
         """
         Create positive and negative quatrain pairs.
 
@@ -252,9 +339,13 @@ class HierarchicalPoetryDataset(Dataset):
 
         Negative pairs:
         - Lines from different quatrains
+
+        Returns:
+            (positive_pairs, negative_pairs) as [num_pairs, 2] line index tensors
         """
         positive_pairs = []
         negative_pairs = []
+        rng, _ = self._rngs()
 
         # Define quatrains
         quatrains = [
@@ -265,7 +356,7 @@ class HierarchicalPoetryDataset(Dataset):
         ]
 
         # Positive pairs: lines within same quatrain
-        for q_idx, quatrain in enumerate(quatrains):
+        for quatrain in quatrains:
             if len(quatrain) < 2:
                 continue
 
@@ -275,12 +366,8 @@ class HierarchicalPoetryDataset(Dataset):
                     line_i = quatrain[i]
                     line_j = quatrain[j]
 
-                    if line_i < len(line_encodings) and line_j < len(line_encodings):
-                        positive_pairs.append({
-                            'anchor': line_encodings[line_i],
-                            'positive': line_encodings[line_j],
-                            'quatrain': q_idx
-                        })
+                    if line_i < num_lines and line_j < num_lines:
+                        positive_pairs.append((line_i, line_j))
 
         # Negative pairs: lines from different quatrains
         for _ in range(len(positive_pairs) * self.quatrain_negative_samples):
@@ -288,42 +375,110 @@ class HierarchicalPoetryDataset(Dataset):
             if len(quatrains) < 2:
                 break
 
-            q1, q2 = random.sample(range(len(quatrains)), 2)
+            q1, q2 = rng.sample(range(len(quatrains)), 2)
 
             if len(quatrains[q1]) == 0 or len(quatrains[q2]) == 0:
                 continue
 
-            line_i = random.choice(quatrains[q1])
-            line_j = random.choice(quatrains[q2])
+            line_i = rng.choice(quatrains[q1])
+            line_j = rng.choice(quatrains[q2])
 
-            if line_i < len(line_encodings) and line_j < len(line_encodings):
-                negative_pairs.append({
-                    'anchor': line_encodings[line_i],
-                    'negative': line_encodings[line_j],
-                    'quatrains': (q1, q2)
-                })
+            if line_i < num_lines and line_j < num_lines:
+                negative_pairs.append((line_i, line_j))
 
-        return positive_pairs, negative_pairs
+        return _pair_tensor(positive_pairs), _pair_tensor(negative_pairs)
 
 
-def collate_hierarchical(batch: List[Dict]) -> Dict:
+def tokenize_lines(tokenizer: BertTokenizer, lines: List[str]) -> List[List[int]]:
     """
-    Custom collate function for hierarchical batches.
+    Tokenize all lines of a poem in one batched tokenizer call.
+
+    With BertTokenizerFast the batch is encoded in parallel in Rust rather
+    than one string at a time in Python.
+
+    Args:
+        tokenizer: BERT tokenizer (BertTokenizer or BertTokenizerFast)
+        lines: Lines of the poem
+
+    Returns:
+        Token ids of each line, without special tokens
+    """
+    if not lines:
+        return []
+    return tokenizer(lines, add_special_tokens=False)['input_ids']
+
 
-    Handles variable-length line and quatrain pairs.
+def _pad_sequences(
+    sequences: List[List[int]],
+    pad_value: int,
+    length: Optional[int] = None
+) -> Tuple[torch.Tensor, torch.Tensor]:
     """
-    # Stack token-level data
-    input_ids = torch.stack([item['input_ids'] for item in batch])
-    attention_mask = torch.stack([item['attention_mask'] for item in batch])
-    mlm_labels = torch.stack([item['mlm_labels'] for item in batch])
+    Right-pad token id sequences into one tensor.
 
-    # Collect line pairs (keep as list of lists for now)
-    line_pairs_pos = [item['line_pairs_positive'] for item in batch]
-    line_pairs_neg = [item['line_pairs_negative'] for item in batch]
+    Args:
+        sequences: Token id sequences (lists or 1-D tensors)
+        pad_value: Value for padding positions
+        length: Padded length (default: longest sequence)
+
+    Returns:
+        (padded, mask), each (num_sequences, length); mask is 1 for real tokens
+    """
+    if length is None:
+        length = max((len(ids) for ids in sequences), default=0)
+
+    padded = torch.full((len(sequences), length), pad_value, dtype=torch.long)
+    mask = torch.zeros((len(sequences), length), dtype=torch.long)
+    for row, ids in enumerate(sequences):
+        padded[row, :len(ids)] = torch.as_tensor(ids, dtype=torch.long)
+        mask[row, :len(ids)] = 1
+    return padded, mask
+
+
+def _pair_tensor(pairs: List[Tuple[int, int]]) -> torch.Tensor:
+    """Convert a list of (i, j) line indices to a [num_pairs, 2] long tensor."""
+    return torch.tensor(pairs, dtype=torch.long).view(-1, 2)
 
-    # Collect quatrain pairs
-    quatrain_pairs_pos = [item['quatrain_pairs_positive'] for item in batch]
-    quatrain_pairs_neg = [item['quatrain_pairs_negative'] for item in batch]
+
+def collate_hierarchical(batch: List[Dict], pad_token_id: int = 0) -> Dict:
+    """
+    Custom collate function for hierarchical batches.
+
+    Pads sonnets and lines to the longest in the batch (not to max_length),
+    concatenates every sonnet's lines into one [total_lines, longest_line]
+    tensor and offsets each sonnet's pair indices into it.
+
+    Args:
+        batch: Items from HierarchicalPoetryDataset
+        pad_token_id: Tokenizer pad id (0 for BERT vocabularies)
+    """
+    # Pad token-level data to the longest sonnet
+    input_ids, attention_mask = _pad_sequences(
+        [item['input_ids'] for item in batch], pad_token_id
+    )
+    mlm_labels, _ = _pad_sequences([item['mlm_labels'] for item in batch], -100)
+
+    # Concatenate lines across the batch, padded to the longest line
+    line_length = max(item['line_input_ids'].size(1) for item in batch)
+    line_input_ids = torch.cat([
+        F.pad(item['line_input_ids'], (0, line_length - item['line_input_ids'].size(1)),
+              value=pad_token_id)
+        for item in batch
+    ])
+    line_attention_mask = torch.cat([
+        F.pad(item['line_attention_mask'], (0, line_length - item['line_attention_mask'].size(1)))
+        for item in batch
+    ])
+
+    # Row offset of each sonnet's first line in the concatenated lines
+    line_offsets = [0]
+    for item in batch[:-1]:
+        line_offsets.append(line_offsets[-1] + item['line_input_ids'].size(0))
+
+    def offset_pairs(key: str) -> torch.Tensor:
+        return torch.cat([
+            item[key] + offset for item, offset in zip(batch, line_offsets)
+        ])
 
     # Metadata
     sonnet_ids = [item['sonnet_id'] for item in batch]
@@ -332,9 +487,76 @@ def collate_hierarchical(batch: List[Dict]) -> Dict:
         'input_ids': input_ids,
         'attention_mask': attention_mask,
         'mlm_labels': mlm_labels,
-        'line_pairs_positive': line_pairs_pos,
-        'line_pairs_negative': line_pairs_neg,
-        'quatrain_pairs_positive': quatrain_pairs_pos,
-        'quatrain_pairs_negative': quatrain_pairs_neg,
+        'line_input_ids': line_input_ids,
+        'line_attention_mask': line_attention_mask,
+        'line_pairs_positive': offset_pairs('line_pairs_positive'),
+        'line_pairs_negative': offset_pairs('line_pairs_negative'),
+        'quatrain_pairs_positive': offset_pairs('quatrain_pairs_positive'),
+        'quatrain_pairs_negative': offset_pairs('quatrain_pairs_negative'),
         'sonnet_ids': sonnet_ids
     }
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Sampler that orders indices so consecutive batches hold similar lengths.
+
+    Indices are shuffled, split into buckets of batch_size * bucket_multiplier,
+    sorted by length within each bucket, cut into batches, and the full
+    batches are shuffled. Use it as a plain sampler with the same batch_size on the
+    DataLoader. The order changes on every pass (or via set_epoch).
+    """
+
+    def __init__(
+        self,
+        lengths: List[int],
+        batch_size: int,
+        bucket_multiplier: int = 50,
+        seed: int = 42
+    ):
+        """
+        Args:
+            lengths: Sequence length of each dataset item
+            batch_size: Batch size the DataLoader will use
+            bucket_multiplier: Bucket size in batches; larger buckets give
+                tighter length grouping but less randomness
+            seed: Base random seed
+        """
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.bucket_multiplier = bucket_multiplier
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        self.epoch += 1
+
+        indices = torch.randperm(len(self.lengths), generator=generator).tolist()
+        bucket_size = self.batch_size * self.bucket_multiplier
+
+        batches = []
+        for start in range(0, len(indices), bucket_size):
+            bucket = sorted(
+                indices[start:start + bucket_size],
+                key=lambda i: self.lengths[i],
+                reverse=True
+            )
+            batches.extend(
+                bucket[i:i + self.batch_size] for i in range(0, len(bucket), self.batch_size)
+            )
+
+        # Only the final batch can be short; keep it last so the DataLoader's
+        # batching stays aligned with ours
+        last = batches.pop() if batches and len(batches[-1]) < self.batch_size else None
+        for b in torch.randperm(len(batches), generator=generator).tolist():
+            yield from batches[b]
+        if last:
+            yield from last
@@ -0,0 +1,265 @@
+"""
+Pre-tokenized, Memory-Mapped Shards for Hierarchical Training Data
+
+Tokenizes a hierarchical JSONL split once, offline, and stores it as flat
+numpy arrays. ShardedHierarchicalDataset reads them with mmap, so startup
+does not depend on corpus size and DataLoader workers share the same pages.
+
+Shard layout (one directory per split):
+    meta.json                   Tokenizer info, counts, sonnet ids
+    line_tokens.npy             Wordpiece ids of every line, no special tokens
+    line_token_offsets.npy      [num_lines + 1] token offset of each line
+    sonnet_line_offsets.npy     [num_sonnets + 1] line offset of each sonnet
+    quatrain_lines.npy          Sonnet-local line indices of every quatrain group
+    quatrain_offsets.npy        [num_sonnets * 4 + 1] offset of each sonnet's
+                                quatrain_1, quatrain_2, quatrain_3 and couplet
+    adjacent_pairs.npy          [num_adjacent_pairs, 2] sonnet-local line indices
+    adjacent_pairs_offsets.npy  [num_sonnets + 1] pair offset of each sonnet
+    rhyme_pairs.npy             [num_rhyme_pairs, 2] sonnet-local line indices
+    rhyme_pairs_offsets.npy     [num_sonnets + 1] pair offset of each sonnet
+"""
+
+import json
+import numpy as np
+import torch
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+from transformers import BertTokenizer
+
+from .dataset import HierarchicalPoetryDataset, tokenize_lines
+
+SHARD_FORMAT_VERSION = 2
+
+# Quatrain groups, in the order HierarchicalPoetryDataset uses them
+QUATRAIN_KEYS = ('quatrain_1', 'quatrain_2', 'quatrain_3', 'couplet')
+
+ARRAY_NAMES = (
+    'line_tokens',
+    'line_token_offsets',
+    'sonnet_line_offsets',
+    'quatrain_lines',
+    'quatrain_offsets',
+    'adjacent_pairs',
+    'adjacent_pairs_offsets',
+    'rhyme_pairs',
+    'rhyme_pairs_offsets',
+)
+
+
+def write_hierarchical_shards(
+    sonnets: Iterable[Dict],
+    tokenizer: BertTokenizer,
+    output_dir: str
+) -> Dict:
+    """
+    Tokenize hierarchical sonnets and write them as a shard directory.
+
+    Args:
+        sonnets: Hierarchical sonnet dicts (as written by prepare_training.py)
+        tokenizer: BERT tokenizer used for training
+        output_dir: Directory to write the shard arrays to
+
+    Returns:
+        Shard metadata (also written to meta.json)
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    token_dtype = np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max + 1 else np.int32
+
+    line_tokens = []
+    line_lengths = []
+    sonnet_line_counts = []
+    quatrain_lines = []
+    quatrain_sizes = []
+    adjacent_pairs = []
+    rhyme_pairs = []
+    sonnet_ids = []
+
+    for idx, sonnet in enumerate(sonnets):
+        lines = sonnet['lines']
+
+        # Line tokens are stored without special tokens; the dataset adds
+        # [CLS]/[SEP] and truncates when it assembles each item
+        for ids in tokenize_lines(tokenizer, lines):
+            line_tokens.append(np.asarray(ids, dtype=token_dtype))
+            line_lengths.append(len(ids))
+
+        # Quatrain groups are stored as given (the dataset filters indices
+        # past the end of the sonnet when it samples pairs)
+        for key in QUATRAIN_KEYS:
+            members = sonnet.get(key, [])
+            quatrain_lines.append(np.asarray(members, dtype=np.int16))
+            quatrain_sizes.append(len(members))
+
+        sonnet_line_counts.append(len(lines))
+        adjacent_pairs.append(_pair_array(sonnet.get('adjacent_pairs', [])))
+        rhyme_pairs.append(_pair_array(sonnet.get('rhyme_pairs', [])))
+        # Same fallback as HierarchicalPoetryDataset: the sonnet's position
+        sonnet_ids.append(sonnet.get('sonnet_id', idx))
+
+    arrays = {
+        'line_tokens': (
+            np.concatenate(line_tokens) if line_tokens else np.zeros(0, dtype=token_dtype)
+        ),
+        'line_token_offsets': _offsets(line_lengths),
+        'sonnet_line_offsets': _offsets(sonnet_line_counts),
+        'quatrain_lines': (
+            np.concatenate(quatrain_lines) if quatrain_lines else np.zeros(0, dtype=np.int16)
+        ),
+        'quatrain_offsets': _offsets(quatrain_sizes),
+    }
+    for name, pairs in (('adjacent_pairs', adjacent_pairs), ('rhyme_pairs', rhyme_pairs)):
+        arrays[name] = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int16)
+        arrays[f'{name}_offsets'] = _offsets([len(p) for p in pairs])
+
+    for name, array in arrays.items():
+        np.save(output_path / f'{name}.npy', array)
+
+    meta = {
+        'format_version': SHARD_FORMAT_VERSION,
+        'tokenizer': tokenizer.name_or_path,
+        'vocab_size': len(tokenizer),
+        'num_sonnets': len(sonnet_ids),
+        'num_lines': int(arrays['sonnet_line_offsets'][-1]),
+        'num_tokens': int(arrays['line_token_offsets'][-1]),
+        'sonnet_ids': sonnet_ids,
+    }
+    with open(output_path / 'meta.json', 'w') as f:
+        json.dump(meta, f)
+
+    print(f"Wrote {meta['num_sonnets']} sonnets ({meta['num_lines']} lines, "
+          f"{meta['num_tokens']} tokens) to {output_dir}")
+
+    return meta
+
+
+def _pair_array(pairs: List) -> np.ndarray:
+    """Convert a list of (i, j) line index pairs to an int16 [num_pairs, 2] array."""
+    return np.asarray(pairs, dtype=np.int16).reshape(-1, 2)
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    """Cumulative offsets [0, l0, l0+l1, ...] for a ragged array."""
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class ShardedHierarchicalDataset(HierarchicalPoetryDataset):
+    """
+    HierarchicalPoetryDataset backed by pre-tokenized, memory-mapped shards.
+
+    Items match HierarchicalPoetryDataset (same sonnet tokenization, MLM
+    masking and pair sampling), but nothing is tokenized at access time and
+    only meta.json is read at startup.
+    """
+
+    def __init__(
+        self,
+        data_path: str,
+        tokenizer: BertTokenizer,
+        max_length: int = 128,
+        mlm_probability: float = 0.15,
+        line_negative_samples: int = 2,
+        quatrain_negative_samples: int = 1,
+    ):
+        """
+        Args:
+            data_path: Shard directory written by write_hierarchical_shards()
+            tokenizer: BERT tokenizer the shards were built with
+            max_length: Max sequence length for the full sonnet
+            mlm_probability: Probability of masking tokens for MLM
+            line_negative_samples: Number of negative line pairs per positive
+            quatrain_negative_samples: Number of negative quatrain pairs per positive
+        """
+        super().__init__(
+            data_path,
+            tokenizer,
+            max_length=max_length,
+            mlm_probability=mlm_probability,
+            line_negative_samples=line_negative_samples,
+            quatrain_negative_samples=quatrain_negative_samples,
+        )
+
+    def _load(self, data_path: str) -> None:
+        """Read shard metadata; arrays are memory-mapped on first access."""
+        self.shard_dir = Path(data_path)
+        with open(self.shard_dir / 'meta.json', 'r') as f:
+            self.meta = json.load(f)
+
+        if self.meta['vocab_size'] != len(self.tokenizer):
+            raise ValueError(
+                f"Shards in {data_path} were built with a {self.meta['vocab_size']}-token "
+                f"vocabulary ({self.meta['tokenizer']}), tokenizer has {len(self.tokenizer)}"
+            )
+
+        if self.meta.get('format_version') != SHARD_FORMAT_VERSION:
+            raise ValueError(
+                f"Shards in {data_path} have format version {self.meta.get('format_version')}, "
+                f"expected {SHARD_FORMAT_VERSION}; rebuild them with prepare_training.py --tokenizer"
+            )
+
+        self._arrays = None
+
+        print(f"Loaded {self.meta['num_sonnets']} sonnets from {data_path}")
+
+    def __len__(self):
+        return self.meta['num_sonnets']
+
+    def __getstate__(self) -> Dict:
+        # Pickling a memmap copies its data; let each worker map the files itself
+        state = super().__getstate__()
+        state['_arrays'] = None
+        return state
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Shard arrays, memory-mapped read-only."""
+        if self._arrays is None:
+            self._arrays = {
+                name: np.load(self.shard_dir / f'{name}.npy', mmap_mode='r')
+                for name in ARRAY_NAMES
+            }
+        return self._arrays
+
+    @property
+    def lengths(self) -> List[int]:
+        """Token length of each sonnet sequence, computed from the offsets."""
+        arrays = self.arrays
+        sonnet_lines = arrays['sonnet_line_offsets']
+        num_lines = np.diff(sonnet_lines)
+        num_tokens = np.diff(arrays['line_token_offsets'][sonnet_lines])
+        return np.minimum(num_tokens + np.maximum(num_lines, 1) + 1, self.max_length).tolist()
+
+    def _get_sonnet(self, idx: int) -> Dict:
+        """Rebuild the annotation dict for one sonnet from the shard arrays."""
+        arrays = self.arrays
+
+        line_start, line_end = arrays['sonnet_line_offsets'][idx:idx + 2]
+        token_offsets = arrays['line_token_offsets'][line_start:line_end + 1]
+        tokens = arrays['line_tokens'][token_offsets[0]:token_offsets[-1]]
+        line_token_ids = np.split(tokens, token_offsets[1:-1] - token_offsets[0])
+
+        sonnet = {
+            'sonnet_id': self.meta['sonnet_ids'][idx],
+            'num_lines': int(line_end - line_start),
+            'line_token_ids': line_token_ids,
+        }
+        for name in ('adjacent_pairs', 'rhyme_pairs'):
+            pair_start, pair_end = arrays[f'{name}_offsets'][idx:idx + 2]
+            sonnet[name] = arrays[name][pair_start:pair_end].tolist()
+        num_groups = len(QUATRAIN_KEYS)
+        group_offsets = arrays['quatrain_offsets'][idx * num_groups:(idx + 1) * num_groups + 1]
+        for q_idx, key in enumerate(QUATRAIN_KEYS):
+            group_start, group_end = group_offsets[q_idx:q_idx + 2]
+            sonnet[key] = arrays['quatrain_lines'][group_start:group_end].tolist()
+
+        return sonnet
+
+    def _tokenize(
+        self,
+        sonnet: Dict
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Assemble model inputs from stored line tokens."""
+        return self._assemble([ids.tolist() for ids in sonnet['line_token_ids']])
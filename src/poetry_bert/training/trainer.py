@@ -8,11 +8,18 @@ Extends Trainer to:
 4. Save best model based on validation loss
 """
 
+import os
 import torch
 import torch.nn as nn
 from transformers import Trainer, BertModel, BertForMaskedLM
 from typing import Dict, Optional, Tuple
-from .hierarchical_losses import HierarchicalLoss
+from ..models.losses import HierarchicalLoss
+from .dataset import LengthBucketSampler
+
+# Checkpoints from before the shared-encoder refactor registered the encoder
+# twice, under 'bert.' and 'bert_mlm.bert.'
+LEGACY_ENCODER_PREFIX = 'bert.'
+ENCODER_PREFIX = 'bert_mlm.bert.'
 
 
 class HierarchicalBertModel(nn.Module):
@@ -26,16 +33,34 @@ class HierarchicalBertModel(nn.Module):
     - Sonnet embeddings (mean pooling of all lines)
     """
 
-    def __init__(self, base_model_path: str):
+    def __init__(
+        self,
+        base_model_path: str,
+        batch_line_encoding: bool = True,
+        shared_encoder: bool = True
+    ):
         """
         Args:
             base_model_path: Path to base BERT model (e.g., EEBO-BERT)
+            batch_line_encoding: Encode every unique line referenced by the
+                batch's line/quatrain pairs in a single padded forward pass
+                (default: True). If False, each anchor/positive/negative is
+                encoded separately.
+            shared_encoder: Run the encoder once per batch and feed its
+                last_hidden_state to both the MLM head and the pooled
+                projections (default: True). If False, the MLM model and the
+                encoder are run as two separate forward passes.
         """
         super().__init__()
 
-        # Load BERT with MLM head
+        self.batch_line_encoding = batch_line_encoding
+        self.shared_encoder = shared_encoder
+
+        # Load BERT with MLM head (the encoder is exposed as self.bert)
         self.bert_mlm = BertForMaskedLM.from_pretrained(base_model_path)
-        self.bert = self.bert_mlm.bert
+
+        # Accept checkpoints saved with the encoder registered twice
+        self._register_load_state_dict_pre_hook(self._upgrade_legacy_state_dict)
 
         # Projection heads for contrastive learning (optional)
         hidden_size = self.bert.config.hidden_size
@@ -47,10 +72,12 @@ class HierarchicalBertModel(nn.Module):
         self,
         input_ids: torch.Tensor,
         attention_mask: torch.Tensor,
-        line_pairs_positive: list = None,
-        line_pairs_negative: list = None,
-        quatrain_pairs_positive: list = None,
-        quatrain_pairs_negative: list = None,
+        line_input_ids: torch.Tensor = None,
+        line_attention_mask: torch.Tensor = None,
+        line_pairs_positive: torch.Tensor = None,
+        line_pairs_negative: torch.Tensor = None,
+        quatrain_pairs_positive: torch.Tensor = None,
+        quatrain_pairs_negative: torch.Tensor = None,
         **kwargs
     ) -> Dict[str, torch.Tensor]:
         """
@@ -59,10 +86,12 @@ class HierarchicalBertModel(nn.Module):
         Args:
             input_ids: (batch_size, seq_len)
             attention_mask: (batch_size, seq_len)
-            line_pairs_positive: List of positive line pairs
-            line_pairs_negative: List of negative line pairs
-            quatrain_pairs_positive: List of positive quatrain pairs
-            quatrain_pairs_negative: List of negative quatrain pairs
+            line_input_ids: (total_lines, line_len) lines of every sonnet in the batch
+            line_attention_mask: (total_lines, line_len)
+            line_pairs_positive: (num_pairs, 2) indices of positive line pairs
+            line_pairs_negative: (num_pairs, 2) indices of negative line pairs
+            quatrain_pairs_positive: (num_pairs, 2) indices of positive quatrain pairs
+            quatrain_pairs_negative: (num_pairs, 2) indices of negative quatrain pairs
 
         Returns:
             Dictionary with:
@@ -71,35 +100,59 @@ class HierarchicalBertModel(nn.Module):
             - quatrain_embeddings: Dict with positive/negative pairs
             - sonnet_embeddings: (batch_size, hidden_size)
         """
-        # Get MLM logits
-        mlm_outputs = self.bert_mlm(
-            input_ids=input_ids,
-            attention_mask=attention_mask
-        )
-        mlm_logits = mlm_outputs.logits
-
-        # Get base BERT outputs for contrastive learning
-        bert_outputs = self.bert(
-            input_ids=input_ids,
-            attention_mask=attention_mask
-        )
-        sequence_output = bert_outputs.last_hidden_state  # (batch_size, seq_len, hidden_size)
+        if self.shared_encoder:
+            # One encoder pass; MLM head reads the same hidden states
+            bert_outputs = self.bert(
+                input_ids=input_ids,
+                attention_mask=attention_mask
+            )
+            sequence_output = bert_outputs.last_hidden_state  # (batch_size, seq_len, hidden_size)
+            mlm_logits = self.bert_mlm.cls(sequence_output)
+        else:
+            # Get MLM logits
+            mlm_outputs = self.bert_mlm(
+                input_ids=input_ids,
+                attention_mask=attention_mask
+            )
+            mlm_logits = mlm_outputs.logits
+
+            # Get base BERT outputs for contrastive learning
+            bert_outputs = self.bert(
+                input_ids=input_ids,
+                attention_mask=attention_mask
+            )
+            sequence_output = bert_outputs.last_hidden_state  # (batch_size, seq_len, hidden_size)
 
         # Sonnet-level embedding: mean pool over sequence
         sonnet_embeddings = self._mean_pool(sequence_output, attention_mask)
         sonnet_embeddings = self.sonnet_proj(sonnet_embeddings)
 
-        # Process line pairs for contrastive learning
-        line_embeddings = self._process_line_pairs(
-            line_pairs_positive,
-            line_pairs_negative
-        )
-
-        # Process quatrain pairs
-        quatrain_embeddings = self._process_quatrain_pairs(
-            quatrain_pairs_positive,
-            quatrain_pairs_negative
-        )
+        if self.batch_line_encoding:
+            # Encode all referenced lines once, then gather pairs by index
+            line_embeddings, quatrain_embeddings = self._process_pairs_batched(
+                line_input_ids,
+                line_attention_mask,
+                line_pairs_positive,
+                line_pairs_negative,
+                quatrain_pairs_positive,
+                quatrain_pairs_negative
+            )
+        else:
+            # Process line pairs for contrastive learning
+            line_embeddings = self._process_line_pairs(
+                line_input_ids,
+                line_attention_mask,
+                line_pairs_positive,
+                line_pairs_negative
+            )
+
+            # Process quatrain pairs
+            quatrain_embeddings = self._process_quatrain_pairs(
+                line_input_ids,
+                line_attention_mask,
+                quatrain_pairs_positive,
+                quatrain_pairs_negative
+            )
 
         return {
             'mlm_logits': mlm_logits,
@@ -108,6 +161,72 @@ class HierarchicalBertModel(nn.Module):
             'sonnet_embeddings': sonnet_embeddings
         }
 
+    @property
+    def bert(self) -> BertModel:
+        """Encoder shared by the MLM head and the projection heads."""
+        return self.bert_mlm.bert
+
+    @classmethod
+    def from_checkpoint(
+        cls,
+        checkpoint_path: str,
+        base_model_path: Optional[str] = None,
+        **kwargs
+    ) -> 'HierarchicalBertModel':
+        """
+        Load a model saved by HierarchicalTrainer.
+
+        Works for both current checkpoints and legacy ones that stored the
+        encoder under both 'bert.' and 'bert_mlm.bert.'.
+
+        Args:
+            checkpoint_path: Directory containing model.safetensors or
+                pytorch_model.bin
+            base_model_path: BERT model providing the config (default: the
+                checkpoint directory, if it has a config.json)
+            **kwargs: Passed to __init__ (e.g. shared_encoder)
+
+        Returns:
+            HierarchicalBertModel with checkpoint weights loaded
+        """
+        model = cls(base_model_path or checkpoint_path, **kwargs)
+
+        safetensors_file = os.path.join(checkpoint_path, 'model.safetensors')
+        if os.path.exists(safetensors_file):
+            from safetensors.torch import load_file
+            state_dict = load_file(safetensors_file)
+        else:
+            state_dict = torch.load(
+                os.path.join(checkpoint_path, 'pytorch_model.bin'),
+                map_location='cpu'
+            )
+
+        result = model.load_state_dict(state_dict, strict=False)
+
+        # The MLM decoder is tied to the word embeddings and may be omitted
+        missing = [k for k in result.missing_keys if not k.endswith('decoder.weight')]
+        if missing or result.unexpected_keys:
+            raise ValueError(
+                f"Checkpoint {checkpoint_path} does not match HierarchicalBertModel: "
+                f"missing {missing}, unexpected {result.unexpected_keys}"
+            )
+
+        return model
+
+    @staticmethod
+    def _upgrade_legacy_state_dict(state_dict, prefix, *args):
+        """
+        Map legacy 'bert.*' keys onto 'bert_mlm.bert.*' in place.
+
+        Both copies were the same tensors, so the legacy key is only used
+        when the current key is missing.
+        """
+        legacy_prefix = prefix + LEGACY_ENCODER_PREFIX
+        for key in [k for k in state_dict if k.startswith(legacy_prefix)]:
+            value = state_dict.pop(key)
+            new_key = prefix + ENCODER_PREFIX + key[len(legacy_prefix):]
+            state_dict.setdefault(new_key, value)
+
     def _mean_pool(
         self,
         token_embeddings: torch.Tensor,
@@ -135,118 +254,218 @@ class HierarchicalBertModel(nn.Module):
         # Mean
         return sum_embeddings / sum_mask
 
-    def _process_line_pairs(
+    def _process_pairs_batched(
         self,
-        positive_pairs: list,
-        negative_pairs: list
-    ) -> Dict:
+        line_input_ids: torch.Tensor,
+        line_attention_mask: torch.Tensor,
+        line_pairs_positive: torch.Tensor,
+        line_pairs_negative: torch.Tensor,
+        quatrain_pairs_positive: torch.Tensor,
+        quatrain_pairs_negative: torch.Tensor
+    ) -> Tuple[Dict, Dict]:
         """
-        Process line pairs to extract embeddings.
+        Process line and quatrain pairs with one BERT forward pass.
+
+        Every line referenced by any pair in the batch is deduplicated by its
+        token ids, the unique lines are encoded together, and pair embeddings
+        are gathered from the result by index.
 
         Args:
-            positive_pairs: List of dicts with 'anchor' and 'positive' encodings
-            negative_pairs: List of dicts with 'anchor' and 'negative' encodings
+            line_input_ids: (total_lines, line_len)
+            line_attention_mask: (total_lines, line_len)
+            line_pairs_positive: (num_pairs, 2) positive line pair indices
+            line_pairs_negative: (num_pairs, 2) negative line pair indices
+            quatrain_pairs_positive: (num_pairs, 2) positive quatrain pair indices
+            quatrain_pairs_negative: (num_pairs, 2) negative quatrain pair indices
 
         Returns:
-            Dict with 'positive_pairs' and 'negative_pairs' as lists of tensors
+            (line_embeddings, quatrain_embeddings), each a dict with
+            'positive_pairs' and 'negative_pairs' as (first, second) tuples
+            of (num_pairs, hidden_size) tensors, plus 'lines', the projected
+            embeddings of every encoded line, and 'positive_index', the
+            (num_pairs, 2) rows of the positive pairs in 'lines'
         """
-        if not positive_pairs or len(positive_pairs) == 0:
-            return {'positive_pairs': [], 'negative_pairs': []}
+        empty = {'positive_pairs': [], 'negative_pairs': []}
+
+        # Levels without positive pairs produce no embeddings (as in the
+        # per-pair path), so their lines don't need encoding either
+        levels = [
+            (positive, negative) if _num_pairs(positive) > 0 else None
+            for positive, negative in (
+                (line_pairs_positive, line_pairs_negative),
+                (quatrain_pairs_positive, quatrain_pairs_negative)
+            )
+        ]
+        pair_tensors = [
+            pairs for level in levels if level is not None
+            for pairs in level if pairs is not None
+        ]
+        if not pair_tensors:
+            return dict(empty), dict(empty)
+
+        # Lines referenced by any pair, then deduplicated by content
+        referenced, pair_rows = torch.unique(
+            torch.cat(pair_tensors).view(-1), return_inverse=True
+        )
+        referenced = referenced.to(line_input_ids.device)
+        unique_lines, line_rows = torch.unique(
+            torch.cat([line_input_ids[referenced], line_attention_mask[referenced]], dim=1),
+            dim=0,
+            return_inverse=True
+        )
+        unique_input_ids, unique_attention_mask = unique_lines.split(
+            line_input_ids.size(1), dim=1
+        )
 
-        pos_pair_embeddings = []
-        for batch_pairs in positive_pairs:
-            for pair in batch_pairs:
-                # Get embeddings for anchor and positive
-                anchor_emb = self._encode_line(
-                    pair['anchor']['input_ids'],
-                    pair['anchor']['attention_mask']
-                )
-                positive_emb = self._encode_line(
-                    pair['positive']['input_ids'],
-                    pair['positive']['attention_mask']
-                )
+        line_outputs = self._encode_lines(unique_input_ids, unique_attention_mask)
+
+        # Row of each pair member in line_outputs
+        pair_rows = line_rows.to(line_outputs.device)[pair_rows.to(line_outputs.device)]
+        pair_rows = pair_rows.view(-1, 2).split([len(p) for p in pair_tensors])
+
+        results = []
+        rows = iter(pair_rows)
+        for level, proj in zip(levels, (self.line_proj, self.quatrain_proj)):
+            if level is None:
+                results.append(dict(empty))
+                continue
+            positive, negative = level
+
+            # Project every encoded line once; pairs are rows of this matrix
+            lines = proj(line_outputs)
+            positive_index = next(rows)
+            results.append({
+                'positive_pairs': self._gather_pairs(lines, positive_index),
+                'negative_pairs': (
+                    self._gather_pairs(lines, next(rows))
+                    if negative is not None else []
+                ),
+                # For in-batch negatives (HierarchicalLoss negative_mode='in_batch')
+                'lines': lines,
+                'positive_index': positive_index
+            })
+
+        return results[0], results[1]
+
+    def _gather_pairs(
+        self,
+        lines: torch.Tensor,
+        index: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Gather pair embeddings from projected line embeddings.
 
-                # Project
-                anchor_emb = self.line_proj(anchor_emb)
-                positive_emb = self.line_proj(positive_emb)
-
-                pos_pair_embeddings.append((anchor_emb, positive_emb))
-
-        neg_pair_embeddings = []
-        for batch_pairs in negative_pairs:
-            for pair in batch_pairs:
-                anchor_emb = self._encode_line(
-                    pair['anchor']['input_ids'],
-                    pair['anchor']['attention_mask']
-                )
-                negative_emb = self._encode_line(
-                    pair['negative']['input_ids'],
-                    pair['negative']['attention_mask']
-                )
+        Args:
+            lines: (num_lines, hidden_size) projected line embeddings
+            index: (num_pairs, 2) row indices into lines
 
-                # Project
-                anchor_emb = self.line_proj(anchor_emb)
-                negative_emb = self.line_proj(negative_emb)
+        Returns:
+            (first_emb, second_emb), each (num_pairs, hidden_size)
+        """
+        return lines[index[:, 0]], lines[index[:, 1]]
+
+    def _process_line_pairs(
+        self,
+        line_input_ids: torch.Tensor,
+        line_attention_mask: torch.Tensor,
+        positive_pairs: torch.Tensor,
+        negative_pairs: torch.Tensor
+    ) -> Dict:
+        """
+        Process line pairs to extract embeddings, encoding each line separately.
 
-                neg_pair_embeddings.append((anchor_emb, negative_emb))
+        Args:
+            line_input_ids: (total_lines, line_len)
+            line_attention_mask: (total_lines, line_len)
+            positive_pairs: (num_pairs, 2) anchor/positive line indices
+            negative_pairs: (num_pairs, 2) anchor/negative line indices
 
-        return {
-            'positive_pairs': pos_pair_embeddings,
-            'negative_pairs': neg_pair_embeddings
-        }
+        Returns:
+            Dict with 'positive_pairs' and 'negative_pairs' as lists of tensors
+        """
+        return self._process_pairs(
+            line_input_ids, line_attention_mask,
+            positive_pairs, negative_pairs, self.line_proj
+        )
 
     def _process_quatrain_pairs(
         self,
-        positive_pairs: list,
-        negative_pairs: list
+        line_input_ids: torch.Tensor,
+        line_attention_mask: torch.Tensor,
+        positive_pairs: torch.Tensor,
+        negative_pairs: torch.Tensor
     ) -> Dict:
         """
         Process quatrain pairs to extract embeddings.
         """
-        if not positive_pairs or len(positive_pairs) == 0:
-            return {'positive_pairs': [], 'negative_pairs': []}
+        return self._process_pairs(
+            line_input_ids, line_attention_mask,
+            positive_pairs, negative_pairs, self.quatrain_proj
+        )
 
-        pos_pair_embeddings = []
-        for batch_pairs in positive_pairs:
-            for pair in batch_pairs:
-                anchor_emb = self._encode_line(
-                    pair['anchor']['input_ids'],
-                    pair['anchor']['attention_mask']
-                )
-                positive_emb = self._encode_line(
-                    pair['positive']['input_ids'],
-                    pair['positive']['attention_mask']
-                )
+    def _process_pairs(
+        self,
+        line_input_ids: torch.Tensor,
+        line_attention_mask: torch.Tensor,
+        positive_pairs: torch.Tensor,
+        negative_pairs: torch.Tensor,
+        proj: nn.Module
+    ) -> Dict:
+        """
+        Encode and project each pair member with its own forward pass.
+        """
+        if _num_pairs(positive_pairs) == 0:
+            return {'positive_pairs': [], 'negative_pairs': []}
 
-                # Project
-                anchor_emb = self.quatrain_proj(anchor_emb)
-                positive_emb = self.quatrain_proj(positive_emb)
-
-                pos_pair_embeddings.append((anchor_emb, positive_emb))
-
-        neg_pair_embeddings = []
-        for batch_pairs in negative_pairs:
-            for pair in batch_pairs:
-                anchor_emb = self._encode_line(
-                    pair['anchor']['input_ids'],
-                    pair['anchor']['attention_mask']
-                )
-                negative_emb = self._encode_line(
-                    pair['negative']['input_ids'],
-                    pair['negative']['attention_mask']
-                )
+        def encode_pairs(pairs: torch.Tensor) -> list:
+            pair_embeddings = []
+            for i, j in (pairs.tolist() if pairs is not None else []):
+                first_emb = self._encode_line(line_input_ids[i], line_attention_mask[i])
+                second_emb = self._encode_line(line_input_ids[j], line_attention_mask[j])
 
                 # Project
-                anchor_emb = self.quatrain_proj(anchor_emb)
-                negative_emb = self.quatrain_proj(negative_emb)
-
-                neg_pair_embeddings.append((anchor_emb, negative_emb))
+                pair_embeddings.append((proj(first_emb), proj(second_emb)))
+            return pair_embeddings
 
         return {
-            'positive_pairs': pos_pair_embeddings,
-            'negative_pairs': neg_pair_embeddings
+            'positive_pairs': encode_pairs(positive_pairs),
+            'negative_pairs': encode_pairs(negative_pairs)
         }
 
+    def _encode_lines(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        """
+        Encode a batch of lines in one forward pass.
+
+        Padding columns that no line uses are trimmed before encoding.
+
+        Args:
+            input_ids: (num_lines, seq_len)
+            attention_mask: (num_lines, seq_len)
+
+        Returns:
+            embeddings: (num_lines, hidden_size)
+        """
+        # Ensure on same device as model
+        device = next(self.parameters()).device
+        input_ids = input_ids.to(device)
+        attention_mask = attention_mask.to(device)
+
+        # Trim to the longest line in the batch
+        max_len = max(int(attention_mask.sum(dim=1).max().item()), 1)
+        input_ids = input_ids[:, :max_len]
+        attention_mask = attention_mask[:, :max_len]
+
+        outputs = self.bert(
+            input_ids=input_ids,
+            attention_mask=attention_mask
+        )
+
+        return self._mean_pool(outputs.last_hidden_state, attention_mask)
+
     def _encode_line(
         self,
         input_ids: torch.Tensor,
@@ -284,6 +503,11 @@ class HierarchicalBertModel(nn.Module):
         return embedding.squeeze(0)  # Remove batch dimension
 
 
+def _num_pairs(pairs: Optional[torch.Tensor]) -> int:
+    """Number of pairs in a (num_pairs, 2) index tensor, or 0 if absent."""
+    return 0 if pairs is None else len(pairs)
+
+
 class HierarchicalTrainer(Trainer):
     """
     Custom Trainer for hierarchical multi-objective BERT training.
@@ -308,6 +532,22 @@ class HierarchicalTrainer(Trainer):
             'sonnet': []
         }
 
+    def _get_train_sampler(self, *args, **kwargs):
+        """
+        Use LengthBucketSampler when args.group_by_length is set.
+
+        The dataset's precomputed lengths are used instead of Trainer's
+        default, which would load every item to measure it.
+        """
+        train_dataset = args[0] if args else kwargs.get('train_dataset', self.train_dataset)
+        if self.args.group_by_length and hasattr(train_dataset, 'lengths'):
+            return LengthBucketSampler(
+                train_dataset.lengths,
+                batch_size=self._train_batch_size,
+                seed=self.args.seed
+            )
+        return super()._get_train_sampler(*args, **kwargs)
+
     def compute_loss(
         self,
         model: HierarchicalBertModel,
@@ -331,6 +571,8 @@ class HierarchicalTrainer(Trainer):
         outputs = model(
             input_ids=inputs['input_ids'],
             attention_mask=inputs['attention_mask'],
+            line_input_ids=inputs.get('line_input_ids'),
+            line_attention_mask=inputs.get('line_attention_mask'),
             line_pairs_positive=inputs.get('line_pairs_positive'),
             line_pairs_negative=inputs.get('line_pairs_negative'),
             quatrain_pairs_positive=inputs.get('quatrain_pairs_positive'),
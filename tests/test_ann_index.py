@@ -0,0 +1,39 @@
+"""
+Round-trip and exact-parity test for the IVF index.
+"""
+
+import numpy as np
+
+from poetry_bert.ann_index import IVFIndex, exact_search, normalize
+
+
+def test_ivf_index_save_load_and_exact_parity(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(10, 16))
+    vectors = (centers[rng.integers(0, 10, 600)] + 0.3 * rng.normal(size=(600, 16))).astype(np.float32)
+    ids = np.arange(600) * 10 + 7
+    queries = rng.normal(size=(25, 16)).astype(np.float32)
+
+    index = IVFIndex.build(vectors, ids=ids, nlist=8, seed=0)
+    index.save(str(tmp_path / 'index'))
+    loaded = IVFIndex.load(str(tmp_path / 'index'))
+
+    assert loaded.nlist == 8 and len(loaded) == 600
+    np.testing.assert_array_equal(loaded.centroids, index.centroids)
+    np.testing.assert_array_equal(loaded.vectors, index.vectors)
+    np.testing.assert_array_equal(loaded.ids, index.ids)
+    np.testing.assert_array_equal(loaded.list_offsets, index.list_offsets)
+    assert sorted(loaded.ids.tolist()) == ids.tolist()
+
+    # The loaded (memory-mapped) index answers exactly like the built one
+    for nprobe in (1, 3):
+        scores, found = index.search(queries, k=5, nprobe=nprobe)
+        loaded_scores, loaded_found = loaded.search(queries, k=5, nprobe=nprobe)
+        np.testing.assert_array_equal(loaded_found, found)
+        np.testing.assert_allclose(loaded_scores, scores)
+
+    # Probing every list is brute-force search over the original vectors
+    expected_scores, expected_rows = exact_search(normalize(vectors), normalize(queries), k=5)
+    scores, found = loaded.search(queries, k=5, nprobe=loaded.nlist)
+    np.testing.assert_array_equal(found, ids[expected_rows])
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-6)
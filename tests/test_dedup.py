@@ -0,0 +1,78 @@
+"""
+Tests for MinHash/LSH near-duplicate detection.
+"""
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from poetry_bert.corpus.dedup import MinHasher, candidate_pairs, compute_signatures, find_duplicate_groups
+
+SONNET = """Shall I compare thee to a summer's day?
+Thou art more lovely and more temperate:
+Rough winds do shake the darling buds of May,
+And summer's lease hath all too short a date;"""
+
+OTHER = """Because I could not stop for Death,
+He kindly stopped for me;
+The carriage held but just ourselves
+And Immortality."""
+
+
+def test_compute_signatures_with_workers_matches_in_process():
+    hasher = MinHasher(num_perm=64)
+    texts = [SONNET, OTHER, '', SONNET.upper(), 'one two'] * 5
+
+    in_process = compute_signatures(texts, hasher)
+    pooled = compute_signatures(iter(texts), hasher, num_workers=2, chunksize=3)
+
+    assert in_process.shape == (len(texts), 64)
+    np.testing.assert_array_equal(pooled, in_process)
+
+
+def test_variants_and_relineated_reprints_are_grouped():
+    variants = [
+        SONNET,
+        SONNET.upper(),
+        SONNET.replace(' ', '   ').replace('\n', '\n\n'),
+        SONNET.replace(',', '').replace(';', '.').replace(':', ' --'),
+        # Relineated: same words, broken at different points
+        ' '.join(SONNET.split())[:60] + '\n' + ' '.join(SONNET.split())[60:],
+    ]
+    signatures = compute_signatures(variants + [OTHER], MinHasher())
+
+    groups, similarities = find_duplicate_groups(signatures, threshold=0.8)
+
+    assert groups == [[0, 1, 2, 3, 4]]
+    assert all(similarity >= 0.8 for similarity in similarities.values())
+
+
+def test_empty_poems_are_never_grouped():
+    texts = ['', '   \n\n', '?!', SONNET, SONNET.lower(), '']
+    signatures = compute_signatures(texts, MinHasher())
+
+    groups, _ = find_duplicate_groups(signatures, threshold=0.5)
+
+    assert groups == [[3, 4]]
+
+
+@pytest.mark.parametrize('max_bucket_size', [1000, 3])
+def test_candidate_pairs_match_brute_force_bands(max_bucket_size):
+    # Few distinct values, so bands collide often
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 3, size=(30, 8)).astype(np.uint32)
+    bands, rows = 4, 2
+
+    expected = set()
+    for band in range(bands):
+        keys = [tuple(signature[band * rows:(band + 1) * rows]) for signature in signatures.tolist()]
+        sizes = Counter(keys)
+        for i in range(len(keys)):
+            for j in range(i + 1, len(keys)):
+                if keys[i] == keys[j] and sizes[keys[i]] <= max_bucket_size:
+                    expected.add((i, j))
+
+    pairs = candidate_pairs(signatures, bands=bands, max_bucket_size=max_bucket_size)
+
+    assert [tuple(pair) for pair in pairs.tolist()] == sorted(expected)
@@ -0,0 +1,44 @@
+"""
+Round-trip test for the memory-mapped embedding store.
+"""
+
+import numpy as np
+import pytest
+
+from poetry_bert.embedding_store import EmbeddingStore
+
+
+def test_embedding_store_append_reopen_and_supersede(tmp_path):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / 'store')
+    first = {poem_id: rng.random((n, 8)).astype(np.float32) for poem_id, n in [(1, 3), (2, 1), (3, 4)]}
+    second = {3: rng.random((2, 8)).astype(np.float32), 'extra': rng.random((5, 8)).astype(np.float32)}
+
+    store = EmbeddingStore(path, dim=8, dtype='float16')
+    store.append_poems(first)
+    # Poem 3 again: its newest rows replace the old ones
+    store.append_poems(second)
+
+    reopened = EmbeddingStore(path)
+    assert reopened.dim == 8 and reopened.dtype == np.float16
+    assert len(reopened) == 4
+    assert reopened.poem_ids == [1, 2, 3, 'extra']
+    assert 3 in reopened and 4 not in reopened
+    assert reopened.num_vectors == 3 + 1 + 4 + 2 + 5
+
+    expected = {**first, **second}
+    for poem_id, embeddings in expected.items():
+        stored = reopened.get(poem_id)
+        assert isinstance(stored, np.memmap)
+        np.testing.assert_array_equal(stored, embeddings.astype(np.float16))
+
+    # Segments leave superseded rows out
+    segments = list(reopened.iter_segments())
+    assert [poem_ids for poem_ids, _, _ in segments] == [[1, 2], [3, 'extra']]
+    assert segments[0][2].tolist() == [[0, 3], [3, 4]]
+    assert segments[1][2].tolist() == [[0, 2], [2, 7]]
+
+    with pytest.raises(ValueError):
+        EmbeddingStore(path, dim=16)
+    with pytest.raises(ValueError):
+        reopened.append([5], np.zeros((2, 8)), [0, 3])
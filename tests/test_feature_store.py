@@ -0,0 +1,56 @@
+"""
+Round-trip test for the columnar feature store.
+"""
+
+import numpy as np
+
+from poetry_bert.features.store import FeatureStore, FeatureStoreWriter
+
+
+def test_feature_store_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    poems = []
+    for n in range(7):
+        num_lines = int(rng.integers(1, 6))
+        poems.append((f'poem-{n}', {
+            'features': rng.random((num_lines, 4)).astype(np.float32),
+            'stress': [None if (n + i) % 4 == 0 else rng.integers(0, 2, 10).tolist() for i in range(num_lines)],
+            'rhyme_keys': [f'key{(n + i) % 3}' for i in range(num_lines)],
+        }))
+
+    # Two segments: poems 0-3 and 4-6
+    for part, (start, stop) in enumerate([(0, 4), (4, 7)]):
+        writer = FeatureStoreWriter(tmp_path / f'part-{part:05d}', first_poem_index=start)
+        for poem_id, columns in poems[start:stop]:
+            writer.add_poem(poem_id, columns)
+        writer.close()
+
+    store = FeatureStore(str(tmp_path))
+    assert len(store) == 7
+    assert store.num_lines == sum(len(columns['features']) for _, columns in poems)
+    assert store.poem_ids == [poem_id for poem_id, _ in poems]
+
+    for idx, (poem_id, columns) in enumerate(poems):
+        poem = store.poem(poem_id=poem_id)
+        assert poem['poem_id'] == poem_id
+        np.testing.assert_array_equal(poem['features'], columns['features'])
+        np.testing.assert_array_equal(poem['poem_index'], idx)
+        np.testing.assert_array_equal(poem['line_index'], np.arange(len(columns['features'])))
+        np.testing.assert_array_equal(poem['stress_parsed'], [s is not None for s in columns['stress']])
+        assert poem['stress'] == columns['stress']
+        assert poem['rhyme_keys'] == columns['rhyme_keys']
+
+    # Within one segment a slice is a view of the mapped file; across segments it is concatenated
+    within = store.slice(1, 3)
+    assert np.shares_memory(within['features'], store.segments[0].arrays['features'])
+    np.testing.assert_array_equal(within['features'], np.concatenate([c['features'] for _, c in poems[1:3]]))
+
+    across = store.slice(2, 6)
+    np.testing.assert_array_equal(across['features'], np.concatenate([c['features'] for _, c in poems[2:6]]))
+    line_counts = [len(c['features']) for _, c in poems[2:6]]
+    np.testing.assert_array_equal(across['poem_index'], np.repeat(np.arange(2, 6), line_counts))
+    assert across['stress'] == [s for _, c in poems[2:6] for s in c['stress']]
+    assert across['rhyme_keys'] == [k for _, c in poems[2:6] for k in c['rhyme_keys']]
+
+    np.testing.assert_array_equal(store.features_to_matrix(), np.concatenate([c['features'] for _, c in poems]))
+    assert store.column('rhyme_key').tolist() == [k for _, c in poems for k in c['rhyme_keys']]
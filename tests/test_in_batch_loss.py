@@ -0,0 +1,114 @@
+"""
+Tests for the in-batch negatives mode of HierarchicalLoss.
+
+The per-anchor loop below is the reference: every line of the batch except
+the anchor and its positives is a negative.
+"""
+
+import torch
+import torch.nn.functional as F
+
+from poetry_bert.models.losses import HierarchicalLoss
+
+HIDDEN_DIM = 16
+TEMPERATURE = 0.07
+
+
+def reference_in_batch_loss(lines, positive_index, temperature=TEMPERATURE):
+    """Per-anchor in-batch InfoNCE loop: negatives are all lines but the anchor and its positives."""
+    pairs = [tuple(pair) for pair in positive_index.tolist()]
+    related = set(pairs) | {(j, i) for i, j in pairs}
+
+    losses = []
+    for anchor_row, positive_row in pairs:
+        anchor = F.normalize(lines[anchor_row], dim=-1)
+        pos_sim = torch.dot(anchor, F.normalize(lines[positive_row], dim=-1)) / temperature
+        neg_sims = [
+            torch.dot(anchor, F.normalize(lines[row], dim=-1)) / temperature
+            for row in range(lines.size(0))
+            if row != anchor_row and (anchor_row, row) not in related
+        ]
+        logits = torch.stack([pos_sim, *neg_sims])
+        losses.append(-F.log_softmax(logits, dim=0)[0])
+
+    return torch.mean(torch.stack(losses))
+
+
+def random_pairs(num_pairs, seed):
+    generator = torch.Generator().manual_seed(seed)
+    first = torch.randn(num_pairs, HIDDEN_DIM, generator=generator, requires_grad=True)
+    second = torch.randn(num_pairs, HIDDEN_DIM, generator=generator, requires_grad=True)
+    return first, second
+
+
+def gradients(loss, tensors):
+    return torch.autograd.grad(loss, tensors)
+
+
+def in_batch_inputs(seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    lines = torch.randn(10, HIDDEN_DIM, generator=generator, requires_grad=True)
+    # Adjacent pairs within two sonnets of five lines, plus one pair sharing an anchor
+    positive_index = torch.tensor([[0, 1], [1, 2], [2, 3], [3, 4], [5, 6], [6, 7], [8, 9], [0, 2]])
+    return lines, positive_index
+
+
+def test_in_batch_matches_per_anchor_loop():
+    loss_fn = HierarchicalLoss(temperature=TEMPERATURE, negative_mode='in_batch')
+    lines, positive_index = in_batch_inputs()
+
+    loss = loss_fn._compute_in_batch_contrastive_loss(lines, positive_index)
+    expected = reference_in_batch_loss(lines, positive_index)
+
+    torch.testing.assert_close(loss, expected)
+    torch.testing.assert_close(gradients(loss, [lines])[0], gradients(expected, [lines])[0])
+
+
+def test_in_batch_cap_at_or_above_negatives_is_exact():
+    lines, positive_index = in_batch_inputs()
+    uncapped = HierarchicalLoss(temperature=TEMPERATURE, negative_mode='in_batch')
+    # Every anchor has at most num_lines - 2 negatives, so this cap keeps all of them
+    capped = HierarchicalLoss(
+        temperature=TEMPERATURE, negative_mode='in_batch', max_negatives_per_anchor=lines.size(0) - 1
+    )
+
+    torch.testing.assert_close(
+        capped._compute_in_batch_contrastive_loss(lines, positive_index),
+        uncapped._compute_in_batch_contrastive_loss(lines, positive_index)
+    )
+
+
+def test_in_batch_cap_limits_negatives(monkeypatch):
+    cap = 3
+    loss_fn = HierarchicalLoss(temperature=TEMPERATURE, negative_mode='in_batch', max_negatives_per_anchor=cap)
+    lines, positive_index = in_batch_inputs()
+
+    captured = {}
+    cross_entropy = F.cross_entropy
+
+    def capture(logits, labels, *args, **kwargs):
+        captured['logits'] = logits
+        return cross_entropy(logits, labels, *args, **kwargs)
+
+    monkeypatch.setattr(F, 'cross_entropy', capture)
+    torch.manual_seed(0)
+    loss = loss_fn._compute_in_batch_contrastive_loss(lines, positive_index)
+
+    logits = captured['logits']
+    assert logits.shape == (len(positive_index), 1 + cap)
+    # Enough valid negatives per anchor here, so none of the kept ones are masked
+    assert torch.isfinite(logits).all()
+    assert torch.isfinite(loss)
+    assert gradients(loss, [lines])[0].abs().sum() > 0
+
+
+def test_sampled_ignores_negative_cap():
+    loss_fn = HierarchicalLoss(temperature=TEMPERATURE)
+    capped = HierarchicalLoss(temperature=TEMPERATURE, max_negatives_per_anchor=2)
+    positive_pairs = random_pairs(4, seed=0)
+    negative_pairs = random_pairs(6, seed=1)
+
+    torch.testing.assert_close(
+        capped._compute_contrastive_loss(positive_pairs, negative_pairs),
+        loss_fn._compute_contrastive_loss(positive_pairs, negative_pairs)
+    )
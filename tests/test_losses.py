@@ -0,0 +1,118 @@
+"""
+Tests for the batched (sampled negatives) contrastive loss in HierarchicalLoss.
+
+The per-pair loop the batched loss replaced is kept here as a reference;
+the batched version must match it in loss value and gradients.
+"""
+
+import pytest
+import torch
+import torch.nn.functional as F
+
+from poetry_bert.models.losses import HierarchicalLoss, _stack_pairs
+
+HIDDEN_DIM = 16
+TEMPERATURE = 0.07
+
+
+def reference_contrastive_loss(positive_pairs, negative_pairs, temperature=TEMPERATURE):
+    """Per-pair InfoNCE loop (the implementation before vectorization)."""
+    if len(positive_pairs) == 0 or len(negative_pairs) == 0:
+        return torch.tensor(0.0, requires_grad=True)
+
+    losses = []
+    all_negatives = [neg for _, neg in negative_pairs]
+
+    for anchor, positive in positive_pairs:
+        anchor_norm = F.normalize(anchor, dim=-1)
+        positive_norm = F.normalize(positive, dim=-1)
+        pos_sim = torch.sum(anchor_norm * positive_norm, dim=-1) / temperature
+
+        neg_sims = []
+        for negative in all_negatives:
+            negative_norm = F.normalize(negative, dim=-1)
+            neg_sims.append(torch.sum(anchor_norm * negative_norm, dim=-1) / temperature)
+
+        logits = torch.cat([pos_sim.unsqueeze(0), torch.stack(neg_sims)], dim=0)
+        losses.append(-F.log_softmax(logits, dim=0)[0])
+
+    return torch.mean(torch.stack(losses))
+
+
+def random_pairs(num_pairs, seed):
+    generator = torch.Generator().manual_seed(seed)
+    first = torch.randn(num_pairs, HIDDEN_DIM, generator=generator, requires_grad=True)
+    second = torch.randn(num_pairs, HIDDEN_DIM, generator=generator, requires_grad=True)
+    return first, second
+
+
+def as_list(pairs):
+    first, second = pairs
+    return list(zip(first.unbind(0), second.unbind(0)))
+
+
+def gradients(loss, tensors):
+    return torch.autograd.grad(loss, tensors)
+
+
+@pytest.fixture
+def loss_fn():
+    return HierarchicalLoss(temperature=TEMPERATURE)
+
+
+@pytest.mark.parametrize('pair_format', ['tuple', 'list'])
+@pytest.mark.parametrize('num_positive,num_negative', [(1, 1), (5, 3), (8, 12)])
+def test_sampled_matches_per_pair_loop(loss_fn, pair_format, num_positive, num_negative):
+    positive_pairs = random_pairs(num_positive, seed=0)
+    negative_pairs = random_pairs(num_negative, seed=1)
+    # Anchors, positives and negatives (negative-pair anchors are unused)
+    inputs = [*positive_pairs, negative_pairs[1]]
+
+    if pair_format == 'tuple':
+        loss = loss_fn._compute_contrastive_loss(positive_pairs, negative_pairs)
+    else:
+        loss = loss_fn._compute_contrastive_loss(as_list(positive_pairs), as_list(negative_pairs))
+    expected = reference_contrastive_loss(as_list(positive_pairs), as_list(negative_pairs))
+
+    torch.testing.assert_close(loss, expected)
+    for grad, expected_grad in zip(gradients(loss, inputs), gradients(expected, inputs)):
+        torch.testing.assert_close(grad, expected_grad)
+
+
+def test_sampled_ignores_negative_anchors(loss_fn):
+    positive_pairs = random_pairs(4, seed=0)
+    negatives = random_pairs(6, seed=1)[1]
+    other_anchors = torch.randn(6, HIDDEN_DIM)
+
+    loss_a = loss_fn._compute_contrastive_loss(positive_pairs, (other_anchors, negatives))
+    loss_b = loss_fn._compute_contrastive_loss(positive_pairs, (torch.zeros(6, HIDDEN_DIM), negatives))
+    torch.testing.assert_close(loss_a, loss_b)
+
+
+@pytest.mark.parametrize('empty', ['positive', 'negative'])
+@pytest.mark.parametrize('pair_format', ['tuple', 'list'])
+def test_sampled_empty_pairs(loss_fn, empty, pair_format):
+    pairs = random_pairs(3, seed=0)
+    if pair_format == 'tuple':
+        no_pairs = (torch.zeros(0, HIDDEN_DIM), torch.zeros(0, HIDDEN_DIM))
+    else:
+        pairs, no_pairs = as_list(pairs), []
+
+    if empty == 'positive':
+        loss = loss_fn._compute_contrastive_loss(no_pairs, pairs)
+    else:
+        loss = loss_fn._compute_contrastive_loss(pairs, no_pairs)
+
+    assert loss.item() == 0.0
+    assert loss.requires_grad
+
+
+def test_stack_pairs_formats():
+    first, second = random_pairs(3, seed=0)
+
+    stacked = _stack_pairs(as_list((first, second)))
+    torch.testing.assert_close(stacked[0], first)
+    torch.testing.assert_close(stacked[1], second)
+    assert _stack_pairs((first, second))[0] is first
+    assert _stack_pairs([]) is None
+    assert _stack_pairs((first[:0], second[:0])) is None
@@ -0,0 +1,110 @@
+"""
+Tests for FuzzyMatcher against naive trigram Dice and SequenceMatcher scoring.
+"""
+
+import math
+from difflib import SequenceMatcher
+
+import numpy as np
+import pytest
+
+from poetry_bert.corpus.matching import FuzzyMatcher, _trigrams, normalize_text
+
+TITLES = [
+    "Ode to a Nightingale",
+    "Ode on a Grecian Urn",
+    "To Autumn",
+    "Ode to the West Wind",
+    "Ozymandias",
+    "The Tyger",
+    "The Lamb",
+    "Sonnet 18",
+    "Sonnet 130",
+    "",
+    math.nan,
+    "A Red, Red Rose",
+    "To a Mouse",
+    "Ode: Intimations of Immortality",
+]
+AUTHORS = [
+    "John Keats",
+    "Keats, John",
+    "John Keats",
+    "Percy Bysshe Shelley",
+    "Shelley, Percy Bysshe",
+    "William Blake",
+    "Blake, William",
+    "William Shakespeare",
+    "William Shakespeare",
+    "John Keats",
+    "John Keats",
+    "Robert Burns",
+    "Burns, Robert",
+    "William Wordsworth",
+]
+QUERIES = ["ode to a nightingale", "Ode to the Nightingale", "ode", "sonnet 13", "The Tiger", "zzz"]
+
+
+@pytest.fixture
+def matcher():
+    return FuzzyMatcher(TITLES, AUTHORS)
+
+
+def naive_dice(query, title):
+    query_grams = set(_trigrams(normalize_text(query)))
+    title = normalize_text(title)
+    title_grams = set(_trigrams(title)) if title else set()
+    if not query_grams or not title_grams:
+        return 0.0
+    return 2 * len(query_grams & title_grams) / (len(query_grams) + len(title_grams))
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_title_scores_match_naive_dice(matcher, query):
+    expected = np.array([naive_dice(query, title) for title in TITLES])
+
+    # Blocked: scores for exactly the given candidates
+    candidates = np.array([0, 1, 3, 7, 8, 9, 10, 13])
+    records, scores = matcher.title_scores(query, candidates)
+    np.testing.assert_array_equal(records, candidates)
+    np.testing.assert_allclose(scores, expected[candidates])
+
+    # Unblocked: every record sharing a trigram, with the same scores
+    records, scores = matcher.title_scores(query)
+    np.testing.assert_array_equal(records, np.flatnonzero(expected))
+    np.testing.assert_allclose(scores, expected[records])
+
+
+def test_author_blocking_handles_last_first(matcher):
+    keats = [0, 1, 2, 9, 10]
+    np.testing.assert_array_equal(matcher.candidates("John Keats"), keats)
+    np.testing.assert_array_equal(matcher.candidates("Keats, John"), keats)
+    np.testing.assert_array_equal(matcher.candidates("Shelley, Percy Bysshe"), [3, 4])
+    np.testing.assert_array_equal(matcher.candidates("Robert Burns", block_on='any'), [11, 12])
+    assert len(matcher.candidates("Emily Dickinson")) == 0
+    assert matcher.candidates(None) is None
+
+    assert [idx for idx, _ in matcher.match("Ode on a Grecian Urn", "John Keats", k=1)] == [1]
+    assert 4 not in [idx for idx, _ in matcher.match("Ozymandias", "Keats, John", k=5)]
+
+
+@pytest.mark.parametrize('title', ["", "  ", "?!", None, math.nan])
+def test_empty_titles_match_nothing(matcher, title):
+    assert matcher.match(title) == []
+    assert matcher.match(title, "John Keats") == []
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_match_rescoring_agrees_with_sequence_matcher(matcher, query):
+    records, _ = matcher.title_scores(query)
+    normalized = normalize_text(query)
+    expected = sorted(
+        ((int(idx), SequenceMatcher(None, normalized, matcher.titles[idx]).ratio()) for idx in records),
+        key=lambda match: (-match[1], match[0])
+    )
+
+    # A shortlist covering every candidate makes rescoring exact
+    assert matcher.match(query, k=3, shortlist=len(TITLES)) == expected[:3]
+    # A smaller shortlist still reports SequenceMatcher scores
+    for idx, score in matcher.match(query, k=2, shortlist=2):
+        assert score == SequenceMatcher(None, normalized, matcher.titles[idx]).ratio()
@@ -0,0 +1,83 @@
+"""
+Tests for CorpusReader listings, the listing cache and read order.
+"""
+
+import json
+import os
+
+import pytest
+
+from poetry_bert.corpus.reader import CorpusReader
+
+
+def write_poem(path, text, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / 'corpus'
+    for author in ('Blake', 'Keats', 'Shelley'):
+        for n in range(3):
+            write_poem(root / author / f'{n:06d}_Poem_{author}_1800.txt', f'{author} poem {n}\nsecond line\n')
+    (root / 'Empty').mkdir()
+    (root / 'Keats' / 'notes.md').write_text('not a poem')
+    return root
+
+
+def test_list_files_sorted_with_stats(corpus):
+    reader = CorpusReader(corpus)
+    files = reader.list_files()
+
+    assert [f.relpath for f in files] == sorted(f.relative_to(corpus).as_posix() for f in corpus.glob('*/*.txt'))
+    assert reader.authors == ['Blake', 'Empty', 'Keats', 'Shelley']
+    for f in files:
+        assert (f.size, f.mtime) == (f.path.stat().st_size, f.path.stat().st_mtime)
+
+
+def test_listing_cache_invalidation(corpus, tmp_path):
+    cache_path = tmp_path / 'listing.json'
+    assert len(CorpusReader(corpus, listing_cache=cache_path).list_files()) == 9
+    cached = json.loads(cache_path.read_text())
+    assert set(cached['dirs']) == {'', 'Blake', 'Empty', 'Keats', 'Shelley'}
+
+    # A new file changes its directory's mtime, so that directory is re-listed
+    keats = corpus / 'Keats'
+    write_poem(keats / '000009_To_Autumn_Keats_1819.txt', 'Season of mists')
+    os.utime(keats, (cached['dirs']['Keats']['mtime'] + 10,) * 2)
+    files = CorpusReader(corpus, listing_cache=cache_path).list_files()
+    assert 'Keats/000009_To_Autumn_Keats_1819.txt' in [f.relpath for f in files]
+
+    # A file rewritten in place keeps its directory's mtime: the cached stats
+    # are reused until refresh_stats re-stats every file
+    blake_dir_mtime = (corpus / 'Blake').stat().st_mtime
+    rewritten = corpus / 'Blake' / '000000_Poem_Blake_1800.txt'
+    write_poem(rewritten, 'Tyger Tyger, burning bright,\nIn the forests of the night\n', mtime=1_000_000)
+    os.utime(corpus / 'Blake', (blake_dir_mtime, blake_dir_mtime))
+
+    reader = CorpusReader(corpus, listing_cache=cache_path)
+    stale = {f.relpath: f for f in reader.list_files()}['Blake/000000_Poem_Blake_1800.txt']
+    assert stale.mtime != 1_000_000
+    fresh = {f.relpath: f for f in reader.list_files(refresh_stats=True)}['Blake/000000_Poem_Blake_1800.txt']
+    assert (fresh.size, fresh.mtime) == (rewritten.stat().st_size, 1_000_000)
+
+    # A cache written for another pattern is ignored
+    assert CorpusReader(corpus, pattern='*.md', listing_cache=cache_path).list_files()[0].name == 'notes.md'
+
+
+@pytest.mark.parametrize('num_workers', [1, 4])
+def test_iter_poems_keeps_order(corpus, num_workers):
+    reader = CorpusReader(corpus, num_workers=num_workers)
+    files = reader.list_files()
+    # An order unrelated to the listing, a missing file, and little read-ahead
+    wanted = reader.resolve([f.relpath for f in reversed(files)] + ['Keats/missing.txt'])
+
+    records = list(reader.iter_poems(wanted, max_in_flight=2))
+
+    assert [r.file.relpath for r in records] == [f.relpath for f in wanted]
+    for record in records[:-1]:
+        assert record.text() == record.file.path.read_text()
+    assert records[-1].data is None and records[-1].error
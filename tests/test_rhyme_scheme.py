@@ -0,0 +1,27 @@
+"""
+Tests for classify_rhyme_scheme on poems of any length.
+"""
+
+import pytest
+
+from poetry_bert.features.prosodic import classify_rhyme_scheme
+
+
+@pytest.mark.parametrize('labels,expected', [
+    # Short poems
+    ([0, 0], 'couplets'),
+    ([0, 1], 'unrhymed'),
+    ([0, 0, 1], 'couplets'),
+    ([0, 0, 0], 'monorhyme'),
+    ([0, 1, 2], 'unrhymed'),
+    ([0, 1, 0], 'irregular'),
+    # Stanzaic and fixed forms
+    ([0, 0, 1, 1, 2, 2], 'couplets'),
+    ([0, 1, 0, 1, 2, 3, 2, 3], 'alternate_quatrains'),
+    ([0, 1, 1, 0, 2, 3, 3, 2], 'envelope_quatrains'),
+    ([0, 1, 2, 1, 3, 4, 5, 4], 'ballad_quatrains'),
+    ([0, 1, 0, 1, 2, 1, 2, 3, 2, 3, 4, 3], 'terza_rima'),
+    ([0, 1, 0, 1, 2, 3, 2, 3, 4, 5, 4, 5, 6, 6], 'shakespearean'),
+])
+def test_classify_rhyme_scheme(labels, expected):
+    assert classify_rhyme_scheme(labels) == expected
@@ -0,0 +1,77 @@
+"""
+Tests that ShardedHierarchicalDataset reproduces HierarchicalPoetryDataset.
+"""
+
+import json
+import random
+
+import pytest
+import torch
+from transformers import BertTokenizerFast
+
+from poetry_bert.training.dataset import HierarchicalPoetryDataset
+from poetry_bert.training.shards import ShardedHierarchicalDataset, write_hierarchical_shards
+
+WORDS = (
+    "the of and to a in that is was he for it with as his on be at by this had not are but "
+    "from or have an they which one you were her all she there would their we him been has"
+).split()
+
+
+@pytest.fixture
+def tokenizer(tmp_path):
+    vocab_file = tmp_path / 'vocab.txt'
+    vocab_file.write_text('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + WORDS))
+    return BertTokenizerFast(str(vocab_file))
+
+
+def make_sonnets(num_sonnets=30, seed=1):
+    """Sonnets of varied length; short ones have quatrain indices past their last line."""
+    rng = random.Random(seed)
+    sonnets = []
+    for n in range(num_sonnets):
+        num_lines = rng.choice([3, 5, 9, 14, 14, 16])
+        sonnet = {
+            'lines': [' '.join(rng.choices(WORDS, k=rng.randint(3, 10))) for _ in range(num_lines)],
+            'num_lines': num_lines,
+            'adjacent_pairs': [(i, i + 1) for i in range(num_lines - 1)],
+            'rhyme_pairs': [(0, 2), (1, 3)],
+            'quatrain_1': list(range(0, 4)),
+            'quatrain_2': list(range(4, 8)),
+            'quatrain_3': list(range(8, 12)),
+            'couplet': list(range(12, 14)),
+        }
+        # Some sonnets without an id, one with an explicit null id
+        if n % 3:
+            sonnet['sonnet_id'] = n * 10
+        elif n == 6:
+            sonnet['sonnet_id'] = None
+        sonnets.append(sonnet)
+    return sonnets
+
+
+def test_sharded_items_match_jsonl(tmp_path, tokenizer):
+    sonnets = make_sonnets()
+    jsonl_path = tmp_path / 'train.jsonl'
+    with open(jsonl_path, 'w') as f:
+        for sonnet in sonnets:
+            f.write(json.dumps(sonnet) + '\n')
+    write_hierarchical_shards(sonnets, tokenizer, tmp_path / 'shards')
+
+    jsonl_dataset = HierarchicalPoetryDataset(str(jsonl_path), tokenizer)
+    sharded_dataset = ShardedHierarchicalDataset(str(tmp_path / 'shards'), tokenizer)
+    assert len(sharded_dataset) == len(jsonl_dataset)
+    assert sharded_dataset.lengths == jsonl_dataset.lengths
+
+    torch.manual_seed(0)
+    expected = [jsonl_dataset[i] for i in range(len(jsonl_dataset))]
+    torch.manual_seed(0)
+    actual = [sharded_dataset[i] for i in range(len(sharded_dataset))]
+
+    for expected_item, actual_item in zip(expected, actual):
+        assert actual_item.keys() == expected_item.keys()
+        for key, value in expected_item.items():
+            if torch.is_tensor(value):
+                assert torch.equal(actual_item[key], value), key
+            else:
+                assert actual_item[key] == value, key
@@ -0,0 +1,113 @@
+"""
+Tests that HierarchicalBertModel's batched, deduplicated line encoding
+matches the per-pair path, and that legacy checkpoints load.
+"""
+
+import pytest
+import torch
+from transformers import BertConfig, BertForMaskedLM
+
+from poetry_bert.models.losses import HierarchicalLoss
+from poetry_bert.training.trainer import ENCODER_PREFIX, LEGACY_ENCODER_PREFIX, HierarchicalBertModel
+
+VOCAB_SIZE = 50
+
+
+@pytest.fixture
+def base_model_path(tmp_path):
+    """A tiny randomly initialized BERT saved as a base model."""
+    config = BertConfig(
+        vocab_size=VOCAB_SIZE, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=64
+    )
+    torch.manual_seed(0)
+    path = tmp_path / 'base'
+    BertForMaskedLM(config).save_pretrained(path)
+    return str(path)
+
+
+def make_batch():
+    generator = torch.Generator().manual_seed(0)
+    input_ids = torch.randint(5, VOCAB_SIZE, (2, 20), generator=generator)
+    mlm_labels = torch.full_like(input_ids, -100)
+    mlm_labels[:, 3] = input_ids[:, 3]
+
+    # Lines of varied length; line 6 repeats line 0, so they are encoded once
+    lengths = [6, 9, 4, 10, 7, 3, 6, 8]
+    line_input_ids = torch.zeros(len(lengths), 10, dtype=torch.long)
+    line_attention_mask = torch.zeros(len(lengths), 10, dtype=torch.long)
+    for i, length in enumerate(lengths):
+        line_input_ids[i, :length] = torch.randint(5, VOCAB_SIZE, (length,), generator=generator)
+        line_attention_mask[i, :length] = 1
+    line_input_ids[6] = line_input_ids[0]
+
+    return {
+        'input_ids': input_ids,
+        'attention_mask': torch.ones_like(input_ids),
+        'line_input_ids': line_input_ids,
+        'line_attention_mask': line_attention_mask,
+        'line_pairs_positive': torch.tensor([[0, 1], [1, 2], [4, 5], [6, 3]]),
+        'line_pairs_negative': torch.tensor([[0, 4], [1, 7], [2, 6]]),
+        'quatrain_pairs_positive': torch.tensor([[0, 3], [4, 7]]),
+        'quatrain_pairs_negative': torch.tensor([[0, 5]]),
+    }, mlm_labels
+
+
+def stacked(pairs):
+    """(first, second) tensors from either pair format."""
+    if isinstance(pairs, tuple):
+        return pairs
+    return torch.stack([first for first, _ in pairs]), torch.stack([second for _, second in pairs])
+
+
+def test_batched_encoding_matches_per_pair_path(base_model_path, tmp_path):
+    model = HierarchicalBertModel(base_model_path).eval()
+    batch, mlm_labels = make_batch()
+
+    with torch.no_grad():
+        model.batch_line_encoding = True
+        batched = model(**batch)
+        model.batch_line_encoding = False
+        per_pair = model(**batch)
+
+    torch.testing.assert_close(batched['mlm_logits'], per_pair['mlm_logits'])
+    for level in ('line_embeddings', 'quatrain_embeddings'):
+        for key in ('positive_pairs', 'negative_pairs'):
+            for actual, expected in zip(stacked(batched[level][key]), stacked(per_pair[level][key])):
+                torch.testing.assert_close(actual, expected, atol=1e-5, rtol=1e-5)
+
+    # In-batch inputs: one row per distinct referenced line, positive_index into them
+    lines = batched['line_embeddings']['lines']
+    positive_index = batched['line_embeddings']['positive_index']
+    referenced = torch.cat([batch['line_pairs_positive'], batch['line_pairs_negative']]).unique()
+    assert len(lines) == len(referenced) - 1  # lines 0 and 6 are the same
+    assert positive_index[3, 0] == positive_index[0, 0]
+    first, second = stacked(per_pair['line_embeddings']['positive_pairs'])
+    torch.testing.assert_close(lines[positive_index[:, 0]], first, atol=1e-5, rtol=1e-5)
+    torch.testing.assert_close(lines[positive_index[:, 1]], second, atol=1e-5, rtol=1e-5)
+
+    loss_fn = HierarchicalLoss()
+    batched_losses = loss_fn(mlm_labels=mlm_labels, **batched)
+    per_pair_losses = loss_fn(mlm_labels=mlm_labels, **per_pair)
+    for name, value in per_pair_losses.items():
+        torch.testing.assert_close(batched_losses[name], value, atol=1e-5, rtol=1e-5)
+    in_batch_losses = HierarchicalLoss(negative_mode='in_batch')(mlm_labels=mlm_labels, **batched)
+    assert torch.isfinite(in_batch_losses['total_loss'])
+
+    # A legacy checkpoint stores the encoder under both 'bert.' and 'bert_mlm.bert.'
+    with torch.no_grad():
+        model.line_proj.weight.mul_(2)
+    state_dict = model.state_dict()
+    for key in [k for k in state_dict if k.startswith(ENCODER_PREFIX)]:
+        state_dict[LEGACY_ENCODER_PREFIX + key[len(ENCODER_PREFIX):]] = state_dict[key]
+    checkpoint = tmp_path / 'checkpoint'
+    checkpoint.mkdir()
+    torch.save(state_dict, checkpoint / 'pytorch_model.bin')
+
+    loaded = HierarchicalBertModel.from_checkpoint(str(checkpoint), base_model_path=base_model_path).eval()
+    with torch.no_grad():
+        model.batch_line_encoding = True
+        expected = model(**batch)
+        actual = loaded(**batch)
+    torch.testing.assert_close(actual['sonnet_embeddings'], expected['sonnet_embeddings'])
+    torch.testing.assert_close(actual['line_embeddings']['lines'], expected['line_embeddings']['lines'])
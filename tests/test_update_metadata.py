@@ -0,0 +1,73 @@
+"""
+Tests that the incremental metadata scan of scripts/update_metadata.py
+matches a full rescan.
+"""
+
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+from poetry_bert.corpus.manifest import FileManifest
+
+SCRIPT = Path(__file__).parent.parent / 'scripts' / 'update_metadata.py'
+
+
+@pytest.fixture
+def update_metadata(tmp_path, monkeypatch):
+    """The script module, scanning a temporary corpus."""
+    spec = importlib.util.spec_from_file_location('update_metadata', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'POETRY_PLATFORM_DIR', tmp_path / 'poetry_platform_renamed')
+    monkeypatch.setattr(module, 'GUTENBERG_DIR', tmp_path / 'gutenberg')
+    monkeypatch.setattr(module, 'LISTING_CACHE_DIR', tmp_path / 'cache')
+    return module
+
+
+def write_poem(path, text, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_incremental_scan_matches_full_rescan(update_metadata, monkeypatch):
+    platform = update_metadata.POETRY_PLATFORM_DIR
+    gutenberg = update_metadata.GUTENBERG_DIR
+    for n in range(4):
+        write_poem(platform / 'Keats' / f'{n:06d}_Ode {n}_Keats_1819.txt', f'Ode {n}\nline two\n', 1_000 + n)
+        write_poem(gutenberg / 'Blake' / f'{n + 10:06d}_Song {n}_Blake_1794.txt', f'Song {n}\n', 2_000 + n)
+    # A duplicate of another file's content
+    write_poem(platform / 'Keats' / '000099_Ode 0 again_Keats_1819.txt', 'Ode 0\nline two\n', 1_099)
+
+    manifest = FileManifest()
+    first = update_metadata.scan_corpus(manifest)
+    assert len(first) == 8
+
+    # A changed, a deleted and an added file
+    write_poem(platform / 'Keats' / '000001_Ode 1_Keats_1819.txt', 'Ode 1, revised\nline two\nline three\n', 5_000)
+    (gutenberg / 'Blake' / '000012_Song 2_Blake_1794.txt').unlink()
+    write_poem(gutenberg / 'Blake' / '000020_Song 9_Blake_1794.txt', 'Song 9\nnew\n', 5_001)
+    for directory in (platform / 'Keats', gutenberg / 'Blake'):
+        os.utime(directory, (6_000, 6_000))
+
+    read = []
+    iter_file_metadata = update_metadata.iter_file_metadata
+
+    def recording_iter_file_metadata(*args):
+        for corpus_file, entry, was_read in iter_file_metadata(*args):
+            if was_read:
+                read.append(corpus_file.relpath)
+            yield corpus_file, entry, was_read
+
+    monkeypatch.setattr(update_metadata, 'iter_file_metadata', recording_iter_file_metadata)
+    incremental = update_metadata.scan_corpus(manifest)
+    monkeypatch.setattr(update_metadata, 'iter_file_metadata', iter_file_metadata)
+    full = update_metadata.scan_corpus(FileManifest())
+
+    assert incremental == full
+    assert sorted(read) == ['Blake/000020_Song 9_Blake_1794.txt', 'Keats/000001_Ode 1_Keats_1819.txt']
+    assert not any(key.endswith('000012_Song 2_Blake_1794.txt') for key in manifest)
+    revised = next(poem for poem in incremental if poem['poem_id'] == '000001')
+    assert (revised['lines'], revised['words']) == (3, 7)